@@ -1,135 +1,34 @@
-import datetime
 import logging
 import os
-import shutil
-import tempfile
-import threading
-import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from pypdf import PdfWriter, PdfReader
+from PageRangeTab import PAGE_RANGE_EXAMPLE, PageRangeTab
+from pagerange import PageRange
+from jobqueue import INTERACTIVE, scheduler
+from progress import ProgressMonitor, update_progressbar
 
 
-class RangeDeleteThread(threading.Thread):
-    def __init__(self, pdf_reader, output_path, page_range, status_label=None):
-        super().__init__()
-        self.pdf_reader = pdf_reader
-        self.output_path = output_path
-        self.page_range = page_range
-        self.status_label = status_label
-        self.warning_message = ''
-
-    def run(self):
-        tmp_file_path = None
-        pdf_writer = PdfWriter()
-        try:
-            logging.info('**** The page range deleting session is started... ****')
-            logging.info('Deleting pages is begun...')
-            start_time = time.time()
-            i = 0
-            for page_numder in range(len(self.pdf_reader.pages)):
-                if page_numder + 1 not in self.page_range:
-                    pdf_writer.add_page(self.pdf_reader.pages[page_numder])
-                else:
-                    if self.status_label:
-                        i += 1
-                        self.status_label['text'] = 'Deleting page progress: deleted {} of {}...'.format(i, len(self.page_range))
-
-            stop_time = time.time()
-            logging.info('Deleting pages is finished')
-            logging.info('Deleting pages time: {}'.format(stop_time - start_time))
-
-            tmp_file = tempfile.TemporaryFile()
-            tmp_file_path = os.path.join(tempfile.gettempdir(), str(tmp_file.name))
-            tmp_file.close()
-
-            logging.info('The writing to the temporary file is started...')
-            start_time = time.time()
-            if self.status_label:
-                self.status_label['text'] = 'Deleting page progress: writing result file...'
-
-            pdf_writer.write(tmp_file_path)
-
-            stop_time = time.time()
-            logging.info('The writing to the temporary file is finished')
-            logging.info('Writing to tmp file time: {}'.format(stop_time - start_time))
-
-            logging.info('Starting copying file...')
-            start_time = time.time()
-            shutil.copyfile(src=tmp_file_path, dst=self.output_path)
-            stop_time = time.time()
-            logging.info('The copying file is finished')
-            logging.info('Copying time: {}'.format(stop_time - start_time))
-
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message(str(ex))
-            return
-        finally:
-            pdf_writer.close()
-            try:
-                if os.path.exists(tmp_file_path):
-                    os.remove(tmp_file_path)
-            except Exception as ex:
-                logging.error(ex)
-
-        logging.info('**** The page range deleting session is finished ****')
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
-
-
-class OpenPDFFileThread(threading.Thread):
-    def __init__(self, source_file_path):
-        super().__init__()
-        self.source_file_path = source_file_path
-        self.pdf_reader = None
-        self.warning_message = ''
-
-    def run(self):
-        logging.info('**** Starting the loading pdf file session... ****')
-        start_time = time.time()
-        logging.info('Start loading...')
-        try:
-            pdf_reader = PdfReader(self.source_file_path)
-            self.set_pdf_reader(pdf_reader)
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message(str(ex))
-        stop_time = time.time()
-        logging.info('Loading is finished')
-        logging.info('Loading time: {}'.format(stop_time - start_time))
-        logging.info('**** The loading pdf file session is finished ****')
-
-    def set_pdf_reader(self, pdf_reader):
-        self.pdf_reader = pdf_reader
-
-    def get_pdf_reader(self):
-        return self.pdf_reader
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
-
-
-class Deleter(ttk.Frame):
+class Deleter(PageRangeTab, ttk.Frame):
     def __init__(self, container, input_file=''):
         super().__init__(container)
         self.deleting_page_progress = None
         self.pages_number_title = None
         self.pdf_reader = None
+        self.page_count = 0
         self.page_range_example_title = None
         self.source_file_path = None
+        self.page_range_text = None
         self.page_range_entry = None
+        self.page_index = None
+        self.page_index_job = None
+        self.is_incremental = None
+        self.incremental_checkbox = None
         self.delete_button = None
         self.delete_pbar = None
         self.delete_pbar_frame = None
+        self.cancel_button = None
+        self.running_thread = None
         self.input_file_name = None
         self.open_file_button = None
 
@@ -179,14 +78,22 @@ class Deleter(ttk.Frame):
         page_range_title = ttk.Label(page_range_frame, text='Page range:')
         page_range_title.grid(column=0, row=0, sticky=tk.E, padx=(5, 0), pady=(0, 0))
 
-        self.page_range_entry = ttk.Entry(page_range_frame)
+        self.page_range_text = tk.StringVar()
+        self.page_range_text.trace_add('write', lambda *args: self.update_range_summary())
+        self.page_range_entry = ttk.Entry(page_range_frame, textvariable=self.page_range_text)
         self.page_range_entry.grid(column=1, row=0, sticky=tk.EW, padx=(5, 5), pady=(0, 0))
 
-        self.page_range_example_title = ttk.Label(page_range_frame, text='e.g. 3-7,9,14-17', font=('', 7))
+        self.page_range_example_title = ttk.Label(page_range_frame, text=PAGE_RANGE_EXAMPLE, font=('', 7))
         self.page_range_example_title.grid(column=1, row=1, sticky=tk.EW, padx=(5, 5), pady=(0, 0))
 
         self.deleting_page_progress = ttk.Label(page_range_frame, text='')
 
+        # Only the changed page tree is appended, the source file may be chosen as the result file
+        self.is_incremental = tk.BooleanVar(value=False)
+        self.incremental_checkbox = ttk.Checkbutton(page_range_frame, text='Fast (Incremental Update)',
+                                                    variable=self.is_incremental)
+        self.incremental_checkbox.grid(column=1, row=3, sticky=tk.W, padx=(5, 5), pady=(5, 0))
+
         page_range_frame.columnconfigure(1, weight=1)
 
         page_range_frame.grid(column=0, row=3, sticky=tk.EW, padx=(5, 5), pady=(15, 0))
@@ -215,6 +122,9 @@ class Deleter(ttk.Frame):
         self.delete_pbar = ttk.Progressbar(self.delete_pbar_frame, orient=tk.HORIZONTAL, mode='indeterminate')
         self.delete_pbar.grid(column=1, row=0, sticky=tk.EW, padx=0)
 
+        self.cancel_button = ttk.Button(self.delete_pbar_frame, text='Cancel', command=self.cancel_thread)
+        self.cancel_button.grid(column=2, row=0, sticky=tk.E, padx=(5, 0))
+
         pbar_frame.columnconfigure(0, weight=1)
         pbar_frame.grid(column=0, row=7, sticky=tk.EW, padx=5)
 
@@ -227,6 +137,9 @@ class Deleter(ttk.Frame):
         deleter_frame.grid(column=0, row=0, sticky=tk.NSEW)
 
     def delete_pages(self):
+        # The worker imports pypdf, it is loaded when the first document is opened
+        from deletion import RangeDeleteThread
+
         message_nothing_to_do = 'Nothing to do...\nPlease choose a Source File'
         if not self.input_file_name['text']:
             tk.messagebox.showinfo('Information...', message_nothing_to_do)
@@ -241,15 +154,11 @@ class Deleter(ttk.Frame):
         try:
             if output_path:
                 pages_range = self.parse_pages_range(self.page_range_entry.get())
-                if max(pages_range) > len(self.pdf_reader.pages):
-                    messagebox.showwarning(title='Warning!', message='Page range is not correct!')
-                    return
-                self.start_thread()
                 range_delete_thread = RangeDeleteThread(self.pdf_reader, output_path, pages_range,
-                                                        self.deleting_page_progress)
-                range_delete_thread.start()
-                self.range_delete_thread_monitor(thread=range_delete_thread, pdf_reader=self.pdf_reader,
-                                                 output_path=output_path, pages_range=pages_range)
+                                                        incremental=self.is_incremental.get(),
+                                                        source_file_path=self.source_file_path)
+                self.submit_job(range_delete_thread, 'Delete pages {} from {}'.format(
+                    self.page_range_entry.get().strip(), os.path.basename(self.source_file_path)))
         except ValueError as ex:
             logging.error(ex)
             messagebox.showwarning(title='Warning!', message='Invalid range format!\n{}'.format(str(ex)))
@@ -260,43 +169,89 @@ class Deleter(ttk.Frame):
             self.deleting_page_progress.grid_remove()
             messagebox.showwarning(title='Warning!', message='Something went wrong...')
 
-    def range_delete_thread_monitor(self, thread, pdf_reader, output_path, pages_range):
+    def job_thread_monitor(self, thread):
+        self.running_thread = thread
+        self.cancel_button['state'] = tk.NORMAL
+        self.deleting_page_progress['text'] = 'Waiting in the queue...'
         self.deleting_page_progress.grid(columnspan=3, column=0, row=2, sticky=tk.EW, padx=(5, 5), pady=(10, 0))
-        if thread.is_alive():
-            self.after(100, lambda: self.range_delete_thread_monitor(thread=thread, pdf_reader=pdf_reader,
-                                                                     output_path=output_path, pages_range=pages_range))
-        else:
-            self.deleting_page_progress.grid_remove()
-            self.stop_thread()
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+        self.show_pbar()
+        ProgressMonitor(self, thread.progress, lambda event: self.show_job_progress(thread, event),
+                        lambda: self.range_delete_thread_finished(thread)).start()
+
+    def show_progress(self, event):
+        self.deleting_page_progress['text'] = event.describe()
+        update_progressbar(self.delete_pbar, event)
+
+    def show_job_progress(self, thread, event):
+        # Only the last submitted job is shown here, all of them are listed on the Jobs tab
+        if thread is self.running_thread:
+            self.show_progress(event)
 
-    def open_pdf_file_thread_monitor(self, thread, source_file_path):
-        if thread.is_alive():
-            self.after(100, lambda: self.open_pdf_file_thread_monitor(thread=thread, source_file_path=source_file_path))
+    def range_delete_thread_finished(self, thread):
+        from documents import registry
+
+        registry.release(thread.pdf_reader)
+        if thread is self.running_thread:
+            self.running_thread = None
+            self.deleting_page_progress.grid_remove()
+            self.hide_pbar()
+        if thread.get_message() and not thread.cancel_token.is_cancelled():
+            messagebox.showwarning(title='Warning!', message=thread.get_message())
+        elif (not thread.get_message() and thread.source_file_path == self.source_file_path
+              and os.path.normpath(thread.output_path) == self.source_file_path):
+            # The opened document is the previous revision of the file now
+            self.open_file(self.source_file_path)
+
+    def open_pdf_file_thread_finished(self, thread):
+        self.stop_thread()
+        self.pdf_reader = thread.get_pdf_reader()
+        if self.pdf_reader:
+            self.page_count = thread.page_count
+            self.show_document_info(self.page_count, thread.document_info.describe() if thread.document_info else '')
+            self.start_page_index()
         else:
-            self.stop_thread()
-            self.pdf_reader = thread.get_pdf_reader()
-            self.pages_number_title['text'] = 'The number of pages is {}'.format(len(self.pdf_reader.pages))
-            self.input_file_name['text'] = os.path.basename(self.source_file_path)
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            self.page_count = 0
+            self.pages_number_title['text'] = ''
+            self.input_file_name['text'] = ''
+        self.update_range_summary()
+        if thread.get_message():
+            messagebox.showwarning(title='Warning!', message=thread.get_message())
+
+    def cancel_thread(self):
+        if self.running_thread:
+            self.running_thread.cancel()
+            self.cancel_button['state'] = tk.DISABLED
+            self.deleting_page_progress['text'] = 'Cancelling...'
 
     def start_thread(self):
         self.delete_button['state'] = tk.DISABLED
         self.open_file_button['state'] = tk.DISABLED
         self.page_range_entry['state'] = tk.DISABLED
-        self.delete_pbar_frame.grid(column=0, row=0, sticky=tk.EW, padx=0)
-        self.delete_pbar.start(10)
+        self.incremental_checkbox['state'] = tk.DISABLED
+        if self.running_thread is None:
+            self.cancel_button['state'] = tk.DISABLED
+            self.show_pbar()
 
     def stop_thread(self):
         self.delete_button['state'] = tk.NORMAL
         self.open_file_button['state'] = tk.NORMAL
         self.page_range_entry['state'] = tk.NORMAL
+        self.incremental_checkbox['state'] = tk.NORMAL
+        if self.running_thread is None:
+            self.hide_pbar()
+
+    def show_pbar(self):
+        self.delete_pbar_frame.grid(column=0, row=0, sticky=tk.EW, padx=0)
+        self.delete_pbar.configure(mode='indeterminate', value=0)
+        self.delete_pbar.start(10)
+
+    def hide_pbar(self):
         self.delete_pbar.stop()
         self.delete_pbar_frame.grid_remove()
 
     def open_file(self, file_path=''):
+        from documents import OpenPDFFileThread, registry
+
         if not file_path:
             file_path = filedialog.askopenfilename(title='Open File', filetypes=(('PDF Files', '*.pdf'),))
         if not file_path:
@@ -305,13 +260,22 @@ class Deleter(ttk.Frame):
         self.page_range_entry.delete(0, tk.END)
         self.pages_number_title['text'] = ''
         self.input_file_name['text'] = ''
+        if self.page_index_job is not None:
+            scheduler.cancel(self.page_index_job)
+            self.page_index_job = None
+        self.page_index = None
         if self.pdf_reader:
-            self.pdf_reader.stream.close()
+            registry.release(self.pdf_reader)
+            self.pdf_reader = None
+        self.page_count = 0
         try:
             self.start_thread()
             open_pdf_file_thread = OpenPDFFileThread(self.source_file_path)
-            open_pdf_file_thread.start()
-            self.open_pdf_file_thread_monitor(open_pdf_file_thread, self.source_file_path)
+            scheduler.submit(open_pdf_file_thread, 'Open {}'.format(os.path.basename(self.source_file_path)),
+                             INTERACTIVE)
+            ProgressMonitor(self, open_pdf_file_thread.progress,
+                            lambda event: self.show_open_progress(open_pdf_file_thread, event),
+                            lambda: self.open_pdf_file_thread_finished(open_pdf_file_thread)).start()
         except Exception as ex:
             logging.error(ex)
             self.stop_thread()
@@ -319,14 +283,9 @@ class Deleter(ttk.Frame):
             return
 
     def update_output_file_name(self, source_file):
-        curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
-        source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
-        file_name = '{}_del_result_{}{}'.format(source_file_name, curr_datetime, source_file_extension)
-        return file_name
+        from deletion import delete_result_file_name
+
+        return delete_result_file_name(source_file)
 
     def parse_pages_range(self, parse_string):
-        result = []
-        for part in parse_string.split(','):
-            x = part.split('-')
-            result.extend(range(int(x[0]), int(x[-1]) + 1))
-        return result
+        return PageRange.parse(parse_string, self.page_count)
@@ -1,205 +1,39 @@
-import datetime
 import logging
 import os
-import shutil
-import tempfile
-import threading
-import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from pypdf import PdfWriter, PdfReader
+from PageRangeTab import PAGE_RANGE_EXAMPLE, PageRangeTab
+from pagerange import PageRange
+from jobqueue import INTERACTIVE, scheduler
+from progress import ProgressMonitor, update_progressbar
 
 
-class PbPExtractThread(threading.Thread):
-    def __init__(self, source_file_path, pdf_reader, output_path, output_dir_name, status_label=None):
-        super().__init__()
-        self.source_file_path = source_file_path
-        self.pdf_reader = pdf_reader
-        self.output_path = output_path
-        self.output_dir_name = output_dir_name
-        self.status_label = status_label
-        self.warning_message = ''
-
-    def run(self):
-        logging.info('**** The page by page extraction session is started... ****')
-        try:
-            logging.info('Creating directory is started...')
-            os.makedirs(os.path.join(self.output_path, self.output_dir_name))
-            logging.info(
-                'The directory \"{}\" was created'.format(os.path.join(self.output_path, self.output_dir_name)))
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message(str(ex))
-            return
-        output_filename = os.path.splitext(os.path.basename(self.source_file_path))[0]
-        logging.info('Extraction pages is begun...')
-        start_time = time.time()
-        page_count = len(self.pdf_reader.pages)
-        tmp_file_path = None
-        for i, page in enumerate(self.pdf_reader.pages):
-            pdf_writer = PdfWriter()
-            try:
-                tmp_file = tempfile.TemporaryFile()
-                tmp_file_path = os.path.join(tempfile.gettempdir(), str(tmp_file.name))
-                tmp_file.close()
-
-                if self.status_label:
-                    self.status_label['text'] = 'Extracting page progress: extracted {} of {}...'.format(i+1, page_count)
-                pdf_writer.add_page(page)
-                pdf_writer.write(tmp_file_path )
-
-                shutil.copyfile(src=tmp_file_path, dst=os.path.join(self.output_path,
-                                                                    self.output_dir_name,
-                                                                    "Page {} - {}.pdf".format(i + 1, output_filename)))
-
-            except Exception as ex:
-                logging.error(ex)
-                self.set_message(str(ex))
-                try:
-                    logging.info('Starting a deleting directory...')
-                    shutil.rmtree(self.output_path)
-                    logging.info('The directory \"{}\" was deleted'.format(self.output_path))
-                except Exception as ex:
-                    logging.error(ex)
-                    self.set_message(str(ex))
-            finally:
-                pdf_writer.close()
-                try:
-                    if os.path.exists(tmp_file_path):
-                        os.remove(tmp_file_path)
-                except Exception as ex:
-                    logging.error(ex)
-
-        stop_time = time.time()
-        logging.info('Extraction pages is finished')
-        logging.info('Extraction pages time: {}'.format(stop_time - start_time))
-        logging.info('**** The page by page extraction session is finished ****')
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
-
-
-class RangeExtractThread(threading.Thread):
-    def __init__(self, pdf_reader, output_path, pages_range, status_label=None):
-        super().__init__()
-        self.pdf_reader = pdf_reader
-        self.output_path = output_path
-        self.pages_range = pages_range
-        self.status_label = status_label
-        self.warning_message = ''
-
-    def run(self):
-        tmp_file_path = None
-        pdf_writer = PdfWriter()
-        try:
-            logging.info('**** The page range extraction session is started... ****')
-            logging.info('Extraction pages is begun...')
-            start_time = time.time()
-            page_count = len(self.pages_range)
-            for i, page_number in enumerate(self.pages_range):
-                pdf_writer.add_page(self.pdf_reader.pages[page_number - 1])
-                if self.status_label:
-                    self.status_label['text'] = 'Extracting page progress: extracted {} of {}...'.format(i+1, page_count)
-
-            stop_time = time.time()
-            logging.info('Extraction pages is finished')
-            logging.info('Extraction pages time: {}'.format(stop_time - start_time))
-
-            tmp_file = tempfile.TemporaryFile()
-            tmp_file_path = os.path.join(tempfile.gettempdir(), str(tmp_file.name))
-            tmp_file.close()
-
-            logging.info('The writing to the temporary file is started...')
-            start_time = time.time()
-            if self.status_label:
-                self.status_label['text'] = 'Extracting page progress: writing result file...'
-
-            pdf_writer.write(tmp_file_path)
-
-            stop_time = time.time()
-            logging.info('The writing to the temporary file is finished')
-            logging.info('Writing to tmp file time: {}'.format(stop_time - start_time))
-
-            logging.info('Starting copying file...')
-            start_time = time.time()
-            shutil.copyfile(src=tmp_file_path, dst=self.output_path)
-            stop_time = time.time()
-            logging.info('The copying file is finished')
-            logging.info('Copying time: {}'.format(stop_time - start_time))
-
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message(str(ex))
-            return
-        finally:
-            pdf_writer.close()
-            try:
-                if os.path.exists(tmp_file_path):
-                    os.remove(tmp_file_path)
-            except Exception as ex:
-                logging.error(ex)
-        logging.info('**** The page range extraction session is finished ****')
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
-
-
-class OpenPDFFileThread(threading.Thread):
-    def __init__(self, source_file_path):
-        super().__init__()
-        self.source_file_path = source_file_path
-        self.pdf_reader = None
-        self.warning_message = ''
-
-    def run(self):
-        logging.info('**** Starting the loading pdf file session... ****')
-        start_time = time.time()
-        logging.info('Start loading...')
-        try:
-            pdf_reader = PdfReader(self.source_file_path)
-            self.set_pdf_reader(pdf_reader)
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message(str(ex))
-        stop_time = time.time()
-        logging.info('Loading is finished')
-        logging.info('Loading time: {}'.format(stop_time - start_time))
-        logging.info('**** The loading pdf file session is finished ****')
-
-    def set_pdf_reader(self, pdf_reader):
-        self.pdf_reader = pdf_reader
-
-    def get_pdf_reader(self):
-        return self.pdf_reader
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
-
-
-class Extractor(ttk.Frame):
+class Extractor(PageRangeTab, ttk.Frame):
     def __init__(self, container, input_file=''):
         super().__init__(container)
         self.extracting_page_progress = None
         self.pages_number_title = None
         self.pdf_reader = None
+        self.page_count = 0
         self.page_range_example_title = None
         self.source_file_path = None
+        self.page_range_text = None
         self.page_range_entry = None
+        self.page_index = None
+        self.page_index_job = None
         self.extr_type_combobox_values = None
         self.extr_type_combobox = None
+        self.workers_frame = None
+        self.workers_spinbox = None
+        self.split_value_frame = None
+        self.split_value_title = None
+        self.split_value_spinbox = None
         self.extract_button = None
         self.extract_pbar = None
         self.extract_pbar_frame = None
+        self.cancel_button = None
+        self.running_thread = None
         self.input_file_name = None
         self.open_file_button = None
 
@@ -249,7 +83,8 @@ class Extractor(ttk.Frame):
         extr_type_title = ttk.Label(extr_type_frame, text='Extraction type:')
         extr_type_title.grid(column=0, row=0, sticky=tk.E, padx=(5, 0), pady=(0, 0))
 
-        self.extr_type_combobox_values = ('Page by Page', 'Pages range')
+        self.extr_type_combobox_values = ('Page by Page', 'Pages range', 'Every N pages', 'Maximum file size',
+                                          'Top-level bookmarks')
         self.extr_type_combobox = ttk.Combobox(extr_type_frame)
         self.extr_type_combobox['values'] = self.extr_type_combobox_values
         self.extr_type_combobox['state'] = 'readonly'
@@ -258,16 +93,45 @@ class Extractor(ttk.Frame):
         def extr_type_combobox_change_item(event):
             self.page_range_entry.grid_remove()
             self.page_range_example_title.grid_remove()
+            self.workers_frame.grid_remove()
+            self.split_value_frame.grid_remove()
             if self.extr_type_combobox.get() == self.extr_type_combobox_values[1]:
                 self.page_range_entry.grid(column=2, row=0, sticky=tk.EW, padx=(5, 5), pady=(0, 0))
                 self.page_range_example_title.grid(column=2, row=1, sticky=tk.EW, padx=(5, 5), pady=(0, 0))
+            elif self.extr_type_combobox.get() == self.extr_type_combobox_values[0]:
+                self.workers_frame.grid(column=2, row=0, sticky=tk.W, padx=(5, 5), pady=(0, 0))
+            elif self.extr_type_combobox.get() in self.extr_type_combobox_values[2:4]:
+                is_pages = self.extr_type_combobox.get() == self.extr_type_combobox_values[2]
+                self.split_value_title['text'] = 'Pages per file:' if is_pages else 'MB per file:'
+                self.split_value_spinbox.set(100 if is_pages else 10)
+                self.split_value_frame.grid(column=2, row=0, sticky=tk.W, padx=(5, 5), pady=(0, 0))
 
         self.extr_type_combobox.bind('<<ComboboxSelected>>', extr_type_combobox_change_item)
         self.extr_type_combobox.grid(column=1, row=0, sticky=tk.EW, padx=(5, 0), pady=(0, 0))
 
-        self.page_range_entry = ttk.Entry(extr_type_frame)
-
-        self.page_range_example_title = ttk.Label(extr_type_frame, text='e.g. 3-7,9,14-17', font=('', 7))
+        self.page_range_text = tk.StringVar()
+        self.page_range_text.trace_add('write', lambda *args: self.update_range_summary())
+        self.page_range_entry = ttk.Entry(extr_type_frame, textvariable=self.page_range_text)
+
+        # Number of processes for the page by page extraction
+        self.workers_frame = ttk.Frame(extr_type_frame)
+        workers_title = ttk.Label(self.workers_frame, text='Processes:')
+        workers_title.grid(column=0, row=0, sticky=tk.E, padx=(0, 5), pady=(0, 0))
+        cpu_count = os.cpu_count() or 1
+        self.workers_spinbox = ttk.Spinbox(self.workers_frame, from_=1, to=cpu_count, width=4, state='readonly')
+        # One process by default, more are for the user to choose on a large document
+        self.workers_spinbox.set(1)
+        self.workers_spinbox.grid(column=1, row=0, sticky=tk.W, pady=(0, 0))
+        self.workers_frame.grid(column=2, row=0, sticky=tk.W, padx=(5, 5), pady=(0, 0))
+
+        # Pages or megabytes per file for the split modes
+        self.split_value_frame = ttk.Frame(extr_type_frame)
+        self.split_value_title = ttk.Label(self.split_value_frame, text='Pages per file:')
+        self.split_value_title.grid(column=0, row=0, sticky=tk.E, padx=(0, 5), pady=(0, 0))
+        self.split_value_spinbox = ttk.Spinbox(self.split_value_frame, from_=1, to=100000, width=7)
+        self.split_value_spinbox.grid(column=1, row=0, sticky=tk.W, pady=(0, 0))
+
+        self.page_range_example_title = ttk.Label(extr_type_frame, text=PAGE_RANGE_EXAMPLE, font=('', 7))
 
         self.extracting_page_progress = ttk.Label(extr_type_frame)
 
@@ -298,6 +162,9 @@ class Extractor(ttk.Frame):
         self.extract_pbar = ttk.Progressbar(self.extract_pbar_frame, orient=tk.HORIZONTAL, mode='indeterminate')
         self.extract_pbar.grid(column=1, row=0, sticky=tk.EW, padx=0)
 
+        self.cancel_button = ttk.Button(self.extract_pbar_frame, text='Cancel', command=self.cancel_thread)
+        self.cancel_button.grid(column=2, row=0, sticky=tk.E, padx=(5, 0))
+
         pbar_frame.columnconfigure(0, weight=1)
         pbar_frame.grid(column=0, row=7, sticky=tk.EW, padx=5)
 
@@ -310,6 +177,9 @@ class Extractor(ttk.Frame):
         extractor_frame.grid(column=0, row=0, sticky=tk.NSEW)
 
     def extract_pages(self):
+        # The workers import pypdf, they are loaded when the first document is opened
+        from extraction import PbPExtractThread, RangeExtractThread, SplitThread
+
         message_nothing_to_do = 'Nothing to do...\nPlease choose a Source File'
         if self.extr_type_combobox.get() == self.extr_type_combobox_values[1]:
             if not self.input_file_name['text']:
@@ -325,15 +195,10 @@ class Extractor(ttk.Frame):
             try:
                 if output_path:
                     pages_range = self.parse_pages_range(self.page_range_entry.get())
-                    if max(pages_range) > len(self.pdf_reader.pages):
-                        messagebox.showwarning(title='Warning!', message='Page range is not correct!')
-                        return
-                    self.start_thread()
                     range_extract_thread = RangeExtractThread(self.pdf_reader, output_path, pages_range,
-                                                              self.extracting_page_progress)
-                    range_extract_thread.start()
-                    self.range_extract_thread_monitor(thread=range_extract_thread, pdf_reader=self.pdf_reader,
-                                                      output_path=output_path, pages_range=pages_range)
+                                                              source_file_path=self.source_file_path)
+                    self.submit_job(range_extract_thread, 'Extract pages {} to {}'.format(
+                        self.page_range_entry.get().strip(), os.path.basename(output_path)))
             except ValueError as ex:
                 logging.error(ex)
                 messagebox.showwarning(title='Warning!', message='Invalid range format!\n{}'.format(str(ex)))
@@ -353,70 +218,129 @@ class Extractor(ttk.Frame):
             output_path = filedialog.askdirectory(title='Save to...', initialdir=output_path)
             try:
                 if output_path:
-                    self.start_thread()
                     pbp_extract_thread = PbPExtractThread(self.source_file_path, self.pdf_reader, output_path,
-                                                          output_dir_name, self.extracting_page_progress)
-                    pbp_extract_thread.start()
-                    self.pbp_extract_thread_monitor(thread=pbp_extract_thread, source_file_path=self.source_file_path,
-                                                    pdf_reader=self.pdf_reader, output_path=output_path,
-                                                    output_dir_name=output_dir_name)
+                                                          output_dir_name, workers=int(self.workers_spinbox.get()))
+                    self.submit_job(pbp_extract_thread, 'Extract every page of {}'.format(
+                        os.path.basename(self.source_file_path)))
             except Exception as ex:
                 logging.error(ex)
                 self.stop_thread()
                 self.extracting_page_progress.grid_remove()
                 messagebox.showwarning(title='Warning!', message='Something went wrong...')
 
-    def range_extract_thread_monitor(self, thread, pdf_reader, output_path, pages_range):
-        self.extracting_page_progress.grid(columnspan=3, column=0, row=2, sticky=tk.EW, padx=(5, 5), pady=(10, 0))
-        if thread.is_alive():
-            self.after(100, lambda: self.range_extract_thread_monitor(thread=thread, pdf_reader=pdf_reader,
-                                                                      output_path=output_path, pages_range=pages_range))
         else:
-            self.extracting_page_progress.grid_remove()
-            self.stop_thread()
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            if not self.input_file_name['text']:
+                tk.messagebox.showinfo('Information...', message_nothing_to_do)
+                return
+            split_modes = dict(zip(self.extr_type_combobox_values[2:], ('pages', 'size', 'bookmarks')))
+            mode = split_modes[self.extr_type_combobox.get()]
+            output_dir_name = self.update_output_dir_name(self.source_file_path)
+            output_path = os.path.dirname(self.source_file_path)
+            output_path = filedialog.askdirectory(title='Save to...', initialdir=output_path)
+            try:
+                if output_path:
+                    value = None
+                    if mode == 'pages':
+                        value = int(self.split_value_spinbox.get())
+                    elif mode == 'size':
+                        value = float(self.split_value_spinbox.get())
+                    split_thread = SplitThread(self.source_file_path, self.pdf_reader, output_path, output_dir_name,
+                                               mode, value)
+                    self.submit_job(split_thread, 'Split {} ({})'.format(
+                        os.path.basename(self.source_file_path), self.extr_type_combobox.get().lower()))
+            except ValueError as ex:
+                logging.error(ex)
+                messagebox.showwarning(title='Warning!', message='Invalid split format!\n{}'.format(str(ex)))
+                return
+            except Exception as ex:
+                logging.error(ex)
+                self.stop_thread()
+                self.extracting_page_progress.grid_remove()
+                messagebox.showwarning(title='Warning!', message='Something went wrong...')
 
-    def pbp_extract_thread_monitor(self, thread, source_file_path, pdf_reader, output_path, output_dir_name):
+    def job_thread_monitor(self, thread):
+        self.running_thread = thread
+        self.cancel_button['state'] = tk.NORMAL
+        self.extracting_page_progress['text'] = 'Waiting in the queue...'
         self.extracting_page_progress.grid(columnspan=3, column=0, row=2, sticky=tk.EW, padx=(5, 5), pady=(10, 0))
-        if thread.is_alive():
-            self.after(100, lambda: self.pbp_extract_thread_monitor(thread=thread, source_file_path=source_file_path,
-                                                                    pdf_reader=pdf_reader, output_path=output_path,
-                                                                    output_dir_name=output_dir_name))
-        else:
+        self.show_pbar()
+        ProgressMonitor(self, thread.progress, lambda event: self.show_job_progress(thread, event),
+                        lambda: self.extract_thread_finished(thread)).start()
+
+    def show_progress(self, event):
+        self.extracting_page_progress['text'] = event.describe()
+        update_progressbar(self.extract_pbar, event)
+
+    def show_job_progress(self, thread, event):
+        # Only the last submitted job is shown here, all of them are listed on the Jobs tab
+        if thread is self.running_thread:
+            self.show_progress(event)
+
+    def extract_thread_finished(self, thread):
+        from documents import registry
+
+        registry.release(thread.pdf_reader)
+        if thread is self.running_thread:
+            self.running_thread = None
             self.extracting_page_progress.grid_remove()
-            self.stop_thread()
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            self.hide_pbar()
+        if thread.get_message() and not thread.cancel_token.is_cancelled():
+            messagebox.showwarning(title='Warning!', message=thread.get_message())
 
-    def open_pdf_file_thread_monitor(self, thread, source_file_path):
-        if thread.is_alive():
-            self.after(100, lambda: self.open_pdf_file_thread_monitor(thread=thread, source_file_path=source_file_path))
+    def open_pdf_file_thread_finished(self, thread):
+        self.stop_thread()
+        self.pdf_reader = thread.get_pdf_reader()
+        if self.pdf_reader:
+            self.page_count = thread.page_count
+            self.show_document_info(self.page_count, thread.document_info.describe() if thread.document_info else '')
+            self.start_page_index()
         else:
-            self.stop_thread()
-            self.pdf_reader = thread.get_pdf_reader()
-            self.pages_number_title['text'] = 'The number of pages is {}'.format(len(self.pdf_reader.pages))
-            self.input_file_name['text'] = os.path.basename(self.source_file_path)
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            self.page_count = 0
+            self.pages_number_title['text'] = ''
+            self.input_file_name['text'] = ''
+        self.update_range_summary()
+        if thread.get_message():
+            messagebox.showwarning(title='Warning!', message=thread.get_message())
+
+    def cancel_thread(self):
+        if self.running_thread:
+            self.running_thread.cancel()
+            self.cancel_button['state'] = tk.DISABLED
+            self.extracting_page_progress['text'] = 'Cancelling...'
 
     def start_thread(self):
         self.extract_button['state'] = tk.DISABLED
         self.open_file_button['state'] = tk.DISABLED
         self.extr_type_combobox['state'] = tk.DISABLED
         self.page_range_entry['state'] = tk.DISABLED
-        self.extract_pbar_frame.grid(column=0, row=0, sticky=tk.EW, padx=0)
-        self.extract_pbar.start(10)
+        self.workers_spinbox['state'] = tk.DISABLED
+        self.split_value_spinbox['state'] = tk.DISABLED
+        if self.running_thread is None:
+            self.cancel_button['state'] = tk.DISABLED
+            self.show_pbar()
 
     def stop_thread(self):
         self.extract_button['state'] = tk.NORMAL
         self.open_file_button['state'] = tk.NORMAL
         self.extr_type_combobox['state'] = tk.NORMAL
         self.page_range_entry['state'] = tk.NORMAL
+        self.workers_spinbox['state'] = 'readonly'
+        self.split_value_spinbox['state'] = tk.NORMAL
+        if self.running_thread is None:
+            self.hide_pbar()
+
+    def show_pbar(self):
+        self.extract_pbar_frame.grid(column=0, row=0, sticky=tk.EW, padx=0)
+        self.extract_pbar.configure(mode='indeterminate', value=0)
+        self.extract_pbar.start(10)
+
+    def hide_pbar(self):
         self.extract_pbar.stop()
         self.extract_pbar_frame.grid_remove()
 
     def open_file(self, file_path=''):
+        from documents import OpenPDFFileThread, registry
+
         if not file_path:
             file_path = filedialog.askopenfilename(title='Open File', filetypes=(('PDF Files', '*.pdf'),))
         if not file_path:
@@ -425,13 +349,22 @@ class Extractor(ttk.Frame):
         self.page_range_entry.delete(0, tk.END)
         self.pages_number_title['text'] = ''
         self.input_file_name['text'] = ''
+        if self.page_index_job is not None:
+            scheduler.cancel(self.page_index_job)
+            self.page_index_job = None
+        self.page_index = None
         if self.pdf_reader:
-            self.pdf_reader.stream.close()
+            registry.release(self.pdf_reader)
+            self.pdf_reader = None
+        self.page_count = 0
         try:
             self.start_thread()
             open_pdf_file_thread = OpenPDFFileThread(self.source_file_path)
-            open_pdf_file_thread.start()
-            self.open_pdf_file_thread_monitor(open_pdf_file_thread, self.source_file_path)
+            scheduler.submit(open_pdf_file_thread, 'Open {}'.format(os.path.basename(self.source_file_path)),
+                             INTERACTIVE)
+            ProgressMonitor(self, open_pdf_file_thread.progress,
+                            lambda event: self.show_open_progress(open_pdf_file_thread, event),
+                            lambda: self.open_pdf_file_thread_finished(open_pdf_file_thread)).start()
         except Exception as ex:
             logging.error(ex)
             self.stop_thread()
@@ -439,20 +372,14 @@ class Extractor(ttk.Frame):
             return
 
     def update_output_dir_name(self, source_file):
-        curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
-        source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
-        dir_name = '{}_extr_result_{}'.format(source_file_name, curr_datetime)
-        return dir_name
+        from extraction import extract_result_dir_name
+
+        return extract_result_dir_name(source_file)
 
     def update_output_file_name(self, source_file):
-        curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
-        source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
-        file_name = '{}_extr_result_{}{}'.format(source_file_name, curr_datetime, source_file_extension)
-        return file_name
+        from extraction import extract_result_file_name
+
+        return extract_result_file_name(source_file)
 
     def parse_pages_range(self, parse_string):
-        result = []
-        for part in parse_string.split(','):
-            x = part.split('-')
-            result.extend(range(int(x[0]), int(x[-1]) + 1))
-        return result
+        return PageRange.parse(parse_string, self.page_count)
@@ -0,0 +1,94 @@
+import tkinter as tk
+from tkinter import ttk
+
+from jobqueue import QUEUED, RUNNING, scheduler
+from progress import format_duration
+
+REFRESH_INTERVAL_MS = 500
+
+
+class Jobs(ttk.Frame):
+    def __init__(self, container):
+        super().__init__(container)
+        self.jobs_tree = None
+        self.cancel_button = None
+        self.clear_button = None
+        self.jobs_label_status = None
+        self.job_items = {}
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        jobs_frame = ttk.Frame(self)
+
+        jobs_frame.columnconfigure(0, weight=1)
+        jobs_frame.rowconfigure(0, weight=1)
+
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=('status', 'progress', 'time'), selectmode=tk.EXTENDED)
+        self.jobs_tree.heading('#0', text='Job', anchor=tk.W)
+        self.jobs_tree.heading('status', text='Status', anchor=tk.W)
+        self.jobs_tree.heading('progress', text='Progress', anchor=tk.W)
+        self.jobs_tree.heading('time', text='Time', anchor=tk.W)
+        self.jobs_tree.column('#0', width=200, stretch=True)
+        self.jobs_tree.column('status', width=70, stretch=False)
+        self.jobs_tree.column('progress', width=200, stretch=True)
+        self.jobs_tree.column('time', width=70, stretch=False)
+        self.jobs_tree.grid(column=0, row=0, rowspan=3, sticky=tk.NSEW, padx=(5, 0), pady=5)
+
+        jobs_scrollbar = ttk.Scrollbar(jobs_frame, orient=tk.VERTICAL, command=self.jobs_tree.yview)
+        self.jobs_tree.configure(yscrollcommand=jobs_scrollbar.set)
+        jobs_scrollbar.grid(column=1, row=0, rowspan=3, sticky=tk.NS, pady=5)
+
+        self.cancel_button = ttk.Button(jobs_frame, text='Cancel', command=self.cancel_jobs)
+        self.cancel_button.grid(column=2, row=0, sticky=tk.EW, padx=5, pady=5)
+
+        self.clear_button = ttk.Button(jobs_frame, text='Clear', command=self.clear_finished_jobs)
+        self.clear_button.grid(column=2, row=1, sticky=tk.EW, padx=5)
+
+        separator_top = ttk.Separator(jobs_frame, orient='horizontal')
+        separator_top.grid(columnspan=3, column=0, row=3, sticky=tk.EW, pady=(0, 5), padx=5)
+
+        self.jobs_label_status = ttk.Label(jobs_frame, text='')
+        self.jobs_label_status.grid(columnspan=3, column=0, row=4, sticky=tk.W, padx=5)
+
+        separator_bottom = ttk.Separator(self, orient='horizontal')
+        separator_bottom.grid(columnspan=2, column=0, row=5, sticky=tk.EW, pady=(5, 5), padx=5)
+
+        jobs_frame.grid(column=0, row=0, sticky=tk.NSEW)
+
+    def refresh(self):
+        # The queue is polled, the workers never touch the widgets
+        jobs = scheduler.snapshot()
+        job_ids = set()
+        for job in jobs:
+            job_ids.add(job.job_id)
+            elapsed = job.elapsed()
+            values = (job.status, job.describe_progress(), format_duration(elapsed) if elapsed is not None else '')
+            if job.job_id in self.job_items:
+                self.jobs_tree.item(self.job_items[job.job_id][0], values=values)
+            else:
+                item = self.jobs_tree.insert('', tk.END, text=job.title, values=values)
+                self.job_items[job.job_id] = (item, job)
+        for job_id in set(self.job_items) - job_ids:
+            self.jobs_tree.delete(self.job_items.pop(job_id)[0])
+
+        running = sum(1 for job in jobs if job.status == RUNNING)
+        queued = sum(1 for job in jobs if job.status == QUEUED)
+        self.jobs_label_status['text'] = 'Running: {}, queued: {}, workers: {} + {} interactive'.format(
+            running, queued, scheduler.max_workers, scheduler.interactive_workers)
+        self.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def selected_jobs(self):
+        selected_items = set(self.jobs_tree.selection())
+        return [job for item, job in self.job_items.values() if item in selected_items]
+
+    def cancel_jobs(self):
+        for job in self.selected_jobs():
+            scheduler.cancel(job)
+
+    def clear_finished_jobs(self):
+        scheduler.clear_finished()
@@ -0,0 +1,95 @@
+import logging
+import os
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import Merger, Extractor, Deleter, Pipeline, Jobs
+from jobqueue import scheduler
+
+
+class MainWindow(tk.Tk):
+    def __init__(self, filelist=[]):
+        super().__init__()
+        self.app_path = os.path.normpath(os.getcwd())
+
+        self.title('Magic PDF')
+        try:
+            icon_img = tk.PhotoImage(file=os.path.normpath(os.path.join(self.app_path,'images/main_icon_32.png')))
+            self.iconphoto(True, icon_img)
+        except tk.TclError as err:
+            logging.error(err)
+        self.minsize(width=480, height=360)
+        self.geometry('640x480')
+        self.attributes('-alpha', 1)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.create_menu()
+        self.create_widgets(filelist)
+
+    def create_menu(self):
+        # Create a menubar
+        menubar = tk.Menu(self)
+        self.config(menu=menubar)
+ 
+        # Create a File menu
+        file_menu = tk.Menu(menubar, tearoff=False)
+        # Create a submenu of File menu
+        file_menu.add_command(label='Exit', command=self.destroy)
+
+        # Create the Help menu
+        help_menu = tk.Menu(menubar, tearoff=False)
+        # Add the Help menu items to the menu
+        help_menu.add_command(label='About...', command=self.show_about)
+ 
+        # Add the File menu to the menubar
+        menubar.add_cascade(label='File', menu=file_menu, underline=0)
+        # Add the Help menu to the menubar
+        menubar.add_cascade(label='Help', menu=help_menu, underline=0)
+
+    def create_widgets(self, filelist=[]):
+        self.notebook = ttk.Notebook()
+        self.notebook.columnconfigure(0, weight=1)
+        self.notebook.rowconfigure(0, weight=1)
+        self.notebook.grid(column=0, row=0, sticky=tk.NSEW)
+        # Only the selected tab is built, the others are built on their first selection
+        if len(filelist) != 1:
+            self.tab_factories = [lambda container: Merger.Merger(container, filelist),
+                                  lambda container: Extractor.Extractor(container),
+                                  lambda container: Deleter.Deleter(container),
+                                  lambda container: Pipeline.Pipeline(container),
+                                  lambda container: Jobs.Jobs(container)]
+        else:
+            self.tab_factories = [lambda container: Merger.Merger(container),
+                                  lambda container: Extractor.Extractor(container, filelist[0]),
+                                  lambda container: Deleter.Deleter(container, filelist[0]),
+                                  lambda container: Pipeline.Pipeline(container),
+                                  lambda container: Jobs.Jobs(container)]
+        self.tabs = [None] * len(self.tab_factories)
+        for text in ('Merge', 'Extract', 'Delete', 'Pipeline', 'Jobs'):
+            placeholder = ttk.Frame(self.notebook)
+            placeholder.columnconfigure(0, weight=1)
+            placeholder.rowconfigure(0, weight=1)
+            self.notebook.add(placeholder, text=text)
+        self.notebook.bind('<<NotebookTabChanged>>', self.build_selected_tab)
+        if len(filelist) == 1:
+            self.notebook.select(1)
+        self.build_selected_tab()
+
+    def build_selected_tab(self, event=None):
+        index = self.notebook.index(self.notebook.select())
+        if self.tabs[index] is not None:
+            return
+        placeholder = self.notebook.nametowidget(self.notebook.tabs()[index])
+        self.tabs[index] = self.tab_factories[index](placeholder)
+        self.tabs[index].grid(column=0, row=0, sticky=tk.NSEW)
+
+    def destroy(self):
+        # The running jobs are cancelled and their partial outputs removed before the program exits
+        scheduler.shutdown()
+        super().destroy()
+
+    def show_about(self):
+        about_message = 'MagicPDF ver. 0.6\n\nDesign and development by Yevhen E.\n\nUsing the pypdf library\n\n\u2764\ufe0f For Dashuta Funtik \u2764\ufe0f'
+        messagebox.showinfo(title='About...',
+                            message=about_message)
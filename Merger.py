@@ -1,144 +1,114 @@
 import datetime
 import logging
 import os
-import shutil
-import tempfile
-import threading
-import time
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from pypdf import PdfWriter
+from tkinter import ttk, filedialog, messagebox, simpledialog
 
-
-class PdfMergerThread(threading.Thread):
-    def __init__(self, in_file_list, result_file_path, is_outlines):
-        super().__init__()
-        self.in_files_list = in_file_list
-        self.result_file_path = result_file_path
-        self.is_outlines = is_outlines
-        self.warning_message = ''
-
-    def run(self):
-        tmp_file_path = None
-        pdf_writer = PdfWriter()
-        try:
-            logging.info('****Beginning merging session...****')
-            logging.info('Start appending...')
-            start_time = time.time()
-            for file_path in self.in_files_list:
-                if not os.path.exists(path=file_path):
-                    logging.warning('The file {} does not exist. The merging was not completed!'.format(file_path))
-                    logging.info('Stop appending')
-                    self.set_message('The file {} does not exist.\nThe merging was not completed!'.format(file_path))
-                    return
-                if self.is_outlines:
-                    pdf_writer.append(file_path, os.path.splitext(os.path.basename(file_path))[0])
-                else:
-                    pdf_writer.append(file_path)
-
-            stop_time = time.time()
-            logging.info('Stop appending')
-            logging.info('Append time: {}'.format(stop_time - start_time))
-
-            tmp_file = tempfile.TemporaryFile()
-            tmp_file_path = os.path.join(tempfile.gettempdir(), str(tmp_file.name))
-            tmp_file.close()
-
-            logging.info('Start writing...')
-            start_time = time.time()
-            pdf_writer.write(tmp_file_path)
-
-            stop_time = time.time()
-            logging.info('Stop writing')
-            logging.info('Write time: {}'.format(stop_time - start_time))
-
-            logging.info('Start copying file...')
-            start_time = time.time()
-            shutil.copyfile(src=tmp_file_path, dst=self.result_file_path)
-            stop_time = time.time()
-            logging.info('Stop copying file')
-            logging.info('Copying time: {}'.format(stop_time - start_time))
-        except Exception as ex:
-            logging.error(ex)
-            self.set_message('Something went wrong...')
-        finally:
-            pdf_writer.close()
-            try:
-                if os.path.exists(tmp_file_path):
-                    os.remove(tmp_file_path)
-            except Exception as ex:
-                logging.error(ex)
-            logging.info('****End merging session****')
-
-    def set_message(self, message):
-        self.warning_message = message
-
-    def get_message(self):
-        return self.warning_message
+from jobqueue import BATCH, INTERACTIVE, scheduler
+from mergelist import FolderScanThread, MergeList, PageCountThread
+from pagerange import PageRange, is_page_range_text
+from progress import ProgressMonitor, update_progressbar
+from VirtualList import VirtualList
 
 
 class Merger(ttk.Frame):
     def __init__(self, container, filelist=[]):
         super().__init__(container)
         self.is_outlines = None
+        self.is_streaming = None
+        self.is_deduplicate = None
         self.clear_items_button = None
         self.del_items_button = None
         self.add_items_button = None
+        self.add_folder_button = None
         self.files_listbox = None
+        self.list_status_label = None
+        self.merger_thread = None
+        self.folder_scan_thread = None
+        self.page_count_jobs = []
 
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
-        self.listbox_items = []
-        if filelist:
-            self.listbox_items = filelist
-            self.listbox_items.sort()
+        self.merge_list = MergeList(sorted(filelist))
 
         self.create_widgets()
+        if self.merge_list:
+            self.start_page_count(list(self.merge_list))
 
     def create_widgets(self):
         merger_frame = ttk.Frame(self)
 
         merger_frame.columnconfigure(0, weight=1)
 
-        self.files_listbox = tk.Listbox(merger_frame, relief=tk.FLAT, selectmode=tk.EXTENDED)
-        self.files_listbox.delete(0, tk.END)
-        if self.listbox_items:
-            self.files_listbox.insert(tk.END, *[os.path.basename(item) for item in self.listbox_items])
+        # Only the visible rows are in the list box, a list of thousands of files scrolls as fast as a short one
+        self.files_listbox = VirtualList(merger_frame, self.merge_list, format_row=self.format_list_row)
+        if self.merge_list:
             self.files_listbox.focus()
-            self.files_listbox.select_set(0)
-            self.files_listbox.selection_anchor(0)
-            self.files_listbox.activate(0)
-        self.files_listbox.grid(column=0, row=0, rowspan=8, sticky=tk.NSEW, padx=(5, 0), pady=5)
+            self.files_listbox.select_set([0])
+        self.files_listbox.grid(column=0, row=0, rowspan=10, sticky=tk.NSEW, padx=(5, 0), pady=5)
+
+        list_tools_frame = ttk.Frame(merger_frame)
+        list_tools_frame.columnconfigure(0, weight=1)
+
+        self.list_status_label = ttk.Label(list_tools_frame)
+        self.list_status_label.grid(column=0, row=0, sticky=tk.W)
+
+        self.load_list_button = ttk.Button(list_tools_frame, text='Load List', command=self.load_list)
+        self.load_list_button.grid(column=1, row=0, sticky=tk.E, padx=(5, 0))
+
+        self.save_list_button = ttk.Button(list_tools_frame, text='Save List', command=self.save_list)
+        self.save_list_button.grid(column=2, row=0, sticky=tk.E, padx=(5, 0))
+
+        list_tools_frame.grid(column=0, row=10, sticky=tk.EW, padx=(5, 0), pady=(0, 5))
 
         self.add_items_button = ttk.Button(merger_frame, text='Add', command=self.add_items_to_listbox)
         self.add_items_button.grid(column=1, row=0, sticky=tk.EW, padx=5, pady=5)
 
+        self.add_folder_button = ttk.Button(merger_frame, text='Add Folder', command=self.add_folder_to_listbox)
+        self.add_folder_button.grid(column=1, row=1, sticky=tk.EW, padx=5)
+
         self.del_items_button = ttk.Button(merger_frame, text='Delete', command=self.del_items_from_listbox)
-        self.del_items_button.grid(column=1, row=1, sticky=tk.EW, padx=5)
+        self.del_items_button.grid(column=1, row=2, sticky=tk.EW, padx=5, pady=5)
 
         self.clear_items_button = ttk.Button(merger_frame, text='Clear', command=self.del_all_items_from_listbox)
-        self.clear_items_button.grid(column=1, row=2, sticky=tk.EW, padx=5, pady=5)
+        self.clear_items_button.grid(column=1, row=3, sticky=tk.EW, padx=5)
+
+        self.pages_button = ttk.Button(merger_frame, text='Pages', command=self.set_pages_of_items)
+        self.pages_button.grid(column=1, row=4, sticky=tk.EW, padx=5, pady=(5, 0))
+
+        options_frame = ttk.Frame(merger_frame)
 
         self.is_outlines = tk.BooleanVar(value=True)
-        self.outlines_checkbox = ttk.Checkbutton(merger_frame, text='New Bookmarks', variable=self.is_outlines)
-        self.outlines_checkbox.grid(column=1, row=3, sticky=tk.NW, padx=5, pady=5)
+        self.outlines_checkbox = ttk.Checkbutton(options_frame, text='New Bookmarks', variable=self.is_outlines)
+        self.outlines_checkbox.grid(column=0, row=0, sticky=tk.W)
+
+        self.is_streaming = tk.BooleanVar(value=False)
+        self.streaming_checkbox = ttk.Checkbutton(options_frame, text='Low Memory', variable=self.is_streaming)
+        self.streaming_checkbox.grid(column=0, row=1, sticky=tk.W, pady=(5, 0))
+
+        self.is_deduplicate = tk.BooleanVar(value=False)
+        self.deduplicate_checkbox = ttk.Checkbutton(options_frame, text='Share Resources',
+                                                    variable=self.is_deduplicate)
+        self.deduplicate_checkbox.grid(column=0, row=2, sticky=tk.W, pady=(5, 0))
 
-        merger_frame.rowconfigure(3, weight=1)
+        options_frame.grid(column=1, row=5, sticky=tk.NW, padx=5, pady=5)
+
+        merger_frame.rowconfigure(5, weight=1)
 
         self.move_up_button = ttk.Button(merger_frame, text='Up', command=self.move_up_listbox_item)
-        self.move_up_button.grid(column=1, row=4, padx=5, sticky=tk.EW)
+        self.move_up_button.grid(column=1, row=6, padx=5, sticky=tk.EW)
 
         self.move_down_button = ttk.Button(merger_frame, text='Down', command=self.move_down_listbox_item)
-        self.move_down_button.grid(column=1, row=5, padx=5, pady=5, sticky=tk.EW)
+        self.move_down_button.grid(column=1, row=7, padx=5, pady=5, sticky=tk.EW)
 
         self.move_top_button = ttk.Button(merger_frame, text='Top', command=self.move_top_listbox_item)
-        self.move_top_button.grid(column=1, row=6, padx=5, sticky=tk.EW)
+        self.move_top_button.grid(column=1, row=8, padx=5, sticky=tk.EW)
 
         self.move_bottom_button = ttk.Button(merger_frame, text='Bottom', command=self.move_bottom_listbox_item)
-        self.move_bottom_button.grid(column=1, row=7, padx=5, pady=5, sticky=tk.EW)
+        self.move_bottom_button.grid(column=1, row=9, padx=5, pady=5, sticky=tk.EW)
 
         separator_top = ttk.Separator(merger_frame, orient='horizontal')
-        separator_top.grid(columnspan=2, column=0, row=8, sticky=tk.EW, pady=(0, 5), padx=5)
+        separator_top.grid(columnspan=2, column=0, row=11, sticky=tk.EW, pady=(0, 5), padx=5)
 
         merge_pbar_empty_frame = ttk.Frame(merger_frame)
         merge_pbar_empty_frame.columnconfigure(0, weight=1)
@@ -146,100 +116,131 @@ class Merger(ttk.Frame):
         empty_label = ttk.Label(merge_pbar_empty_frame)
         empty_label.grid(column=0, row=0, sticky=tk.EW)
 
-        merge_pbar_empty_frame.grid(column=0, row=9, sticky=tk.EW, padx=5, pady=0)
+        merge_pbar_empty_frame.grid(column=0, row=12, sticky=tk.EW, padx=5, pady=0)
 
         self.merge_pbar_frame = ttk.Frame(merger_frame)
         self.merge_pbar_frame.columnconfigure(1, weight=1)
 
-        merge_label_status = ttk.Label(self.merge_pbar_frame, text="Please wait...")
-        merge_label_status.grid(column=0, row=0, sticky=tk.W, padx=5)
+        self.merge_label_status = ttk.Label(self.merge_pbar_frame, text="Please wait...")
+        self.merge_label_status.grid(column=0, row=0, sticky=tk.W, padx=5)
         self.merge_pbar = ttk.Progressbar(self.merge_pbar_frame, orient=tk.HORIZONTAL, mode='indeterminate')
         self.merge_pbar.grid(column=1, row=0, sticky=tk.EW, padx=0)
 
+        self.cancel_button = ttk.Button(self.merge_pbar_frame, text='Cancel', command=self.cancel_merge)
+        self.cancel_button.grid(column=2, row=0, sticky=tk.E, padx=(5, 0))
+
         self.merge_button = ttk.Button(merger_frame, text='Merge', command=self.merge_files)
-        self.merge_button.grid(column=1, row=9, sticky=tk.EW, padx=5)
+        self.merge_button.grid(column=1, row=12, sticky=tk.EW, padx=5)
 
         separator_bottom = ttk.Separator(self, orient='horizontal')
-        separator_bottom.grid(columnspan=2, column=0, row=10, sticky=tk.EW, pady=(5, 5), padx=5)
+        separator_bottom.grid(columnspan=2, column=0, row=13, sticky=tk.EW, pady=(5, 5), padx=5)
 
         merger_frame.grid(column=0, row=0, sticky=tk.NSEW)
+        self.update_list_status()
+
+    def format_list_row(self, index):
+        file_path = self.merge_list[index]
+        range_text = self.merge_list.range_text(index)
+        page_count = self.merge_list.page_count(file_path)
+        text = os.path.basename(file_path)
+        if range_text:
+            text += '  [{}]'.format(range_text)
+        if page_count is not None:
+            text += '  ({} page{})'.format(page_count, '' if page_count == 1 else 's')
+        return text
+
+    def set_pages_of_items(self):
+        indexes = self.files_listbox.curselection()
+        if not indexes:
+            messagebox.showinfo(title='Information', message='Nothing selected...')
+            return
+        # The current range is offered when all the selected files have the same one
+        range_texts = {self.merge_list.range_text(index) or '' for index in indexes}
+        range_text = simpledialog.askstring(title='Pages', parent=self,
+                                            prompt='Pages of the selected files, e.g. 1-3,7 (empty for all):',
+                                            initialvalue=range_texts.pop() if len(range_texts) == 1 else '')
+        if range_text is None:
+            return
+        range_text = range_text.strip()
+        if range_text:
+            # The files counted already are checked now, the others when the merge starts
+            for index in indexes:
+                page_count = self.merge_list.page_count(self.merge_list[index])
+                try:
+                    if page_count is not None:
+                        PageRange.parse(range_text, page_count)
+                    elif not is_page_range_text(range_text):
+                        raise ValueError('Unknown page range "{}"'.format(range_text))
+                except ValueError as ex:
+                    messagebox.showwarning(title='Warning!', message='{}: {}'.format(
+                        os.path.basename(self.merge_list[index]), ex))
+                    return
+        self.merge_list.set_range_text(indexes, range_text)
+        self.refresh_list()
 
-    def move_up_listbox_item(self):
-        if not self.listbox_items or not self.files_listbox.curselection():
-            messagebox.showinfo(title='Information', message='Nothing to move...')
+    def update_list_status(self):
+        if self.folder_scan_thread is not None:
             return
+        if not self.merge_list:
+            self.list_status_label['text'] = ''
+            return
+        total, uncounted = self.merge_list.total_pages()
+        text = '{} file{}, {} page{}'.format(len(self.merge_list), '' if len(self.merge_list) == 1 else 's',
+                                             total, '' if total == 1 else 's')
+        if uncounted:
+            text += ' ({} not counted yet)'.format(uncounted)
+        self.list_status_label['text'] = text
+
+    def refresh_list(self):
+        self.files_listbox.refresh()
+        self.update_list_status()
+
+    def selected_indexes(self):
         indexes = self.files_listbox.curselection()
+        if not self.merge_list or not indexes:
+            messagebox.showinfo(title='Information', message='Nothing to move...')
+            return ()
+        return indexes
+
+    def move_items(self, indexes, delta):
+        # One pass over the list whatever the number of the selected files
+        new_indexes = self.merge_list.shift(indexes, delta)
+        self.files_listbox.select_set(new_indexes)
+        self.files_listbox.see(new_indexes[0] if delta < 0 else new_indexes[-1])
+
+    def move_up_listbox_item(self):
+        indexes = self.selected_indexes()
         if not indexes or self.files_listbox.selection_includes(0):
             return
-        for pos in indexes:
-            text = self.files_listbox.get(pos)
-            self.files_listbox.delete(pos)
-            self.files_listbox.insert(pos - 1, text)
-            text_item = self.listbox_items[pos]
-            self.listbox_items.pop(pos)
-            self.listbox_items.insert(pos - 1, text_item)
-        for index in indexes:
-            self.files_listbox.select_set(index - 1)
+        self.move_items(indexes, -1)
 
     def move_down_listbox_item(self):
-        if not self.listbox_items or not self.files_listbox.curselection():
-            messagebox.showinfo(title='Information', message='Nothing to move...')
-            return
-        indexes = self.files_listbox.curselection()
-        if not indexes or self.files_listbox.selection_includes(tk.END):
+        indexes = self.selected_indexes()
+        if not indexes or self.files_listbox.selection_includes(len(self.merge_list) - 1):
             return
-        for pos in indexes[::-1]:
-            text = self.files_listbox.get(pos)
-            self.files_listbox.delete(pos)
-            self.files_listbox.insert(pos + 1, text)
-            text_item = self.listbox_items[pos]
-            self.listbox_items.pop(pos)
-            self.listbox_items.insert(pos + 1, text_item)
-        for index in indexes:
-            self.files_listbox.select_set(index + 1)
+        self.move_items(indexes, 1)
 
     def move_top_listbox_item(self):
-        if not self.listbox_items or not self.files_listbox.curselection():
-            messagebox.showinfo(title='Information', message='Nothing to move...')
-            return
-        indexes = self.files_listbox.curselection()
+        indexes = self.selected_indexes()
         if not indexes or self.files_listbox.selection_includes(0):
             return
-        delta_index = indexes[0:1:][0]
-        for pos in indexes:
-            text = self.files_listbox.get(pos)
-            self.files_listbox.delete(pos)
-            self.files_listbox.insert(pos - delta_index, text)
-            text_item = self.listbox_items[pos]
-            self.listbox_items.pop(pos)
-            self.listbox_items.insert(pos - delta_index, text_item)
-        for index in indexes:
-            self.files_listbox.select_set(index - delta_index)
+        self.move_items(indexes, -indexes[0])
 
     def move_bottom_listbox_item(self):
-        if not self.listbox_items or not self.files_listbox.curselection():
-            messagebox.showinfo(title='Information', message='Nothing to move...')
-            return
-        indexes = self.files_listbox.curselection()
-        if not indexes or self.files_listbox.selection_includes(tk.END):
+        indexes = self.selected_indexes()
+        if not indexes or self.files_listbox.selection_includes(len(self.merge_list) - 1):
             return
-        delta_index = (len(self.listbox_items) - 1 - indexes[::-1][0])
-        for pos in indexes[::-1]:
-            text = self.files_listbox.get(pos)
-            self.files_listbox.delete(pos)
-            self.files_listbox.insert(pos + delta_index, text)
-            text_item = self.listbox_items[pos]
-            self.listbox_items.pop(pos)
-            self.listbox_items.insert(pos + delta_index, text_item)
-        for index in indexes:
-            self.files_listbox.select_set(index + delta_index)
+        self.move_items(indexes, len(self.merge_list) - 1 - indexes[-1])
 
     def merge_files(self):
-        if not self.listbox_items or len(self.listbox_items) <= 1:
+        # pypdf is imported with the merger on the first merge, not at the program start
+        from merging import PdfMergerThread
+
+        if len(self.merge_list) <= 1:
             messagebox.showinfo(title='Information', message='Nothing to merge...')
             return
         curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
-        initial_dir = os.path.dirname(self.listbox_items[0])
+        initial_dir = os.path.dirname(self.merge_list[0])
         output_path = filedialog.asksaveasfilename(title='Save As...',
                                                    filetypes=(('PDF Files', '*.pdf'), ('All Files', '*.*')),
                                                    initialdir=initial_dir,
@@ -247,55 +248,55 @@ class Merger(ttk.Frame):
                                                    defaultextension='.pdf')
         try:
             if output_path:
-                if repr(os.path.normpath(output_path)) in repr(self.listbox_items)[:]:
+                if output_path in self.merge_list:
                     messagebox.showinfo(title='Information', message='The file cannot be written to itself...')
                     return
+                # The list is copied, it can be edited for the next job while this one waits in the queue
+                merger_thread = PdfMergerThread(in_file_list=list(self.merge_list), result_file_path=output_path,
+                                                is_outlines=self.is_outlines.get(),
+                                                streaming=self.is_streaming.get(),
+                                                deduplicate=self.is_deduplicate.get(),
+                                                page_ranges=list(self.merge_list.range_texts))
                 self.start_merge()
-                merger_thread = PdfMergerThread(in_file_list=self.listbox_items, result_file_path=output_path,
-                                                is_outlines=self.is_outlines.get())
-                merger_thread.start()
-                self.merger_thread_monitor(merger_thread, in_file_list=self.listbox_items, result_file_path=output_path,
-                                           is_outlines=self.is_outlines.get())
+                self.merger_thread = merger_thread
+                scheduler.submit(merger_thread, 'Merge {} files into {}'.format(len(self.merge_list),
+                                                                               os.path.basename(output_path)))
+                ProgressMonitor(self, merger_thread.progress, lambda event: self.show_progress(merger_thread, event),
+                                lambda: self.merger_thread_finished(merger_thread)).start()
         except Exception as ex:
             logging.error(ex)
+            self.merger_thread = None
             self.stop_merge()
             messagebox.showwarning(title='Warning!', message='Something went wrong...')
 
-    def merger_thread_monitor(self, thread, in_file_list, result_file_path, is_outlines):
-        if thread.is_alive():
-            self.after(100, lambda: self.merger_thread_monitor(thread=thread, in_file_list=in_file_list,
-                                                               result_file_path=result_file_path,
-                                                               is_outlines=is_outlines))
-        else:
+    def show_progress(self, thread, event):
+        # Only the last submitted merge is shown here, all of them are listed on the Jobs tab
+        if thread is not self.merger_thread:
+            return
+        self.merge_label_status['text'] = event.describe()
+        update_progressbar(self.merge_pbar, event)
+
+    def merger_thread_finished(self, thread):
+        if thread is self.merger_thread:
+            self.merger_thread = None
             self.stop_merge()
-            if thread.get_message():
-                messagebox.showwarning(title='Warning!', message=thread.get_message())
+        if thread.get_message() and not thread.cancel_token.is_cancelled():
+            messagebox.showwarning(title='Warning!', message=thread.get_message())
+
+    def cancel_merge(self):
+        if self.merger_thread:
+            self.merger_thread.cancel()
+            self.cancel_button['state'] = tk.DISABLED
+            self.merge_label_status['text'] = 'Cancelling...'
 
     def start_merge(self):
-        self.merge_button['state'] = tk.DISABLED
-        self.add_items_button['state'] = tk.DISABLED
-        self.del_items_button['state'] = tk.DISABLED
-        self.clear_items_button['state'] = tk.DISABLED
-        self.outlines_checkbox['state'] = tk.DISABLED
-        self.move_up_button['state'] = tk.DISABLED
-        self.move_down_button['state'] = tk.DISABLED
-        self.move_top_button['state'] = tk.DISABLED
-        self.move_bottom_button['state'] = tk.DISABLED
-
-        self.merge_pbar_frame.grid(column=0, row=9, sticky=tk.EW, padx=0)
+        self.cancel_button['state'] = tk.NORMAL
+        self.merge_label_status['text'] = 'Waiting in the queue...'
+        self.merge_pbar_frame.grid(column=0, row=12, sticky=tk.EW, padx=0)
+        self.merge_pbar.configure(mode='indeterminate', value=0)
         self.merge_pbar.start(10)
 
     def stop_merge(self):
-        self.merge_button['state'] = tk.NORMAL
-        self.add_items_button['state'] = tk.NORMAL
-        self.del_items_button['state'] = tk.NORMAL
-        self.clear_items_button['state'] = tk.NORMAL
-        self.outlines_checkbox['state'] = tk.NORMAL
-        self.move_up_button['state'] = tk.NORMAL
-        self.move_down_button['state'] = tk.NORMAL
-        self.move_top_button['state'] = tk.NORMAL
-        self.move_bottom_button['state'] = tk.NORMAL
-
         self.merge_pbar.stop()
         self.merge_pbar_frame.grid_remove()
 
@@ -303,40 +304,154 @@ class Merger(ttk.Frame):
         files = list(
             filedialog.askopenfilenames(title='Open File(s)', filetypes=(('PDF Files', '*.pdf'),)))
         if files:
-            if self.listbox_items:
+            if self.merge_list:
                 self.del_all_items_from_listbox()
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    self.files_listbox.insert(tk.END, os.path.basename(file))
-                    self.listbox_items.append(os.path.normpath(file))
-            if self.listbox_items: self.files_listbox.select_set(0)
+            self.add_files([file for file in files if file.lower().endswith('.pdf')], skip_duplicates=False)
+            if self.merge_list: self.files_listbox.select_set([0])
 
     def add_items_to_listbox(self):
         files = list(
             filedialog.askopenfilenames(title='Open File(s)', filetypes=(('PDF Files', '*.pdf'),)))
-        if files:
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    if os.path.basename(file) in set(self.files_listbox.get(0, tk.END)):
-                        ask_message = 'The file "{}" is exist in the list\n\nDo you want to add it?'.format(os.path.basename(file))
-                        if not messagebox.askyesno(title='Information',
-                                                   message=ask_message):
-                            continue
-                    self.files_listbox.insert(tk.END, os.path.basename(file))
-                    self.listbox_items.append(os.path.normpath(file))
+        new_files = []
+        for file in files:
+            if file.lower().endswith('.pdf'):
+                if file in self.merge_list:
+                    ask_message = 'The file "{}" is exist in the list\n\nDo you want to add it?'.format(os.path.basename(file))
+                    if not messagebox.askyesno(title='Information',
+                                               message=ask_message):
+                        continue
+                new_files.append(file)
+        self.add_files(new_files, skip_duplicates=False)
+
+    def add_files(self, file_paths, skip_duplicates):
+        added, skipped = self.merge_list.add(file_paths, skip_duplicates)
+        if added:
+            self.start_page_count(self.merge_list[-added:])
+        self.refresh_list()
+        return skipped
+
+    def add_folder_to_listbox(self):
+        folder = filedialog.askdirectory(title='Add Folder', mustexist=True)
+        if not folder:
+            return
+        thread = FolderScanThread(os.path.normpath(folder))
+        try:
+            scheduler.submit(thread, 'Scan {}'.format(os.path.basename(thread.folder) or thread.folder), INTERACTIVE)
+        except Exception as ex:
+            logging.error(ex)
+            messagebox.showwarning(title='Warning!', message='Something went wrong...')
+            return
+        self.folder_scan_thread = thread
+        self.add_folder_button['state'] = tk.DISABLED
+        self.list_status_label['text'] = 'Scanning {}...'.format(thread.folder)
+        ProgressMonitor(self, thread.progress, lambda event: self.show_scan_progress(event),
+                        lambda: self.folder_scan_thread_finished(thread)).start()
+
+    def show_scan_progress(self, event):
+        self.list_status_label['text'] = 'Scanning... {} PDF files found'.format(event.done)
+
+    def folder_scan_thread_finished(self, thread):
+        self.folder_scan_thread = None
+        self.add_folder_button['state'] = tk.NORMAL
+        if thread.get_message():
+            self.update_list_status()
+            if not thread.cancel_token.is_cancelled():
+                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            return
+        # The files of the folder come in one go, the ones in the list already are skipped without asking
+        skipped = self.add_files(thread.file_paths, skip_duplicates=True)
+        if not thread.file_paths:
+            messagebox.showinfo(title='Information', message='No PDF files in the folder...')
+        elif skipped:
+            messagebox.showinfo(title='Information',
+                                message='{} of {} files are in the list already and were skipped'.format(
+                                    skipped, len(thread.file_paths)))
+
+    def start_page_count(self, file_paths):
+        # The pages are counted from the trailer and the page tree root, not by loading the files;
+        # the counts known for unchanged files are kept
+        thread = PageCountThread(file_paths, {file_path: self.merge_list.known_signature(file_path)
+                                              for file_path in file_paths})
+        try:
+            job = scheduler.submit(thread, 'Count pages of {} files'.format(len(file_paths)), BATCH)
+        except Exception as ex:
+            logging.error(ex)
+            return
+        self.page_count_jobs.append(job)
+        merge_list = self.merge_list
+        ProgressMonitor(self, thread.progress, lambda event: self.apply_page_counts(thread, merge_list),
+                        lambda: self.page_count_thread_finished(thread, merge_list)).start()
+
+    def apply_page_counts(self, thread, merge_list):
+        if merge_list is not self.merge_list:
+            return
+        counted = False
+        while thread.results:
+            file_path, signature, page_count = thread.results.popleft()
+            merge_list.set_page_count(file_path, signature, page_count)
+            counted = True
+        if counted:
+            self.refresh_list()
+
+    def page_count_thread_finished(self, thread, merge_list):
+        self.page_count_jobs = [job for job in self.page_count_jobs if job.task is not thread]
+        self.apply_page_counts(thread, merge_list)
+
+    def cancel_page_count(self):
+        for job in self.page_count_jobs:
+            scheduler.cancel(job)
+        self.page_count_jobs = []
+
+    def save_list(self):
+        if not self.merge_list:
+            messagebox.showinfo(title='Information', message='Nothing to save...')
+            return
+        list_path = filedialog.asksaveasfilename(title='Save List As...',
+                                                 filetypes=(('Merge Lists', '*.json'), ('Text Files', '*.txt')),
+                                                 initialdir=os.path.dirname(self.merge_list[0]),
+                                                 initialfile='merge_list', defaultextension='.json')
+        if not list_path:
+            return
+        try:
+            self.merge_list.save(list_path)
+        except OSError as ex:
+            logging.error(ex)
+            messagebox.showwarning(title='Warning!', message='The list cannot be saved: {}'.format(ex))
+
+    def load_list(self):
+        list_path = filedialog.askopenfilename(title='Load List',
+                                               filetypes=(('Merge Lists', '*.json'), ('Text Files', '*.txt'),
+                                                          ('All Files', '*.*')))
+        if not list_path:
+            return
+        try:
+            merge_list = MergeList.load(list_path)
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            logging.error(ex)
+            messagebox.showwarning(title='Warning!', message='The list cannot be read: {}'.format(ex))
+            return
+        self.cancel_page_count()
+        self.merge_list = merge_list
+        self.files_listbox.items = merge_list
+        self.files_listbox.select_set([0] if merge_list else [])
+        self.update_list_status()
+        if merge_list:
+            self.start_page_count(list(merge_list))
 
     def del_items_from_listbox(self):
         indexes = self.files_listbox.curselection()
         if not indexes:
             messagebox.showinfo(title='Information', message='Nothing to delete...')
             return
-        for index in indexes[::-1]:
-            self.files_listbox.delete(index)
-            self.listbox_items.pop(index)
+        self.merge_list.remove(indexes)
+        self.files_listbox.selection_clear()
+        self.update_list_status()
 
     def del_all_items_from_listbox(self):
-        if not self.listbox_items:
+        if not self.merge_list:
             messagebox.showinfo(title='Information', message='Nothing to delete...')
             return
-        self.files_listbox.delete(0, tk.END)
-        self.listbox_items.clear()
+        self.cancel_page_count()
+        self.merge_list.clear()
+        self.files_listbox.selection_clear()
+        self.update_list_status()
@@ -0,0 +1,86 @@
+import logging
+import os
+import tkinter as tk
+
+from jobqueue import BATCH, scheduler
+from pagerange import PageRange
+from progress import ProgressMonitor
+
+PAGE_RANGE_EXAMPLE = 'e.g. 3-7,9,14-, last, odd'
+
+
+class PageRangeTab:
+    # The part of the Extract and Delete tabs that works on the opened document and its page range. The tab
+    # has the source_file_path, pdf_reader, page_count, page_index and page_index_job attributes and the
+    # pages_number_title, input_file_name, page_range_text, page_range_entry and page_range_example_title
+    # widgets; it shows the progress of a job with show_progress and follows it with job_thread_monitor
+
+    def submit_job(self, thread, title):
+        from documents import registry
+
+        # The job keeps the document open even if another file is opened in the tab meanwhile
+        registry.retain(thread.pdf_reader)
+        try:
+            scheduler.submit(thread, title)
+        except Exception:
+            registry.release(thread.pdf_reader)
+            raise
+        self.job_thread_monitor(thread)
+
+    def show_open_progress(self, thread, event):
+        self.show_progress(event)
+        # The page count is read before the document is loaded, the range can be typed in meanwhile
+        if thread.document_info is not None and not self.pages_number_title['text']:
+            self.page_count = thread.document_info.page_count
+            self.show_document_info(self.page_count, thread.document_info.describe())
+            self.page_range_entry['state'] = tk.NORMAL
+            self.update_range_summary()
+
+    def show_document_info(self, page_count, details=''):
+        self.pages_number_title['text'] = 'The number of pages is {}{}'.format(
+            page_count, ' ({})'.format(details) if details else '')
+        self.input_file_name['text'] = os.path.basename(self.source_file_path)
+
+    def start_page_index(self):
+        from documents import registry
+        from pageindex import PageIndexThread
+
+        # Built in the background once per file, the summary of the range shows the details when it is ready
+        page_index_thread = PageIndexThread(self.source_file_path, self.pdf_reader)
+        registry.retain(self.pdf_reader)
+        try:
+            self.page_index_job = scheduler.submit(page_index_thread, 'Index pages of {}'.format(
+                os.path.basename(self.source_file_path)), BATCH)
+        except Exception as ex:
+            logging.error(ex)
+            registry.release(self.pdf_reader)
+            return
+        ProgressMonitor(self, page_index_thread.progress, lambda event: None,
+                        lambda: self.page_index_thread_finished(page_index_thread)).start()
+
+    def page_index_thread_finished(self, thread):
+        from documents import registry
+
+        registry.release(thread.pdf_reader)
+        if self.page_index_job is None or self.page_index_job.task is not thread:
+            return
+        self.page_index_job = None
+        self.page_index = thread.page_index
+        self.update_range_summary()
+
+    def update_range_summary(self):
+        # The range is checked while it is typed, the details are shown once the page index is ready
+        text = self.page_range_text.get().strip()
+        if not text or not self.page_count:
+            self.page_range_example_title['text'] = PAGE_RANGE_EXAMPLE
+            return
+        try:
+            pages_range = PageRange.parse(text, self.page_count)
+        except ValueError as ex:
+            self.page_range_example_title['text'] = str(ex)
+            return
+        if self.page_index is not None and self.page_index.page_count == self.page_count:
+            self.page_range_example_title['text'] = self.page_index.describe_pages(pages_range)
+        else:
+            self.page_range_example_title['text'] = '{} page{}'.format(len(pages_range),
+                                                                     '' if len(pages_range) == 1 else 's')
@@ -0,0 +1,221 @@
+import logging
+import os
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from jobqueue import scheduler
+from mergelist import MergeList
+from pipelinerun import PipelineThread, format_steps, parse_steps, pipeline_result_dir_name
+from progress import ProgressMonitor, update_progressbar
+from VirtualList import VirtualList
+
+PIPELINE_PRESETS = ('delete 1 | merge', 'delete 1 | merge | split 10', 'extract 1-3 | merge', 'merge | split 1')
+STEPS_EXAMPLE = 'steps separated by "|": delete <pages>, extract <pages>, merge, split <pages per file>'
+
+
+class Pipeline(ttk.Frame):
+    def __init__(self, container):
+        super().__init__(container)
+        self.files_listbox = None
+        self.steps_text = None
+        self.steps_combobox = None
+        self.steps_status = None
+        self.run_button = None
+        self.pipeline_pbar = None
+        self.pipeline_pbar_frame = None
+        self.pipeline_label_status = None
+        self.cancel_button = None
+        self.pipeline_thread = None
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        self.file_list = MergeList()
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        pipeline_frame = ttk.Frame(self)
+
+        pipeline_frame.columnconfigure(0, weight=1)
+
+        self.files_listbox = VirtualList(pipeline_frame, self.file_list,
+                                         format_row=lambda index: os.path.basename(self.file_list[index]))
+        self.files_listbox.grid(column=0, row=0, rowspan=6, sticky=tk.NSEW, padx=(5, 0), pady=5)
+
+        add_items_button = ttk.Button(pipeline_frame, text='Add', command=self.add_items_to_listbox)
+        add_items_button.grid(column=1, row=0, sticky=tk.EW, padx=5, pady=5)
+
+        del_items_button = ttk.Button(pipeline_frame, text='Delete', command=self.del_items_from_listbox)
+        del_items_button.grid(column=1, row=1, sticky=tk.EW, padx=5)
+
+        clear_items_button = ttk.Button(pipeline_frame, text='Clear', command=self.del_all_items_from_listbox)
+        clear_items_button.grid(column=1, row=2, sticky=tk.EW, padx=5, pady=5)
+
+        pipeline_frame.rowconfigure(3, weight=1)
+
+        move_up_button = ttk.Button(pipeline_frame, text='Up', command=lambda: self.move_items(-1))
+        move_up_button.grid(column=1, row=4, padx=5, sticky=tk.EW)
+
+        move_down_button = ttk.Button(pipeline_frame, text='Down', command=lambda: self.move_items(1))
+        move_down_button.grid(column=1, row=5, padx=5, pady=5, sticky=tk.EW)
+
+        # The steps are typed or picked from the usual ones
+        steps_frame = ttk.Frame(pipeline_frame)
+        steps_frame.columnconfigure(1, weight=1)
+
+        steps_title = ttk.Label(steps_frame, text='Steps:')
+        steps_title.grid(column=0, row=0, sticky=tk.E, padx=(5, 0))
+
+        self.steps_text = tk.StringVar(value=PIPELINE_PRESETS[1])
+        self.steps_text.trace_add('write', lambda *args: self.update_steps_status())
+        self.steps_combobox = ttk.Combobox(steps_frame, textvariable=self.steps_text, values=PIPELINE_PRESETS)
+        self.steps_combobox.grid(column=1, row=0, sticky=tk.EW, padx=(5, 5))
+
+        steps_example_title = ttk.Label(steps_frame, text=STEPS_EXAMPLE, font=('', 7))
+        steps_example_title.grid(column=1, row=1, sticky=tk.EW, padx=(5, 5))
+
+        self.steps_status = ttk.Label(steps_frame, text='')
+        self.steps_status.grid(column=1, row=2, sticky=tk.EW, padx=(5, 5), pady=(5, 0))
+
+        steps_frame.grid(columnspan=2, column=0, row=6, sticky=tk.EW, padx=(0, 5), pady=(0, 5))
+
+        separator_top = ttk.Separator(pipeline_frame, orient='horizontal')
+        separator_top.grid(columnspan=2, column=0, row=7, sticky=tk.EW, pady=(0, 5), padx=5)
+
+        pipeline_pbar_empty_frame = ttk.Frame(pipeline_frame)
+        pipeline_pbar_empty_frame.columnconfigure(0, weight=1)
+
+        empty_label = ttk.Label(pipeline_pbar_empty_frame)
+        empty_label.grid(column=0, row=0, sticky=tk.EW)
+
+        pipeline_pbar_empty_frame.grid(column=0, row=8, sticky=tk.EW, padx=5, pady=0)
+
+        self.pipeline_pbar_frame = ttk.Frame(pipeline_frame)
+        self.pipeline_pbar_frame.columnconfigure(1, weight=1)
+
+        self.pipeline_label_status = ttk.Label(self.pipeline_pbar_frame, text="Please wait...")
+        self.pipeline_label_status.grid(column=0, row=0, sticky=tk.W, padx=5)
+        self.pipeline_pbar = ttk.Progressbar(self.pipeline_pbar_frame, orient=tk.HORIZONTAL, mode='indeterminate')
+        self.pipeline_pbar.grid(column=1, row=0, sticky=tk.EW, padx=0)
+
+        self.cancel_button = ttk.Button(self.pipeline_pbar_frame, text='Cancel', command=self.cancel_pipeline)
+        self.cancel_button.grid(column=2, row=0, sticky=tk.E, padx=(5, 0))
+
+        self.run_button = ttk.Button(pipeline_frame, text='Run', command=self.run_pipeline)
+        self.run_button.grid(column=1, row=8, sticky=tk.EW, padx=5)
+
+        separator_bottom = ttk.Separator(self, orient='horizontal')
+        separator_bottom.grid(columnspan=2, column=0, row=9, sticky=tk.EW, pady=(5, 5), padx=5)
+
+        pipeline_frame.grid(column=0, row=0, sticky=tk.NSEW)
+        self.update_steps_status()
+
+    def update_steps_status(self):
+        try:
+            steps = parse_steps(self.steps_text.get())
+        except ValueError as ex:
+            self.steps_status['text'] = str(ex)
+            return
+        self.steps_status['text'] = '{} file{} → {}'.format(len(self.file_list),
+                                                                '' if len(self.file_list) == 1 else 's',
+                                                                format_steps(steps))
+
+    def add_items_to_listbox(self):
+        files = list(
+            filedialog.askopenfilenames(title='Open File(s)', filetypes=(('PDF Files', '*.pdf'),)))
+        # A file can be listed twice, e.g. to repeat it in a merge
+        self.file_list.add([file for file in files if file.lower().endswith('.pdf')], skip_duplicates=False)
+        if self.file_list and not self.files_listbox.curselection():
+            self.files_listbox.select_set([0])
+        self.files_listbox.refresh()
+        self.update_steps_status()
+
+    def del_items_from_listbox(self):
+        indexes = self.files_listbox.curselection()
+        if not indexes:
+            messagebox.showinfo(title='Information', message='Nothing to delete...')
+            return
+        self.file_list.remove(indexes)
+        self.files_listbox.selection_clear()
+        self.update_steps_status()
+
+    def del_all_items_from_listbox(self):
+        if not self.file_list:
+            messagebox.showinfo(title='Information', message='Nothing to delete...')
+            return
+        self.file_list.clear()
+        self.files_listbox.selection_clear()
+        self.update_steps_status()
+
+    def move_items(self, delta):
+        indexes = self.files_listbox.curselection()
+        if not indexes:
+            messagebox.showinfo(title='Information', message='Nothing to move...')
+            return
+        new_indexes = self.file_list.shift(indexes, delta)
+        self.files_listbox.select_set(new_indexes)
+        self.files_listbox.see(new_indexes[0] if delta < 0 else new_indexes[-1])
+
+    def run_pipeline(self):
+        if not self.file_list:
+            messagebox.showinfo(title='Information', message='Nothing to do...\nPlease add the source files')
+            return
+        try:
+            steps = parse_steps(self.steps_text.get())
+        except ValueError as ex:
+            messagebox.showwarning(title='Warning!', message='Invalid steps!\n{}'.format(ex))
+            return
+        output_dir = filedialog.askdirectory(title='Save Results To...',
+                                             initialdir=os.path.dirname(self.file_list[0]))
+        if not output_dir:
+            return
+        try:
+            # The results go to a new directory, the names of the files come from the steps
+            pipeline_thread = PipelineThread(list(self.file_list), steps,
+                                             os.path.join(os.path.normpath(output_dir), pipeline_result_dir_name()))
+            self.start_pipeline()
+            self.pipeline_thread = pipeline_thread
+            scheduler.submit(pipeline_thread, 'Pipeline "{}" on {} files'.format(format_steps(steps),
+                                                                                len(self.file_list)))
+            ProgressMonitor(self, pipeline_thread.progress, lambda event: self.show_progress(pipeline_thread, event),
+                            lambda: self.pipeline_thread_finished(pipeline_thread)).start()
+        except Exception as ex:
+            logging.error(ex)
+            self.pipeline_thread = None
+            self.stop_pipeline()
+            messagebox.showwarning(title='Warning!', message='Something went wrong...')
+
+    def show_progress(self, thread, event):
+        # Only the last submitted pipeline is shown here, all of them are listed on the Jobs tab
+        if thread is not self.pipeline_thread:
+            return
+        self.pipeline_label_status['text'] = event.describe()
+        update_progressbar(self.pipeline_pbar, event)
+
+    def pipeline_thread_finished(self, thread):
+        if thread is self.pipeline_thread:
+            self.pipeline_thread = None
+            self.stop_pipeline()
+        if thread.get_message():
+            if not thread.cancel_token.is_cancelled():
+                messagebox.showwarning(title='Warning!', message=thread.get_message())
+            return
+        messagebox.showinfo(title='Information', message='Files written: {}\n{}'.format(
+            len(thread.output_files), thread.output_path))
+
+    def cancel_pipeline(self):
+        if self.pipeline_thread:
+            self.pipeline_thread.cancel()
+            self.cancel_button['state'] = tk.DISABLED
+            self.pipeline_label_status['text'] = 'Cancelling...'
+
+    def start_pipeline(self):
+        self.cancel_button['state'] = tk.NORMAL
+        self.pipeline_label_status['text'] = 'Waiting in the queue...'
+        self.pipeline_pbar_frame.grid(column=0, row=8, sticky=tk.EW, padx=0)
+        self.pipeline_pbar.configure(mode='indeterminate', value=0)
+        self.pipeline_pbar.start(10)
+
+    def stop_pipeline(self):
+        self.pipeline_pbar.stop()
+        self.pipeline_pbar_frame.grid_remove()
@@ -0,0 +1,178 @@
+import tkinter as tk
+from tkinter import font as tkfont, ttk
+
+WHEEL_ROWS = 3
+
+
+class VirtualList(ttk.Frame):
+    # A list box that holds only the visible rows: the items stay in a Python list, the rows are rebuilt
+    # from it on every scroll and the selection is a set of item indexes, so a list of tens of thousands
+    # of files costs no more than the rows on the screen. format_row gives the text of the item at an index
+    def __init__(self, container, items, format_row=None):
+        super().__init__(container)
+        self.items = items
+        self.format_row = format_row or (lambda index: str(self.items[index]))
+        self.selection = set()
+        self.anchor = None
+        self.active = None
+        self.first = 0
+        self.rows = 1
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.listbox = tk.Listbox(self, relief=tk.FLAT, selectmode=tk.EXTENDED, exportselection=False,
+                                  activestyle='none')
+        self.listbox.grid(column=0, row=0, sticky=tk.NSEW)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(column=1, row=0, sticky=tk.NS)
+
+        self.row_height = (tkfont.Font(font=self.listbox['font']).metrics('linespace') + 1
+                           + 2 * int(self.listbox['selectborderwidth']))
+
+        # The class bindings of the listbox would select the visible rows only, all of them are replaced
+        self.listbox.bind('<Configure>', self.on_resize)
+        self.listbox.bind('<Button-1>', lambda event: self.on_click(event))
+        self.listbox.bind('<Shift-Button-1>', lambda event: self.on_click(event, extend=True))
+        self.listbox.bind('<Control-Button-1>', lambda event: self.on_click(event, toggle=True))
+        self.listbox.bind('<B1-Motion>', self.on_drag)
+        self.listbox.bind('<MouseWheel>', self.on_wheel)
+        self.listbox.bind('<Button-4>', lambda event: self.scroll_rows(-WHEEL_ROWS))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll_rows(WHEEL_ROWS))
+        for sequence, delta, extend in (('<Up>', -1, False), ('<Down>', 1, False),
+                                        ('<Shift-Up>', -1, True), ('<Shift-Down>', 1, True),
+                                        ('<Prior>', 'page_up', False), ('<Next>', 'page_down', False),
+                                        ('<Home>', 'home', False), ('<End>', 'end', False)):
+            self.listbox.bind(sequence, lambda event, delta=delta, extend=extend: self.on_key(delta, extend))
+        self.listbox.bind('<Control-a>', lambda event: self.select_all())
+        self.listbox.bind('<Control-A>', lambda event: self.select_all())
+
+    def refresh(self):
+        count = len(self.items)
+        self.first = max(0, min(self.first, count - self.rows))
+        last = min(count, self.first + self.rows + 1)
+        self.listbox.delete(0, tk.END)
+        if last > self.first:
+            self.listbox.insert(tk.END, *[self.format_row(index) for index in range(self.first, last)])
+            for index in range(self.first, last):
+                if index in self.selection:
+                    self.listbox.selection_set(index - self.first)
+        self.listbox.yview_moveto(0)
+        if count:
+            self.scrollbar.set(self.first / count, min(1.0, (self.first + self.rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(self.items))
+        elif args[0] == 'scroll':
+            self.first += int(args[1]) * (self.rows if args[2] == 'pages' else 1)
+        self.refresh()
+
+    def scroll_rows(self, rows):
+        self.first += rows
+        self.refresh()
+        return 'break'
+
+    def on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS reports the notches themselves
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll_rows(-notches * WHEEL_ROWS)
+
+    def see(self, index):
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.rows:
+            self.first = index - self.rows + 1
+        self.refresh()
+
+    def on_resize(self, event):
+        border = 2 * (int(self.listbox['borderwidth']) + int(self.listbox['highlightthickness']))
+        self.rows = max(1, (event.height - border) // self.row_height)
+        self.refresh()
+
+    def item_at(self, y):
+        if not self.items:
+            return None
+        return min(self.first + self.listbox.nearest(y), len(self.items) - 1)
+
+    def on_click(self, event, extend=False, toggle=False):
+        self.listbox.focus_set()
+        index = self.item_at(event.y)
+        if index is None:
+            return 'break'
+        if extend and self.anchor is not None:
+            self.selection = set(range(min(self.anchor, index), max(self.anchor, index) + 1))
+        elif toggle:
+            self.selection ^= {index}
+            self.anchor = index
+        else:
+            self.selection = {index}
+            self.anchor = index
+        self.active = index
+        self.refresh()
+        return 'break'
+
+    def on_drag(self, event):
+        # The list scrolls while the pointer is dragged above or below it
+        if event.y < 0:
+            self.first -= 1
+        elif event.y > self.listbox.winfo_height():
+            self.first += 1
+        index = self.item_at(max(0, min(event.y, self.listbox.winfo_height() - 1)))
+        if index is not None and self.anchor is not None:
+            self.selection = set(range(min(self.anchor, index), max(self.anchor, index) + 1))
+            self.active = index
+        self.refresh()
+        return 'break'
+
+    def on_key(self, delta, extend):
+        count = len(self.items)
+        if not count:
+            return 'break'
+        active = self.active if self.active is not None else 0
+        if delta == 'page_up':
+            index = active - self.rows
+        elif delta == 'page_down':
+            index = active + self.rows
+        elif delta == 'home':
+            index = 0
+        elif delta == 'end':
+            index = count - 1
+        else:
+            index = active + delta
+        index = max(0, min(index, count - 1))
+        if extend and self.anchor is not None:
+            self.selection = set(range(min(self.anchor, index), max(self.anchor, index) + 1))
+        else:
+            self.selection = {index}
+            self.anchor = index
+        self.active = index
+        self.see(index)
+        return 'break'
+
+    def select_all(self):
+        self.selection = set(range(len(self.items)))
+        self.refresh()
+        return 'break'
+
+    def curselection(self):
+        return tuple(sorted(self.selection))
+
+    def selection_includes(self, index):
+        return index in self.selection
+
+    def select_set(self, indexes):
+        # Replaces the selection, the first selected item becomes the anchor of the shift-clicks
+        self.selection = set(indexes)
+        self.anchor = self.active = min(self.selection) if self.selection else None
+        self.refresh()
+
+    def selection_clear(self):
+        self.selection = set()
+        self.anchor = self.active = None
+        self.refresh()
+
+    def focus(self):
+        self.listbox.focus_set()
@@ -0,0 +1,117 @@
+import argparse
+import random
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+PAGES_PER_NODE = 100
+FONT_NAME = b'Helvetica'
+
+
+class RawPdfWriter:
+    # Writes the objects straight to the file, a corpus of 100k pages is generated in seconds
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+        self.offsets = {}
+        self.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def write_object(self, object_number, body):
+        self.offsets[object_number] = self.position
+        self.write(b'%d 0 obj\n' % object_number)
+        self.write(body)
+        self.write(b'\nendobj\n')
+
+    def write_stream(self, object_number, data, dictionary=b''):
+        self.write_object(object_number, b'<< %s/Length %d >>\nstream\n%s\nendstream' % (dictionary, len(data), data))
+
+    def finish(self, root_number):
+        size = max(self.offsets) + 1
+        xref_position = self.position
+        self.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for object_number in range(1, size):
+            self.write(b'%010d 00000 n \n' % self.offsets[object_number])
+        self.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            size, root_number, xref_position))
+
+
+def write_corpus_pdf(file_path, page_count, image_density=0.0, font_reuse=1.0, image_size=64, seed=0):
+    # image_density is the share of pages with an image of their own, font_reuse is the share
+    # of pages that use the document-wide font instead of a font object of their own
+    rnd = random.Random(seed)
+    node_count = (page_count + PAGES_PER_NODE - 1) // PAGES_PER_NODE
+    catalog_number, root_number, font_number = 1, 2, 3
+    first_node_number = 4
+    next_number = first_node_number + node_count
+
+    with open(file_path, 'wb') as stream:
+        pdf_writer = RawPdfWriter(stream)
+        pdf_writer.write_object(catalog_number, b'<< /Type /Catalog /Pages %d 0 R >>' % root_number)
+        pdf_writer.write_object(font_number, font_dictionary())
+
+        page_numbers = []
+        for page_index in range(page_count):
+            page_number, content_number = next_number, next_number + 1
+            next_number += 2
+            page_font_number = font_number
+            if rnd.random() >= font_reuse:
+                page_font_number = next_number
+                next_number += 1
+                pdf_writer.write_object(page_font_number, font_dictionary())
+            image_number = None
+            if rnd.random() < image_density:
+                image_number = next_number
+                next_number += 1
+                pdf_writer.write_stream(image_number, random_bytes(rnd, image_size * image_size * 3),
+                                        b'/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                                        b'/BitsPerComponent 8 ' % (image_size, image_size))
+
+            content = b'BT /F1 24 Tf 72 720 Td (Page %d) Tj ET' % (page_index + 1)
+            resources = b'/Font << /F1 %d 0 R >>' % page_font_number
+            if image_number:
+                content += b'\nq 300 0 0 300 72 300 cm /Im1 Do Q'
+                resources += b' /XObject << /Im1 %d 0 R >>' % image_number
+            pdf_writer.write_stream(content_number, content)
+            pdf_writer.write_object(page_number, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                                                 b'/Resources << %s >> /Contents %d 0 R >>' % (
+                                        first_node_number + page_index // PAGES_PER_NODE, PAGE_WIDTH, PAGE_HEIGHT,
+                                        resources, content_number))
+            page_numbers.append(page_number)
+
+        for node_index in range(node_count):
+            kids = page_numbers[node_index * PAGES_PER_NODE:(node_index + 1) * PAGES_PER_NODE]
+            pdf_writer.write_object(first_node_number + node_index,
+                                    b'<< /Type /Pages /Parent %d 0 R /Count %d /Kids [%s] >>' % (
+                                        root_number, len(kids), b' '.join(b'%d 0 R' % kid for kid in kids)))
+        pdf_writer.write_object(root_number, b'<< /Type /Pages /Count %d /Kids [%s] >>' % (
+            page_count, b' '.join(b'%d 0 R' % (first_node_number + i) for i in range(node_count))))
+        pdf_writer.finish(catalog_number)
+
+
+def random_bytes(rnd, size):
+    return rnd.getrandbits(size * 8).to_bytes(size, 'little')
+
+
+def font_dictionary():
+    return b'<< /Type /Font /Subtype /Type1 /BaseFont /%s >>' % FONT_NAME
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic PDF for the benchmarks.')
+    parser.add_argument('output', help='result PDF file')
+    parser.add_argument('--pages', type=int, default=1000, help='number of pages (default: %(default)s)')
+    parser.add_argument('--image-density', type=float, default=0.0,
+                        help='share of pages with an image, 0..1 (default: %(default)s)')
+    parser.add_argument('--font-reuse', type=float, default=1.0,
+                        help='share of pages that reuse the shared font, 0..1 (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=64, help='image side in pixels (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    args = parser.parse_args(argv)
+    write_corpus_pdf(args.output, args.pages, args.image_density, args.font_reuse, args.image_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from corpus import write_corpus_pdf
+from run import MAGICPDF, format_mb, run_process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ('open', 'extract-range', 'extract-pbp')
+
+# Opens the document the way the GUI does and reads the content of every tenth page. The mapped pages of
+# the file are counted in RSS although they are shared page cache, so the private memory is reported too
+OPEN_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start_time = time.perf_counter()
+from documents import open_reader
+pdf_reader = open_reader({file_path!r}, {use_mmap!r})
+for page in list(pdf_reader.pages)[::10]:
+    page.get_contents()
+wall_time = time.perf_counter() - start_time
+private = None
+if sys.platform.startswith('linux'):
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            if line.startswith('RssAnon:'):
+                private = int(line.split()[1]) * 1024
+pdf_reader.stream.close()
+print(json.dumps({{'wall_time': wall_time, 'private': private}}))
+'''
+
+
+def run_open(command):
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode:
+        print(output.stderr, file=sys.stderr)
+        return None, None, output.returncode
+    result = json.loads(output.stdout)
+    return result['wall_time'], result['private'], 0
+
+
+def operation_command(operation, source_file_path, output_path, use_mmap, args):
+    if operation == 'open':
+        return [sys.executable, '-c', OPEN_SCRIPT.format(root=ROOT, file_path=source_file_path, use_mmap=use_mmap)]
+    command = [sys.executable, MAGICPDF, 'extract', source_file_path, '-o', output_path]
+    if operation == 'extract-range':
+        command += ['--pages', '1-{}'.format(max(1, args.pages // 2))]
+    else:
+        command += ['--page-by-page', '--workers', str(args.workers)]
+    return command + (['--mmap'] if use_mmap else [])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare buffered and memory-mapped reading of a large PDF file.')
+    parser.add_argument('--pages', type=int, default=2000, help='pages of the corpus (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=160,
+                        help='image side in pixels, every page has an image (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes for the page by page extraction (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every variant (default: %(default)s)')
+    parser.add_argument('--work-dir', help='directory for the corpus and the outputs (default: system temp)')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='magicpdf_mmap_', dir=args.work_dir)
+    results = []
+    try:
+        source_file_path = os.path.join(work_dir, 'corpus.pdf')
+        print('Generating a corpus of {} pages...'.format(args.pages), file=sys.stderr)
+        write_corpus_pdf(source_file_path, args.pages, image_density=1.0, image_size=args.image_size)
+        print('Corpus size: {}'.format(format_mb(os.path.getsize(source_file_path))))
+        for operation in OPERATIONS:
+            for use_mmap in (False, True):
+                wall_time, peak_rss, exit_code = None, None, 0
+                for attempt in range(max(1, args.repeat)):
+                    output_path = os.path.join(work_dir, 'out_{}'.format(attempt))
+                    if operation == 'extract-pbp':
+                        os.makedirs(output_path)
+                    else:
+                        output_path += '.pdf'
+                    command = operation_command(operation, source_file_path, output_path, use_mmap, args)
+                    run = run_open if operation == 'open' else run_process
+                    run_time, run_rss, run_exit_code = run(command)
+                    if run_time is not None:
+                        wall_time = run_time if wall_time is None else min(wall_time, run_time)
+                    if run_rss is not None:
+                        peak_rss = max(peak_rss or 0, run_rss)
+                    exit_code = exit_code or run_exit_code
+                    if os.path.isdir(output_path):
+                        shutil.rmtree(output_path)
+                    elif os.path.exists(output_path):
+                        os.remove(output_path)
+                variant = 'mmap' if use_mmap else 'buffered'
+                memory_kind = 'private' if operation == 'open' else 'RSS'
+                print('{:<14} {:<9} {:>9} s  {:>9} {}{}'.format(
+                    operation, variant, '-' if wall_time is None else '{:.3f}'.format(wall_time),
+                    format_mb(peak_rss), memory_kind, '  FAILED' if exit_code else ''))
+                results.append({'operation': operation, 'variant': variant, 'wall_time': wall_time,
+                                'memory_kind': memory_kind, 'memory': peak_rss, 'exit_code': exit_code})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'pages': args.pages, 'image_size': args.image_size, 'results': results}, output_file, indent=2)
+    return 1 if any(result['exit_code'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
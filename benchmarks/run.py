@@ -0,0 +1,237 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from corpus import write_corpus_pdf
+
+MAGICPDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'magicpdf.py')
+OPERATIONS = ('merge', 'extract-range', 'extract-pbp', 'delete')
+DEFAULT_SIZES = '10,1000,100000'
+MERGE_FILES = 4
+DEFAULT_TOLERANCE = 0.2
+
+
+class BenchmarkResult:
+    def __init__(self, operation, pages):
+        self.operation = operation
+        self.pages = pages
+        self.wall_time = None
+        self.peak_rss = None
+        self.output_size = 0
+        self.exit_code = 0
+
+    def to_dict(self):
+        return {
+            'operation': self.operation,
+            'pages': self.pages,
+            'wall_time': self.wall_time,
+            'peak_rss': self.peak_rss,
+            'output_size': self.output_size,
+            'exit_code': self.exit_code,
+        }
+
+
+def run_process(command):
+    # os.wait4 gives the peak RSS of the child alone, it is not available on Windows
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if hasattr(os, 'wait4'):
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start_time
+        process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    else:
+        process.wait()
+        wall_time = time.perf_counter() - start_time
+        peak_rss = None
+    error_output = process.stderr.read().decode(errors='replace')
+    process.stderr.close()
+    if process.returncode:
+        print(error_output, file=sys.stderr)
+    return wall_time, peak_rss, process.returncode
+
+
+def output_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(dir_path, file_name))
+                   for dir_path, _, file_names in os.walk(path) for file_name in file_names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def prepare_corpus(work_dir, pages, args):
+    source_file_path = os.path.join(work_dir, 'corpus_{}.pdf'.format(pages))
+    write_corpus_pdf(source_file_path, pages, args.image_density, args.font_reuse, args.image_size, args.seed)
+    part_file_paths = []
+    for i in range(MERGE_FILES):
+        part_pages = pages // MERGE_FILES + (1 if i < pages % MERGE_FILES else 0)
+        if part_pages:
+            part_file_path = os.path.join(work_dir, 'corpus_{}_part{}.pdf'.format(pages, i + 1))
+            write_corpus_pdf(part_file_path, part_pages, args.image_density, args.font_reuse, args.image_size,
+                             args.seed + i + 1)
+            part_file_paths.append(part_file_path)
+    return source_file_path, part_file_paths
+
+
+def operation_command(operation, pages, source_file_path, part_file_paths, output_path, args):
+    command = [sys.executable, MAGICPDF]
+    if operation == 'merge':
+        command += ['merge'] + part_file_paths + ['-o', output_path]
+    elif operation == 'extract-range':
+        command += ['extract', source_file_path, '--pages', '1-{}'.format(max(1, pages // 2)), '-o', output_path]
+    elif operation == 'extract-pbp':
+        command += ['extract', source_file_path, '--page-by-page', '--workers', str(args.workers), '-o', output_path]
+    elif operation == 'delete':
+        command += ['delete', source_file_path, '--pages', 'odd' if pages > 1 else '1', '-o', output_path]
+    return command + shlex.split(args.options.get(operation.split('-')[0], ''))
+
+
+def run_benchmarks(args):
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='magicpdf_bench_', dir=args.work_dir)
+    try:
+        for pages in args.sizes:
+            print('Generating a corpus of {} pages...'.format(pages), file=sys.stderr)
+            source_file_path, part_file_paths = prepare_corpus(work_dir, pages, args)
+            for operation in args.operations:
+                result = BenchmarkResult(operation, pages)
+                for attempt in range(args.repeat):
+                    output_path = os.path.join(work_dir, 'out_{}_{}_{}'.format(operation, pages, attempt))
+                    if operation == 'extract-pbp':
+                        os.makedirs(output_path)
+                    else:
+                        output_path += '.pdf'
+                    command = operation_command(operation, pages, source_file_path, part_file_paths, output_path,
+                                                args)
+                    wall_time, peak_rss, exit_code = run_process(command)
+                    # The fastest run is the least disturbed one, the memory peak is kept as the worst case
+                    result.wall_time = wall_time if result.wall_time is None else min(result.wall_time, wall_time)
+                    if peak_rss is not None:
+                        result.peak_rss = max(result.peak_rss or 0, peak_rss)
+                    result.output_size = output_size(output_path)
+                    result.exit_code = result.exit_code or exit_code
+                    if os.path.isdir(output_path):
+                        shutil.rmtree(output_path)
+                    elif os.path.exists(output_path):
+                        os.remove(output_path)
+                print('{:<14} {:>7} pages  {:>9.3f} s  {:>9} RSS  {:>9} output{}'.format(
+                    operation, pages, result.wall_time, format_mb(result.peak_rss), format_mb(result.output_size),
+                    '  FAILED' if result.exit_code else ''))
+                results.append(result)
+            os.remove(source_file_path)
+            for part_file_path in part_file_paths:
+                os.remove(part_file_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    baseline_results = {(result['operation'], result['pages']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get((result.operation, result.pages))
+        if not baseline_result:
+            continue
+        for metric in ('wall_time', 'peak_rss', 'output_size'):
+            value, baseline_value = getattr(result, metric), baseline_result.get(metric)
+            if value is None or not baseline_value:
+                continue
+            if value > baseline_value * (1 + tolerance):
+                regressions.append('{} at {} pages: {} is {:.0%} above the baseline ({} > {})'.format(
+                    result.operation, result.pages, metric, value / baseline_value - 1, value, baseline_value))
+    return regressions
+
+
+def format_mb(size):
+    return '-' if size is None else '{:.1f} MB'.format(size / 2 ** 20)
+
+
+def parse_sizes(sizes_string):
+    return [int(size) for size in sizes_string.split(',') if size.strip()]
+
+
+def parse_operations(operations_string):
+    operations = [operation.strip() for operation in operations_string.split(',') if operation.strip()]
+    for operation in operations:
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError('unknown operation "{}", expected one of {}'.format(
+                operation, ', '.join(OPERATIONS)))
+    return operations
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Time the magicpdf command line on a synthetic corpus.')
+    parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes(DEFAULT_SIZES),
+                        help='comma separated page counts (default: %(default)s)')
+    parser.add_argument('--operations', type=parse_operations, default=list(OPERATIONS),
+                        help='comma separated operations out of {} (default: all)'.format(', '.join(OPERATIONS)))
+    parser.add_argument('--image-density', type=float, default=0.1,
+                        help='share of pages with an image, 0..1 (default: %(default)s)')
+    parser.add_argument('--font-reuse', type=float, default=0.9,
+                        help='share of pages that reuse the shared font, 0..1 (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=64, help='image side in pixels (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the corpus (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes for the page by page extraction (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every operation (default: %(default)s)')
+    parser.add_argument('--work-dir', help='directory for the corpus and the outputs (default: system temp)')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown or growth before a regression is reported (default: %(default)s)')
+    parser.add_argument('--merge-options', default='', help='extra options of the merge command, e.g. "--streaming"')
+    parser.add_argument('--extract-options', default='', help='extra options of the extract command')
+    parser.add_argument('--delete-options', default='', help='extra options of the delete command')
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    args.options = {'merge': args.merge_options, 'extract': args.extract_options, 'delete': args.delete_options}
+    args.repeat = max(1, args.repeat)
+    results = run_benchmarks(args)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': args.options,
+        'corpus': {
+            'image_density': args.image_density,
+            'font_reuse': args.font_reuse,
+            'image_size': args.image_size,
+            'seed': args.seed,
+        },
+        'results': [result.to_dict() for result in results],
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    exit_code = 1 if any(result.exit_code for result in results) else 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('corpus') != report['corpus']:
+            print('Warning: the baseline was recorded on a different corpus', file=sys.stderr)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: {}'.format(regression), file=sys.stderr)
+        if regressions:
+            exit_code = 1
+        else:
+            print('No regressions against {}'.format(args.baseline), file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
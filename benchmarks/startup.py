@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EAGER_MODULES = ('Merger', 'Extractor', 'Deleter', 'merging', 'extraction', 'deletion', 'documents')
+
+# Runs in a fresh interpreter, so nothing is cached between the measurements
+MEASURE_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start_time = time.perf_counter()
+for module_name in {modules!r}:
+    __import__(module_name)
+import MainWindow
+import_time = time.perf_counter() - start_time
+window_time = None
+error = None
+try:
+    app = MainWindow.MainWindow([])
+    app.update()
+    window_time = time.perf_counter() - start_time
+    app.destroy()
+except Exception as ex:
+    error = str(ex)
+print(json.dumps({{'import_time': import_time, 'window_time': window_time, 'pypdf': 'pypdf' in sys.modules,
+                  'error': error}}))
+'''
+
+
+def measure(modules):
+    output = subprocess.run([sys.executable, '-c', MEASURE_SCRIPT.format(root=ROOT, modules=modules)],
+                            capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(output.stdout)
+
+
+def median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def format_ms(value):
+    return '-' if value is None else '{:.1f} ms'.format(value * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the GUI startup time.')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every variant (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    # "eager" imports every tab and worker module up front, as the program did before the tabs became lazy
+    for name, modules in (('lazy', ()), ('eager', EAGER_MODULES)):
+        runs = [measure(modules) for _ in range(max(1, args.repeat))]
+        print('{:<6} import {:>10}  window ready {:>10}  pypdf loaded: {}'.format(
+            name, format_ms(median(run['import_time'] for run in runs)),
+            format_ms(median(run['window_time'] for run in runs)), runs[0]['pypdf']))
+        if runs[0]['error']:
+            print('       the window was not created: {}'.format(runs[0]['error']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import threading
+
+CANCELLED_MESSAGE = 'The operation was cancelled'
+
+
+class TaskCancelled(Exception):
+    def __init__(self, message=CANCELLED_MESSAGE):
+        super().__init__(message)
+
+
+class CancelToken:
+    def __init__(self, event=None):
+        self.event = event or threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise TaskCancelled()
+
+
+class CancellableWriter:
+    # Stops the write phase on the next write call after a cancellation, pypdf writes
+    # every object separately so this happens within milliseconds
+    def __init__(self, file, cancel_token):
+        self.file = file
+        self.cancel_token = cancel_token
+
+    def write(self, data):
+        self.cancel_token.check()
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
@@ -0,0 +1,314 @@
+import argparse
+import logging
+import os
+import sys
+
+from cancellation import CANCELLED_MESSAGE
+from logconfig import LOG_LEVEL, LOG_LEVEL_VARIABLE, set_level
+from outputs import WRITE_BUFFER_SIZE
+from pagerange import PageRange, split_page_range_suffix
+
+COMMANDS = ('merge', 'extract', 'delete', 'pipeline', 'watch', 'cache')
+PROGRESS_INTERVAL = 0.2
+CANCELLED_EXIT_CODE = 130
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog='magicpdf',
+                                     description='Merge, extract and delete PDF pages without the GUI.',
+                                     fromfile_prefix_chars='@')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument('--log-level', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'), type=str.upper,
+                               help='level of the program log (default: ${} or {})'.format(LOG_LEVEL_VARIABLE,
+                                                                                       LOG_LEVEL))
+    common_parser.add_argument('--buffer-size', type=int, default=WRITE_BUFFER_SIZE // 1024,
+                               help='write buffer size in KB (default: %(default)s)')
+
+    merge_parser = subparsers.add_parser('merge', parents=[common_parser], help='merge PDF files into one file')
+    merge_parser.add_argument('inputs', nargs='+',
+                              help='PDF files in the merge order, FILE@PAGES takes only the given pages (a.pdf@1-3,7)')
+    merge_parser.add_argument('-o', '--output', required=True, help='result PDF file')
+    merge_parser.add_argument('--no-bookmarks', dest='is_outlines', action='store_false',
+                              help='do not add a bookmark for every merged file')
+    merge_parser.add_argument('--streaming', action='store_true',
+                              help='write the result while reading the inputs to keep the memory use flat')
+    merge_parser.add_argument('--deduplicate', action='store_true',
+                              help='store identical streams (fonts, images, ICC profiles) only once')
+    merge_parser.add_argument('--cache', action='store_true', default=None,
+                              help='take the result from the result cache when the inputs are unchanged '
+                                   '(default: $MAGICPDF_CACHE)')
+
+    extract_parser = subparsers.add_parser('extract', parents=[common_parser], help='extract pages from PDF files')
+    extract_parser.add_argument('inputs', nargs='+', help='source PDF files')
+    extract_type = extract_parser.add_mutually_exclusive_group(required=True)
+    extract_type.add_argument('--pages', help='pages range, e.g. 3-7,9,14-,last,odd')
+    extract_type.add_argument('--page-by-page', action='store_true', help='save every page as a separate file')
+    extract_type.add_argument('--every', type=int, metavar='N', help='split into files of N pages')
+    extract_type.add_argument('--max-size', type=float, metavar='MB',
+                              help='split into files of at most about MB megabytes')
+    extract_type.add_argument('--by-bookmarks', action='store_true', help='split at every top-level bookmark')
+    extract_parser.add_argument('-o', '--output',
+                                help='result file or directory (default: the directory of the source file)')
+    extract_parser.add_argument('--workers', type=int, default=1,
+                                help='number of processes for the page by page extraction (default: 1)')
+    extract_parser.add_argument('--mmap', action='store_true', default=None,
+                                help='read the source files through a memory mapping (default: $MAGICPDF_MMAP)')
+    extract_parser.add_argument('--cache', action='store_true', default=None,
+                                help='take a range extract from the result cache when the source is unchanged '
+                                     '(default: $MAGICPDF_CACHE)')
+
+    delete_parser = subparsers.add_parser('delete', parents=[common_parser], help='delete pages from PDF files')
+    delete_parser.add_argument('inputs', nargs='+', help='source PDF files')
+    delete_parser.add_argument('--pages', required=True, help='pages range, e.g. 3-7,9,14-,last,odd')
+    delete_parser.add_argument('-o', '--output',
+                               help='result file or directory (default: the directory of the source file)')
+    delete_parser.add_argument('--mmap', action='store_true', default=None,
+                               help='read the source files through a memory mapping (default: $MAGICPDF_MMAP)')
+    delete_parser.add_argument('--incremental', action='store_true',
+                               help='append the changed page tree instead of rewriting the file; '
+                                    'the output may be the source file itself')
+
+    pipeline_parser = subparsers.add_parser('pipeline', parents=[common_parser],
+                                            help='run delete, extract, merge and split steps without intermediate files')
+    pipeline_parser.add_argument('inputs', nargs='+', help='PDF files, FILE@PAGES takes only the given pages')
+    pipeline_parser.add_argument('--steps', required=True,
+                                 help='steps separated by "|", e.g. "delete 1 | merge | split 10"')
+    pipeline_parser.add_argument('-o', '--output', required=True,
+                                 help='result PDF file, or the directory of the results when there are several')
+    pipeline_parser.add_argument('--mmap', action='store_true', default=None,
+                                 help='read the sources through a memory mapping')
+
+    watch_parser = subparsers.add_parser('watch', parents=[common_parser],
+                                         help='process the PDF files dropped into folders by the configured rules')
+    watch_parser.add_argument('config', help='JSON file with the rules, see README')
+    watch_parser.add_argument('--once', action='store_true', help='process the settled files once and exit')
+    watch_parser.add_argument('--interval', type=float, help='seconds between the folder scans (default: 5)')
+    watch_parser.add_argument('--settle', type=float,
+                              help='seconds a file must stay unchanged before it is taken (default: 10)')
+    watch_parser.add_argument('--state', help='file that remembers the handled files '
+                                              '(default: ~/magicpdf/watch_state.json)')
+
+    cache_parser = subparsers.add_parser('cache', parents=[common_parser], help='show or clear the result cache')
+    cache_parser.add_argument('action', choices=('stats', 'clear'), help='what to do with the cache')
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    if args.log_level:
+        set_level(args.log_level)
+    handlers = {
+        'merge': merge_command,
+        'extract': extract_command,
+        'delete': delete_command,
+        'pipeline': pipeline_command,
+        'watch': watch_command,
+        'cache': cache_command,
+    }
+    return handlers[args.command](args)
+
+
+def merge_command(args):
+    from merging import PdfMergerThread
+
+    inputs = [split_page_range_suffix(text) for text in args.inputs]
+    in_file_list = [os.path.normpath(file_path) for file_path, _ in inputs]
+    page_ranges = [range_text for _, range_text in inputs]
+    result_file_path = os.path.normpath(args.output)
+    if result_file_path in in_file_list:
+        return report_error('The file cannot be written to itself...')
+    merger_thread = PdfMergerThread(in_file_list=in_file_list, result_file_path=result_file_path,
+                                    is_outlines=args.is_outlines, buffer_size=args.buffer_size * 1024,
+                                    streaming=args.streaming, deduplicate=args.deduplicate, use_cache=args.cache,
+                                    page_ranges=page_ranges)
+    exit_code = run_thread(merger_thread)
+    if not exit_code and merger_thread.is_cached:
+        print('The result is taken from the cache: {}'.format(result_file_path))
+        return exit_code
+    if not exit_code and args.deduplicate and merger_thread.duplicate_count is not None:
+        print('Duplicate streams removed: {}, saved {:.1f} KB'.format(merger_thread.duplicate_count,
+                                                                       merger_thread.bytes_saved / 1024))
+    return exit_code
+
+
+def extract_command(args):
+    from documents import open_reader
+    from extraction import (PbPExtractThread, RangeExtractThread, SplitThread, extract_result_dir_name,
+                            extract_result_file_name)
+
+    exit_code = 0
+    for source_file_path in [os.path.normpath(file_path) for file_path in args.inputs]:
+        try:
+            pdf_reader = open_reader(source_file_path, args.mmap)
+        except Exception as ex:
+            exit_code = report_error('{}: {}'.format(source_file_path, ex))
+            continue
+        try:
+            if args.page_by_page:
+                output_path = args.output or os.path.dirname(source_file_path)
+                thread = PbPExtractThread(source_file_path, pdf_reader, output_path,
+                                          extract_result_dir_name(source_file_path), workers=args.workers,
+                                          buffer_size=args.buffer_size * 1024)
+            elif args.every is not None or args.max_size is not None or args.by_bookmarks:
+                output_path = args.output or os.path.dirname(source_file_path)
+                if args.by_bookmarks:
+                    mode, value = 'bookmarks', None
+                else:
+                    mode, value = ('pages', args.every) if args.every is not None else ('size', args.max_size)
+                thread = SplitThread(source_file_path, pdf_reader, output_path,
+                                     extract_result_dir_name(source_file_path), mode, value,
+                                     buffer_size=args.buffer_size * 1024)
+            else:
+                pages_range = PageRange.parse(args.pages, len(pdf_reader.pages))
+                output_path = resolve_output_file(args.output, source_file_path, extract_result_file_name,
+                                                  len(args.inputs))
+                thread = RangeExtractThread(pdf_reader, output_path, pages_range, buffer_size=args.buffer_size * 1024,
+                                            source_file_path=source_file_path, use_cache=args.cache)
+            thread_exit_code = run_thread(thread)
+            if not thread_exit_code and getattr(thread, 'is_cached', False):
+                print('The result is taken from the cache: {}'.format(thread.output_path))
+            exit_code = thread_exit_code or exit_code
+            if exit_code == CANCELLED_EXIT_CODE:
+                break
+        except ValueError as ex:
+            exit_code = report_error('{}: Invalid {} format!\n{}'.format(
+                source_file_path, 'range' if args.pages else 'split', ex))
+        finally:
+            pdf_reader.stream.close()
+    return exit_code
+
+
+def delete_command(args):
+    from documents import open_reader
+    from deletion import RangeDeleteThread, delete_result_file_name
+
+    exit_code = 0
+    for source_file_path in [os.path.normpath(file_path) for file_path in args.inputs]:
+        try:
+            pdf_reader = open_reader(source_file_path, args.mmap)
+        except Exception as ex:
+            exit_code = report_error('{}: {}'.format(source_file_path, ex))
+            continue
+        try:
+            pages_range = PageRange.parse(args.pages, len(pdf_reader.pages))
+            output_path = resolve_output_file(args.output, source_file_path, delete_result_file_name,
+                                              len(args.inputs))
+            thread = RangeDeleteThread(pdf_reader, output_path, pages_range, buffer_size=args.buffer_size * 1024,
+                                       incremental=args.incremental, source_file_path=source_file_path)
+            exit_code = run_thread(thread) or exit_code
+            if exit_code == CANCELLED_EXIT_CODE:
+                break
+        except ValueError as ex:
+            exit_code = report_error('{}: Invalid range format!\n{}'.format(source_file_path, ex))
+        finally:
+            pdf_reader.stream.close()
+    return exit_code
+
+
+def pipeline_command(args):
+    from pipelinerun import PipelineThread, parse_steps
+
+    try:
+        steps = parse_steps(args.steps)
+    except ValueError as ex:
+        return report_error('Invalid steps!\n{}'.format(ex))
+    inputs = [split_page_range_suffix(text) for text in args.inputs]
+    in_file_list = [os.path.normpath(file_path) for file_path, _ in inputs]
+    result_path = os.path.normpath(args.output)
+    if result_path in in_file_list:
+        return report_error('The file cannot be written to itself...')
+    pipeline_thread = PipelineThread(in_file_list, steps, result_path, buffer_size=args.buffer_size * 1024,
+                                     page_ranges=[range_text for _, range_text in inputs], use_mmap=args.mmap)
+    exit_code = run_thread(pipeline_thread)
+    if not exit_code:
+        print('Files written: {}'.format(len(pipeline_thread.output_files)))
+    return exit_code
+
+
+def watch_command(args):
+    from cancellation import TaskCancelled
+    from watcher import FolderWatcher, STATE_FILE, SETTLE_TIME, WATCH_INTERVAL, WatchState, load_config
+
+    try:
+        config, rules = load_config(args.config)
+        state = WatchState(args.state or config.get('state') or STATE_FILE)
+    except (OSError, ValueError) as ex:
+        return report_error('{}: {}'.format(args.config, ex))
+    settle_time = args.settle if args.settle is not None else config.get('settle', SETTLE_TIME)
+    interval = args.interval if args.interval is not None else config.get('interval', WATCH_INTERVAL)
+    folder_watcher = FolderWatcher(rules, state, run_thread, settle_time, args.buffer_size * 1024)
+    try:
+        folder_watcher.run(interval, once=args.once)
+    except TaskCancelled:
+        return CANCELLED_EXIT_CODE
+    except KeyboardInterrupt:
+        # Stopped between the jobs, nothing is left half done
+        logging.info('The watching is stopped')
+    return 0
+
+
+def cache_command(args):
+    from progress import format_size
+    from resultcache import result_cache
+
+    if args.action == 'clear':
+        try:
+            result_cache.clear()
+        except OSError as ex:
+            return report_error('{}: {}'.format(result_cache.cache_dir, ex))
+        print('The result cache is cleared')
+        return 0
+    try:
+        stats = result_cache.stats()
+    except (OSError, ValueError) as ex:
+        return report_error('{}: {}'.format(result_cache.cache_dir, ex))
+    print('Directory: {}'.format(stats['directory']))
+    print('Entries: {}, size: {} of {}'.format(stats['entries'], format_size(stats['size']),
+                                               format_size(stats['max_size'])))
+    print('Hits: {}, misses: {}, hit ratio: {:.0%}'.format(stats['hits'], stats['misses'], stats['hit_ratio']))
+    return 0
+
+
+def resolve_output_file(output, source_file_path, result_file_name, inputs_count):
+    if not output:
+        return os.path.join(os.path.dirname(source_file_path), result_file_name(source_file_path))
+    if os.path.isdir(output) or inputs_count > 1:
+        os.makedirs(output, exist_ok=True)
+        return os.path.join(output, result_file_name(source_file_path))
+    return os.path.normpath(output)
+
+
+def run_thread(thread):
+    thread.start()
+    # The progress line is shown only on a terminal, redirected output stays clean
+    show_progress = sys.stderr.isatty()
+    line_length = 0
+    while thread.is_alive():
+        try:
+            thread.join(PROGRESS_INTERVAL)
+        except KeyboardInterrupt:
+            # The worker stops at the next page or write and removes its partial output
+            thread.cancel()
+            thread.join()
+            if line_length:
+                print(file=sys.stderr)
+            report_error(thread.get_message() or CANCELLED_MESSAGE)
+            return CANCELLED_EXIT_CODE
+        events = thread.progress.drain()
+        if show_progress and events and not events[-1].finished:
+            line = events[-1].describe()
+            print('\r' + line.ljust(line_length), end='', file=sys.stderr, flush=True)
+            line_length = len(line)
+    if line_length:
+        print('\r' + ' ' * line_length + '\r', end='', file=sys.stderr, flush=True)
+    if thread.get_message():
+        return report_error(thread.get_message())
+    return 0
+
+
+def report_error(message):
+    logging.error(message)
+    print(message, file=sys.stderr)
+    return 1
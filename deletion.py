@@ -0,0 +1,107 @@
+import datetime
+import logging
+import os
+import threading
+
+from pypdf import PdfWriter
+
+from cancellation import CancelToken, TaskCancelled
+from documents import registry
+from incremental import IncrementalUpdateError, delete_pages_incrementally
+from instrumentation import Span, new_job_id
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE, check_free_space, estimate_output_size
+from progress import ProgressChannel
+
+
+class RangeDeleteThread(threading.Thread):
+    def __init__(self, pdf_reader, output_path, page_range, buffer_size=WRITE_BUFFER_SIZE, incremental=False,
+                 source_file_path=None):
+        super().__init__()
+        self.pdf_reader = pdf_reader
+        self.output_path = output_path
+        self.page_range = page_range
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.buffer_size = buffer_size
+        self.incremental = incremental
+        self.source_file_path = source_file_path
+        self.warning_message = ''
+
+    def run(self):
+        with registry.reader_lock(self.pdf_reader):
+            pdf_writer = PdfWriter()
+            try:
+                logging.info('**** The page range deleting session is started... ****')
+                if self.incremental and self.source_file_path and self.delete_incrementally():
+                    logging.info('**** The page range deleting session is finished ****')
+                    return
+                page_count = len(self.pdf_reader.pages)
+                kept_intervals = self.page_range.complement(page_count)
+                kept_count = sum(last - first + 1 for first, last in kept_intervals)
+                check_free_space(self.output_path, estimate_output_size(self.pdf_reader, kept_count))
+                logging.info('Deleting pages is begun...')
+                with Span('delete', 'copy_pages', self.job_id, pages=kept_count):
+                    self.progress.start_phase('Copying remaining pages', kept_count)
+                    i = 0
+                    for first, last in kept_intervals:
+                        for page_number in range(first, last + 1):
+                            self.cancel_token.check()
+                            pdf_writer.add_page(self.pdf_reader.pages[page_number - 1])
+                            i += 1
+                            self.progress.update(i)
+                logging.info('Deleting pages is finished')
+
+                logging.info('The writing to the result file is started...')
+                with Span('delete', 'write', self.job_id, pages=kept_count) as span:
+                    self.progress.start_phase('Writing result file')
+                    with AtomicOutputFile(self.output_path, self.buffer_size, self.cancel_token) as output_file:
+                        pdf_writer.write(output_file)
+                        span.bytes_written = output_file.tell()
+                        self.progress.add_bytes(span.bytes_written)
+                logging.info('The writing to the result file is finished')
+
+            except TaskCancelled as ex:
+                logging.info(ex)
+                self.set_message(str(ex))
+                return
+            except Exception as ex:
+                logging.error(ex)
+                self.set_message(str(ex))
+                return
+            finally:
+                pdf_writer.close()
+                self.progress.finish()
+
+            logging.info('**** The page range deleting session is finished ****')
+
+    def delete_incrementally(self):
+        # Appends the changed page tree to a copy of the source (or to the source itself),
+        # falls back to the full rewrite when the file cannot be updated this way
+        with Span('delete', 'incremental_update', self.job_id) as span:
+            self.progress.start_phase('Writing result file')
+            try:
+                span.pages, span.bytes_written = delete_pages_incrementally(
+                    self.pdf_reader, self.page_range, self.source_file_path, self.output_path, self.buffer_size,
+                    self.cancel_token, self.progress)
+            except IncrementalUpdateError as ex:
+                span.status = 'fallback'
+                logging.warning('The incremental update is not possible: {}, the file is rewritten'.format(ex))
+                return False
+        return True
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def delete_result_file_name(source_file):
+    curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
+    source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
+    file_name = '{}_del_result_{}{}'.format(source_file_name, curr_datetime, source_file_extension)
+    return file_name
@@ -0,0 +1,253 @@
+import collections
+import logging
+import mmap
+import os
+import threading
+
+from pypdf import PdfReader
+
+from instrumentation import Span, new_job_id
+from progress import ProgressChannel
+
+MAX_DOCUMENTS = 8
+MAX_DOCUMENTS_BYTES = 1024 * 1024 * 1024
+MMAP_VARIABLE = 'MAGICPDF_MMAP'
+TITLE_MAX_LENGTH = 60
+
+
+class DocumentInfo:
+    def __init__(self, page_count, version='', title='', author='', is_encrypted=False):
+        self.page_count = page_count
+        self.version = version
+        self.title = title
+        self.author = author
+        self.is_encrypted = is_encrypted
+
+    def describe(self):
+        details = ['PDF {}'.format(self.version)] if self.version else []
+        title = self.title if len(self.title) <= TITLE_MAX_LENGTH else self.title[:TITLE_MAX_LENGTH - 3] + '...'
+        title = ' by '.join(part for part in ('"{}"'.format(title) if title else '', self.author) if part)
+        if title:
+            details.append(title)
+        if self.is_encrypted:
+            details.append('encrypted')
+        return ', '.join(details)
+
+
+class DocumentEntry:
+    def __init__(self, key):
+        self.key = key
+        self.size = key[2]
+        self.pdf_reader = None
+        self.error = None
+        self.references = 0
+        self.loaded = threading.Event()
+        # pypdf readers are not thread-safe, every user of a shared reader holds this lock
+        self.lock = threading.RLock()
+
+
+class DocumentRegistry:
+    def __init__(self, max_documents=MAX_DOCUMENTS, max_bytes=MAX_DOCUMENTS_BYTES, use_mmap=None):
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.use_mmap = use_mmap
+        self.entries = collections.OrderedDict()
+        self.readers = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, file_path):
+        key = document_key(file_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            is_owner = entry is None
+            if is_owner:
+                self.misses += 1
+                self.evict_stale(key)
+                entry = DocumentEntry(key)
+                self.entries[key] = entry
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            entry.references += 1
+
+        if is_owner:
+            try:
+                entry.pdf_reader = open_reader(key[0], self.use_mmap)
+            except Exception as ex:
+                entry.error = ex
+            finally:
+                entry.loaded.set()
+        else:
+            logging.info('The document "{}" is taken from the registry'.format(key[0]))
+            entry.loaded.wait()
+
+        with self.lock:
+            if entry.error is not None:
+                entry.references -= 1
+                if self.entries.get(key) is entry:
+                    del self.entries[key]
+                raise entry.error
+            self.readers[id(entry.pdf_reader)] = entry
+            self.evict()
+        return entry.pdf_reader
+
+    def retain(self, pdf_reader):
+        with self.lock:
+            entry = self.readers.get(id(pdf_reader))
+            if entry is not None:
+                entry.references += 1
+
+    def release(self, pdf_reader):
+        with self.lock:
+            entry = self.readers.get(id(pdf_reader))
+            if entry is None:
+                return
+            entry.references = max(entry.references - 1, 0)
+            self.evict()
+
+    def reader_lock(self, pdf_reader):
+        with self.lock:
+            entry = self.readers.get(id(pdf_reader))
+        return entry.lock if entry is not None else threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if entry.references == 0 and entry.loaded.is_set():
+                    self.remove(key)
+
+    def evict(self):
+        total_bytes = sum(entry.size for entry in self.entries.values())
+        for key, entry in list(self.entries.items()):
+            if len(self.entries) <= self.max_documents and total_bytes <= self.max_bytes:
+                break
+            if entry.references > 0 or not entry.loaded.is_set():
+                continue
+            total_bytes -= entry.size
+            self.remove(key)
+
+    def evict_stale(self, key):
+        # The file was changed on disk: drop unused readers of its previous versions
+        for stale_key, entry in list(self.entries.items()):
+            if stale_key[0] == key[0] and entry.references == 0 and entry.loaded.is_set():
+                self.remove(stale_key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        if entry.pdf_reader is not None:
+            self.readers.pop(id(entry.pdf_reader), None)
+            close_reader(entry.pdf_reader)
+        logging.info('The document "{}" is evicted from the registry'.format(key[0]))
+
+
+class OpenPDFFileThread(threading.Thread):
+    def __init__(self, source_file_path):
+        super().__init__()
+        self.source_file_path = source_file_path
+        self.pdf_reader = None
+        self.page_count = 0
+        # Set before the document is loaded, the tabs show it while the loading goes on
+        self.document_info = None
+        self.progress = ProgressChannel()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        logging.info('**** Starting the loading pdf file session... ****')
+        logging.info('Start loading...')
+        self.progress.start_phase('Reading document info')
+        try:
+            with Span('open', 'peek', self.job_id) as span:
+                self.document_info = peek_document(self.source_file_path)
+                if self.document_info is None:
+                    span.status = 'fallback'
+                else:
+                    self.page_count = span.pages = self.document_info.page_count
+            self.progress.start_phase('Loading file')
+            with Span('open', 'load', self.job_id) as span:
+                pdf_reader = registry.acquire(self.source_file_path)
+                # The page tree is walked by the first job that needs the pages, not here
+                if self.document_info is None:
+                    with registry.reader_lock(pdf_reader):
+                        self.page_count = len(pdf_reader.pages)
+                span.pages = self.page_count
+            self.set_pdf_reader(pdf_reader)
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+        finally:
+            self.progress.finish()
+        logging.info('Loading is finished')
+        logging.info('**** The loading pdf file session is finished ****')
+
+    def set_pdf_reader(self, pdf_reader):
+        self.pdf_reader = pdf_reader
+
+    def get_pdf_reader(self):
+        return self.pdf_reader
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def open_reader(file_path, use_mmap=None):
+    # PdfReader(path) copies the whole file into memory; a read-only mapping is read straight
+    # from the page cache and is shared with the other processes that map the same file
+    if use_mmap is None:
+        use_mmap = is_mmap_enabled()
+    if not use_mmap:
+        return PdfReader(file_path)
+    with open(file_path, 'rb') as pdf_file:
+        mapping = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return PdfReader(mapping)
+    except BaseException:
+        mapping.close()
+        raise
+
+
+def peek_document(file_path):
+    # Reads the trailer, the cross-reference sections and the root of the page tree only: unlike a lenient
+    # reader a strict one does not check the header of every object, and the file is read from disk on demand.
+    # None means the file needs the lenient reader, the page count is taken from it then
+    try:
+        with open(file_path, 'rb') as pdf_file:
+            pdf_reader = PdfReader(pdf_file, strict=True)
+            page_count = int(pdf_reader.trailer['/Root']['/Pages']['/Count'])
+            if page_count < 0:
+                return None
+            document_info = DocumentInfo(page_count, pdf_reader.pdf_header[5:].strip(),
+                                         is_encrypted=pdf_reader.is_encrypted)
+            if not pdf_reader.is_encrypted:
+                metadata = pdf_reader.metadata or {}
+                document_info.title = str(metadata.get('/Title') or '').strip()
+                document_info.author = str(metadata.get('/Author') or '').strip()
+            return document_info
+    except Exception as ex:
+        logging.info('The document info of "{}" is not read: {}'.format(file_path, ex))
+        return None
+
+
+def is_mmap_enabled():
+    return os.environ.get(MMAP_VARIABLE, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def document_key(file_path):
+    file_path = os.path.normpath(os.path.abspath(file_path))
+    stat_result = os.stat(file_path)
+    return file_path, stat_result.st_mtime_ns, stat_result.st_size
+
+
+def close_reader(pdf_reader):
+    try:
+        pdf_reader.stream.close()
+    except Exception as ex:
+        logging.error(ex)
+
+
+registry = DocumentRegistry()
@@ -0,0 +1,473 @@
+import concurrent.futures
+import datetime
+import logging
+import mmap
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from cancellation import CancelToken, TaskCancelled
+from documents import open_reader, registry
+from instrumentation import Span, new_job_id
+from logconfig import configure_worker_logging, start_worker_logging, stop_worker_logging
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE, check_free_space, estimate_output_size, source_size
+from progress import ProgressChannel
+from resultcache import is_cache_enabled, result_cache
+
+PBP_MAX_CHUNK_SIZE = 50
+CANCEL_CHECK_INTERVAL = 0.2
+SPLIT_MODES = ('pages', 'size', 'bookmarks')
+PAGE_OVERHEAD_SIZE = 512
+FILE_NAME_MAX_LENGTH = 80
+# The workers are started from a job thread while the window and other threads run, a forked copy of such a
+# process may hold a lock that no thread will release; a spawned worker starts clean
+WORKER_CONTEXT = multiprocessing.get_context('spawn')
+
+cancel_event = None
+# The document of a worker process, opened once by the initializer and used for all the chunks of the worker
+worker_reader = None
+worker_source_path = None
+
+
+class PbPExtractThread(threading.Thread):
+    def __init__(self, source_file_path, pdf_reader, output_path, output_dir_name, workers=1,
+                 buffer_size=WRITE_BUFFER_SIZE):
+        super().__init__()
+        self.source_file_path = source_file_path
+        self.pdf_reader = pdf_reader
+        self.output_path = output_path
+        self.output_dir_name = output_dir_name
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.workers = max(1, workers)
+        self.buffer_size = buffer_size
+        self.warning_message = ''
+
+    def run(self):
+        try:
+            with registry.reader_lock(self.pdf_reader):
+                self.extract()
+        finally:
+            self.progress.finish()
+
+    def extract(self):
+        logging.info('**** The page by page extraction session is started... ****')
+        output_dir = os.path.join(self.output_path, self.output_dir_name)
+        try:
+            check_free_space(self.output_path, source_size(self.pdf_reader))
+            logging.info('Creating directory is started...')
+            os.makedirs(output_dir)
+            logging.info('The directory \"{}\" was created'.format(output_dir))
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+            return
+        output_filename = os.path.splitext(os.path.basename(self.source_file_path))[0]
+        logging.info('Extraction pages is begun...')
+        with Span('page_by_page_extract', 'extract', self.job_id) as span:
+            if self.workers > 1:
+                self.extract_in_processes(output_dir, output_filename)
+            else:
+                self.extract_in_thread(output_dir, output_filename)
+            span.pages = self.progress.done
+            span.bytes_written = self.progress.bytes_written
+            if self.get_message():
+                span.status = 'cancelled' if self.cancel_token.is_cancelled() else 'error'
+        logging.info('Extraction pages is finished')
+        logging.info('**** The page by page extraction session is finished ****')
+
+    def extract_in_thread(self, output_dir, output_filename):
+        self.progress.start_phase('Extracting pages', len(self.pdf_reader.pages))
+        for i, page in enumerate(self.pdf_reader.pages):
+            pdf_writer = PdfWriter()
+            try:
+                self.cancel_token.check()
+                pdf_writer.add_page(page)
+                with AtomicOutputFile(os.path.join(output_dir, page_file_name(i + 1, output_filename)),
+                                      self.buffer_size, self.cancel_token) as output_file:
+                    pdf_writer.write(output_file)
+                    self.progress.update(i + 1, output_file.tell())
+            except Exception as ex:
+                if isinstance(ex, TaskCancelled):
+                    logging.info(ex)
+                else:
+                    logging.error(ex)
+                self.set_message(str(ex))
+                self.remove_output_dir(output_dir)
+                break
+            finally:
+                pdf_writer.close()
+
+    def extract_in_processes(self, output_dir, output_filename):
+        page_count = len(self.pdf_reader.pages)
+        chunk_size = min(max(page_count // (self.workers * 4), 1), PBP_MAX_CHUNK_SIZE)
+        logging.info('Extracting with {} processes, {} pages per task'.format(self.workers, chunk_size))
+        extracted_count = 0
+        self.progress.start_phase('Extracting pages', page_count)
+        # The worker processes cannot see the thread's token, they poll a process-shared event instead
+        shared_cancel_event = WORKER_CONTEXT.Event()
+        # The workers map the file too when the document was opened mapped, all of them share its pages
+        use_mmap = isinstance(self.pdf_reader.stream, mmap.mmap)
+        worker_log_queue, worker_log_listener = start_worker_logging(WORKER_CONTEXT)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=WORKER_CONTEXT,
+                                                          initializer=init_extract_worker,
+                                                          initargs=(shared_cancel_event, self.source_file_path,
+                                                                    use_mmap, worker_log_queue,
+                                                                    logging.getLogger().level))
+        try:
+            futures = [executor.submit(extract_pages_chunk, self.source_file_path, first_page,
+                                       min(first_page + chunk_size, page_count), output_dir, output_filename,
+                                       self.buffer_size, use_mmap)
+                       for first_page in range(0, page_count, chunk_size)]
+            pending_futures = set(futures)
+            while pending_futures:
+                done_futures, pending_futures = concurrent.futures.wait(
+                    pending_futures, timeout=CANCEL_CHECK_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+                if self.cancel_token.is_cancelled():
+                    shared_cancel_event.set()
+                    self.cancel_token.check()
+                for future in done_futures:
+                    chunk_page_count, chunk_bytes = future.result()
+                    extracted_count += chunk_page_count
+                    self.progress.update(extracted_count, chunk_bytes)
+        except Exception as ex:
+            if isinstance(ex, TaskCancelled):
+                logging.info(ex)
+            else:
+                logging.error(ex)
+            self.set_message(str(ex))
+            shared_cancel_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.remove_output_dir(output_dir)
+        finally:
+            executor.shutdown(wait=True)
+            stop_worker_logging(worker_log_queue, worker_log_listener)
+
+    def remove_output_dir(self, output_dir):
+        try:
+            logging.info('Starting a deleting directory...')
+            shutil.rmtree(output_dir)
+            logging.info('The directory \"{}\" was deleted'.format(output_dir))
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+class RangeExtractThread(threading.Thread):
+    def __init__(self, pdf_reader, output_path, pages_range, buffer_size=WRITE_BUFFER_SIZE, source_file_path=None,
+                 use_cache=None):
+        super().__init__()
+        self.pdf_reader = pdf_reader
+        self.output_path = output_path
+        self.pages_range = pages_range
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.buffer_size = buffer_size
+        # The result can be cached only when the source file is known
+        self.source_file_path = source_file_path
+        self.use_cache = (is_cache_enabled() if use_cache is None else use_cache) and source_file_path is not None
+        self.is_cached = False
+        self.warning_message = ''
+
+    def run(self):
+        with registry.reader_lock(self.pdf_reader):
+            pdf_writer = PdfWriter()
+            try:
+                logging.info('**** The page range extraction session is started... ****')
+                cache_key = None
+                if self.use_cache:
+                    with Span('range_extract', 'cache', self.job_id, pages=len(self.pages_range)) as span:
+                        self.progress.start_phase('Looking up the result cache')
+                        cache_key = result_cache.make_key('range_extract', [self.source_file_path],
+                                                          pages=str(self.pages_range))
+                        self.is_cached = result_cache.fetch(cache_key, self.output_path)
+                        span.status = 'hit' if self.is_cached else 'miss'
+                    if self.is_cached:
+                        return
+                check_free_space(self.output_path, estimate_output_size(self.pdf_reader, len(self.pages_range)))
+                logging.info('Extraction pages is begun...')
+                with Span('range_extract', 'copy_pages', self.job_id, pages=len(self.pages_range)):
+                    self.progress.start_phase('Extracting pages', len(self.pages_range))
+                    for i, page_number in enumerate(self.pages_range):
+                        self.cancel_token.check()
+                        pdf_writer.add_page(self.pdf_reader.pages[page_number - 1])
+                        self.progress.update(i + 1)
+                logging.info('Extraction pages is finished')
+
+                logging.info('The writing to the result file is started...')
+                with Span('range_extract', 'write', self.job_id, pages=len(self.pages_range)) as span:
+                    self.progress.start_phase('Writing result file')
+                    with AtomicOutputFile(self.output_path, self.buffer_size, self.cancel_token) as output_file:
+                        pdf_writer.write(output_file)
+                        span.bytes_written = output_file.tell()
+                        self.progress.add_bytes(span.bytes_written)
+                logging.info('The writing to the result file is finished')
+                if self.use_cache:
+                    result_cache.store(cache_key, self.output_path, 'range_extract')
+
+            except TaskCancelled as ex:
+                logging.info(ex)
+                self.set_message(str(ex))
+                return
+            except Exception as ex:
+                logging.error(ex)
+                self.set_message(str(ex))
+                return
+            finally:
+                pdf_writer.close()
+                self.progress.finish()
+            logging.info('**** The page range extraction session is finished ****')
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+class SplitThread(threading.Thread):
+    # Splits the document into several files in one pass over the pages: every chunk is collected
+    # in its own writer and written as soon as its last page is added
+    def __init__(self, source_file_path, pdf_reader, output_path, output_dir_name, mode, value=None,
+                 buffer_size=WRITE_BUFFER_SIZE):
+        super().__init__()
+        if mode not in SPLIT_MODES:
+            raise ValueError('Unknown split mode "{}"'.format(mode))
+        if mode != 'bookmarks' and (value is None or value <= 0):
+            raise ValueError('The {} per file must be positive'.format('pages' if mode == 'pages' else 'size'))
+        self.source_file_path = source_file_path
+        self.pdf_reader = pdf_reader
+        self.output_path = output_path
+        self.output_dir_name = output_dir_name
+        self.mode = mode
+        self.value = value
+        self.buffer_size = buffer_size
+        self.file_count = 0
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        try:
+            with registry.reader_lock(self.pdf_reader):
+                self.split()
+        finally:
+            self.progress.finish()
+
+    def split(self):
+        logging.info('**** The split session ({}) is started... ****'.format(self.mode))
+        output_dir = os.path.join(self.output_path, self.output_dir_name)
+        output_filename = os.path.splitext(os.path.basename(self.source_file_path))[0]
+        try:
+            boundaries = self.bookmark_boundaries() if self.mode == 'bookmarks' else {}
+            check_free_space(self.output_path, source_size(self.pdf_reader))
+            os.makedirs(output_dir)
+            logging.info('The directory \"{}\" was created'.format(output_dir))
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+            return
+
+        with Span('split', self.mode, self.job_id) as span:
+            try:
+                self.split_pages(output_dir, output_filename, boundaries)
+            except Exception as ex:
+                if isinstance(ex, TaskCancelled):
+                    logging.info(ex)
+                else:
+                    logging.error(ex)
+                span.status = 'cancelled' if isinstance(ex, TaskCancelled) else 'error'
+                self.set_message(str(ex))
+                self.remove_output_dir(output_dir)
+            span.pages = self.progress.done
+            span.bytes_written = self.progress.bytes_written
+        logging.info('Files written: {}'.format(self.file_count))
+        logging.info('**** The split session is finished ****')
+
+    def split_pages(self, output_dir, output_filename, boundaries):
+        page_count = len(self.pdf_reader.pages)
+        max_size = self.value * 1024 * 1024 if self.mode == 'size' else None
+        self.progress.start_phase('Splitting pages', page_count)
+        pdf_writer = PdfWriter()
+        chunk_first_page = 1
+        chunk_title = boundaries.get(1)
+        chunk_size = 0
+        seen_streams = set()
+        try:
+            for page_number, page in enumerate(self.pdf_reader.pages, start=1):
+                self.cancel_token.check()
+                if max_size is not None:
+                    page_size, new_streams = page_stream_size(page, seen_streams)
+                if page_number > chunk_first_page:
+                    is_boundary = False
+                    if self.mode == 'pages':
+                        is_boundary = page_number - chunk_first_page >= self.value
+                    elif self.mode == 'bookmarks':
+                        is_boundary = page_number in boundaries
+                    else:
+                        is_boundary = chunk_size + page_size > max_size
+                    if is_boundary:
+                        self.write_chunk(pdf_writer, output_dir, split_file_name(
+                            chunk_first_page, page_number - 1, chunk_title, self.file_count + 1, output_filename))
+                        pdf_writer.close()
+                        pdf_writer = PdfWriter()
+                        chunk_first_page = page_number
+                        chunk_title = boundaries.get(page_number)
+                        chunk_size = 0
+                        seen_streams = set()
+                        if max_size is not None:
+                            # The new file has none of the streams yet, the page is measured again for it
+                            page_size, new_streams = page_stream_size(page, seen_streams)
+                if max_size is not None:
+                    chunk_size += page_size
+                    seen_streams |= new_streams
+                pdf_writer.add_page(page)
+                self.progress.update(page_number)
+            self.write_chunk(pdf_writer, output_dir, split_file_name(
+                chunk_first_page, page_count, chunk_title, self.file_count + 1, output_filename))
+        finally:
+            pdf_writer.close()
+
+    def write_chunk(self, pdf_writer, output_dir, file_name):
+        with AtomicOutputFile(os.path.join(output_dir, file_name), self.buffer_size,
+                              self.cancel_token) as output_file:
+            pdf_writer.write(output_file)
+            self.progress.add_bytes(output_file.tell())
+        self.file_count += 1
+
+    def bookmark_boundaries(self):
+        # The first page of every top-level bookmark starts a file named after the bookmark
+        boundaries = {}
+        for outline_item in self.pdf_reader.outline:
+            if isinstance(outline_item, list):
+                continue
+            page_index = self.pdf_reader.get_destination_page_number(outline_item)
+            if page_index is not None and page_index >= 0:
+                boundaries.setdefault(page_index + 1, outline_item.title)
+        if not boundaries:
+            raise ValueError('The document has no top-level bookmarks')
+        return boundaries
+
+    def remove_output_dir(self, output_dir):
+        try:
+            shutil.rmtree(output_dir)
+            logging.info('The directory \"{}\" was deleted'.format(output_dir))
+        except Exception as ex:
+            logging.error(ex)
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def page_stream_size(page, seen_streams):
+    # An estimate of what the page adds to a file: the encoded streams it uses (contents, images, fonts),
+    # the streams already in the current file are not counted. Returns the size and the objects new to the
+    # file; seen_streams is left as it is, the page may start the next file instead
+    size = PAGE_OVERHEAD_SIZE
+    new_streams = set()
+    pending = [page.raw_get('/Contents') if '/Contents' in page else None,
+               page.raw_get('/Resources') if '/Resources' in page else None]
+    while pending:
+        pdf_object = pending.pop()
+        if isinstance(pdf_object, IndirectObject):
+            if pdf_object.idnum in seen_streams or pdf_object.idnum in new_streams:
+                continue
+            new_streams.add(pdf_object.idnum)
+            pdf_object = pdf_object.get_object()
+        if isinstance(pdf_object, StreamObject):
+            size += len(pdf_object._data)
+        if isinstance(pdf_object, DictionaryObject):
+            pending.extend(pdf_object.raw_get(key) for key in pdf_object if key not in ('/Parent', '/P'))
+        elif isinstance(pdf_object, ArrayObject):
+            pending.extend(pdf_object)
+    return size, new_streams
+
+
+def split_file_name(first_page, last_page, title, file_number, output_filename):
+    if title is not None:
+        safe_title = ''.join(char if char.isalnum() or char in ' -_.,()' else '_' for char in title).strip()
+        return '{:03d} {} - {}.pdf'.format(file_number, safe_title[:FILE_NAME_MAX_LENGTH] or 'Untitled',
+                                           output_filename)
+    if first_page == last_page:
+        return page_file_name(first_page, output_filename)
+    return 'Pages {}-{} - {}.pdf'.format(first_page, last_page, output_filename)
+
+
+def extract_result_dir_name(source_file):
+    curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
+    source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
+    dir_name = '{}_extr_result_{}'.format(source_file_name, curr_datetime)
+    return dir_name
+
+
+def extract_result_file_name(source_file):
+    curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
+    source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file))
+    file_name = '{}_extr_result_{}{}'.format(source_file_name, curr_datetime, source_file_extension)
+    return file_name
+
+
+def page_file_name(page_number, output_filename):
+    return 'Page {} - {}.pdf'.format(page_number, output_filename)
+
+
+def init_extract_worker(event, source_file_path=None, use_mmap=False, log_queue=None, log_level=logging.WARNING):
+    global cancel_event, worker_reader, worker_source_path
+    cancel_event = event
+    configure_worker_logging(log_queue, log_level)
+    # Ctrl+C is handled by the parent process, it cancels the remaining chunks through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The document is parsed once per worker, not once per chunk; the process exit closes it
+    if source_file_path is not None:
+        worker_reader = open_reader(source_file_path, use_mmap)
+        worker_source_path = source_file_path
+
+
+def extract_pages_chunk(source_file_path, first_page, stop_page, output_dir, output_filename,
+                        buffer_size=WRITE_BUFFER_SIZE, use_mmap=False):
+    is_worker_reader = worker_reader is not None and worker_source_path == source_file_path
+    pdf_reader = worker_reader if is_worker_reader else open_reader(source_file_path, use_mmap)
+    bytes_written = 0
+    try:
+        for page_index in range(first_page, stop_page):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TaskCancelled()
+            pdf_writer = PdfWriter()
+            try:
+                pdf_writer.add_page(pdf_reader.pages[page_index])
+                with AtomicOutputFile(os.path.join(output_dir, page_file_name(page_index + 1, output_filename)),
+                                      buffer_size) as output_file:
+                    pdf_writer.write(output_file)
+                    bytes_written += output_file.tell()
+            finally:
+                pdf_writer.close()
+    finally:
+        if not is_worker_reader:
+            pdf_reader.stream.close()
+    return stop_page - first_page, bytes_written
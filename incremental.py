@@ -0,0 +1,190 @@
+import io
+import logging
+import os
+import re
+
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE
+
+STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+TAIL_SIZE = 4096
+
+
+class IncrementalUpdateError(Exception):
+    pass
+
+
+class PageTreeEditor:
+    # Removes pages from the page tree by rewriting only the Pages nodes on the way to them;
+    # the pages, their contents and resources stay where they are in the original file
+    def __init__(self, pdf_reader, page_range):
+        self.pdf_reader = pdf_reader
+        self.page_range = page_range
+        self.page_number = 0
+        self.changed_nodes = {}
+
+    def edit(self):
+        root_reference = self.pdf_reader.trailer['/Root'].raw_get('/Pages')
+        if not isinstance(root_reference, IndirectObject):
+            raise IncrementalUpdateError('The page tree root is not an indirect object')
+        kept_count = self.edit_node(root_reference, set())
+        if not kept_count:
+            raise IncrementalUpdateError('All pages cannot be deleted')
+        return kept_count
+
+    def edit_node(self, node_reference, visited):
+        if node_reference.idnum in visited:
+            raise IncrementalUpdateError('The page tree has a cycle')
+        visited.add(node_reference.idnum)
+        node = node_reference.get_object()
+        kids = []
+        kept_count = 0
+        is_changed = False
+        for kid_reference in node.raw_get('/Kids'):
+            if not isinstance(kid_reference, IndirectObject):
+                raise IncrementalUpdateError('The page tree has a direct kid object')
+            kid = kid_reference.get_object()
+            if kid.get('/Type') == '/Pages' or '/Kids' in kid:
+                kid_count = self.edit_node(kid_reference, visited)
+                if kid_count:
+                    kids.append(kid_reference)
+                    kept_count += kid_count
+                else:
+                    is_changed = True
+            else:
+                self.page_number += 1
+                if self.page_number in self.page_range:
+                    is_changed = True
+                else:
+                    kids.append(kid_reference)
+                    kept_count += 1
+        # A node is rewritten when it lost kids or when one of its kids lost pages; an emptied node is dropped
+        # by its parent and not written at all
+        if kept_count and (is_changed or node.get('/Count') != kept_count):
+            changed_node = DictionaryObject(node)
+            changed_node[NameObject('/Kids')] = ArrayObject(kids)
+            changed_node[NameObject('/Count')] = NumberObject(kept_count)
+            self.changed_nodes[node_reference.idnum] = (node_reference.generation, changed_node)
+        return kept_count
+
+
+def find_startxref(stream):
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(max(0, size - TAIL_SIZE))
+    matches = STARTXREF_RE.findall(stream.read())
+    if not matches:
+        raise IncrementalUpdateError('The startxref of the file was not found')
+    return int(matches[-1]), size
+
+
+def is_xref_stream(stream, xref_position):
+    stream.seek(xref_position)
+    return not stream.read(4).startswith(b'xref')
+
+
+def build_update(pdf_reader, changed_nodes, base_position, prev_position, xref_stream):
+    update = io.BytesIO()
+    update.write(b'\n')
+    offsets = {}
+    for object_number in sorted(changed_nodes):
+        generation, node = changed_nodes[object_number]
+        offsets[object_number] = (base_position + update.tell(), generation)
+        update.write(b'%d %d obj\n' % (object_number, generation))
+        node.write_to_stream(update)
+        update.write(b'\nendobj\n')
+
+    trailer = DictionaryObject()
+    for key in ('/Root', '/Info', '/ID'):
+        if key in pdf_reader.trailer:
+            trailer[NameObject(key)] = pdf_reader.trailer.raw_get(key)
+    trailer[NameObject('/Prev')] = NumberObject(prev_position)
+    size = int(pdf_reader.trailer['/Size'])
+
+    xref_position = base_position + update.tell()
+    if xref_stream:
+        # An update of a file with cross-reference streams is a cross-reference stream as well
+        offsets[size] = (xref_position, 0)
+        size += 1
+        trailer[NameObject('/Type')] = NameObject('/XRef')
+        trailer[NameObject('/Size')] = NumberObject(size)
+        trailer[NameObject('/W')] = ArrayObject([NumberObject(1), NumberObject(8), NumberObject(2)])
+        index = []
+        data = io.BytesIO()
+        for object_number in sorted(offsets):
+            index += [NumberObject(object_number), NumberObject(1)]
+            offset, generation = offsets[object_number]
+            data.write(b'\x01' + offset.to_bytes(8, 'big') + generation.to_bytes(2, 'big'))
+        trailer[NameObject('/Index')] = ArrayObject(index)
+        trailer[NameObject('/Length')] = NumberObject(len(data.getvalue()))
+        update.write(b'%d 0 obj\n' % (size - 1))
+        trailer.write_to_stream(update)
+        update.write(b'\nstream\n')
+        update.write(data.getvalue())
+        update.write(b'\nendstream\nendobj\n')
+    else:
+        trailer[NameObject('/Size')] = NumberObject(size)
+        # The free head entry keeps readers from taking the table for a wrongly numbered one
+        update.write(b'xref\n0 1\n0000000000 65535 f \n')
+        for object_number in sorted(offsets):
+            offset, generation = offsets[object_number]
+            update.write(b'%d 1\n%010d %05d n \n' % (object_number, offset, generation))
+        update.write(b'trailer\n')
+        trailer.write_to_stream(update)
+        update.write(b'\n')
+    update.write(b'startxref\n%d\n%%%%EOF\n' % xref_position)
+    return update.getvalue()
+
+
+def delete_pages_incrementally(pdf_reader, page_range, source_file_path, output_path, buffer_size=WRITE_BUFFER_SIZE,
+                               cancel_token=None, progress=None):
+    if pdf_reader.is_encrypted:
+        raise IncrementalUpdateError('The file is encrypted')
+    editor = PageTreeEditor(pdf_reader, page_range)
+    kept_count = editor.edit()
+    source_stream = pdf_reader.stream
+    prev_position, source_size = find_startxref(source_stream)
+    xref_stream = is_xref_stream(source_stream, prev_position)
+    logging.info('Pages nodes to rewrite: {}, kept pages: {}'.format(len(editor.changed_nodes), kept_count))
+
+    in_place = os.path.exists(output_path) and os.path.samefile(source_file_path, output_path)
+    if in_place:
+        # Only the update is written, the original bytes are not touched
+        if os.path.getsize(source_file_path) != source_size:
+            raise IncrementalUpdateError('The file was changed since it was opened')
+        # Appending would change the other names of the file too, e.g. an entry of the result cache
+        if os.stat(output_path).st_nlink > 1:
+            raise IncrementalUpdateError('The file has other hard links')
+        update = build_update(pdf_reader, editor.changed_nodes, source_size, prev_position, xref_stream)
+        if cancel_token:
+            cancel_token.check()
+        with open(output_path, 'r+b') as output_file:
+            output_file.seek(source_size)
+            try:
+                output_file.write(update)
+                output_file.flush()
+                os.fsync(output_file.fileno())
+            except BaseException:
+                output_file.truncate(source_size)
+                raise
+        if progress:
+            progress.add_bytes(len(update))
+        return kept_count, len(update)
+
+    update = build_update(pdf_reader, editor.changed_nodes, source_size, prev_position, xref_stream)
+    with AtomicOutputFile(output_path, buffer_size, cancel_token) as output_file:
+        source_stream.seek(0)
+        if progress:
+            progress.start_phase('Copying source file')
+        while True:
+            chunk = source_stream.read(buffer_size)
+            if not chunk:
+                break
+            output_file.write(chunk)
+            if progress:
+                progress.add_bytes(len(chunk))
+        output_file.write(update)
+        if progress:
+            progress.add_bytes(len(update))
+    return kept_count, source_size + len(update)
@@ -0,0 +1,142 @@
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+from cancellation import TaskCancelled
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SPANS_LOGGER_NAME = 'magicpdf.spans'
+RSS_SAMPLE_INTERVAL = 0.02
+
+span_logger = logging.getLogger(SPANS_LOGGER_NAME)
+# The JSON lines go only to their own file (see logconfig), the program log keeps a readable line per phase
+span_logger.propagate = False
+
+
+class Span:
+    def __init__(self, operation, phase, job_id=None, pages=0, bytes_written=0):
+        self.operation = operation
+        self.phase = phase
+        self.job_id = job_id
+        self.pages = pages
+        self.bytes_written = bytes_written
+        self.started = None
+        self.start_time = None
+        self.duration = None
+        self.status = None
+        self.peak_rss = None
+
+    def __enter__(self):
+        self.started = datetime.datetime.now().isoformat(timespec='milliseconds')
+        self.start_time = time.perf_counter()
+        rss_sampler.add(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self.start_time
+        rss_sampler.remove(self)
+        # A status set inside the span (hit, miss, fallback...) is kept
+        if self.status is None:
+            if exc_type is None:
+                self.status = 'ok'
+            elif issubclass(exc_type, TaskCancelled):
+                self.status = 'cancelled'
+            else:
+                self.status = 'error'
+        emit_span(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'job': self.job_id,
+            'operation': self.operation,
+            'phase': self.phase,
+            'status': self.status,
+            'duration': round(self.duration, 6),
+            'pages': self.pages,
+            'bytes': self.bytes_written,
+            'rss': current_rss(),
+            'peak_rss': self.peak_rss,
+            'children_max_rss': process_max_rss(children=True),
+        }
+
+
+class RssSampler:
+    # A thread samples the resident size while any span is open and raises the peak of every open span,
+    # so a span gets the peak of its own phase; the samples of a phase that runs next to another job
+    # include the memory of that job too. No thread is started where the size cannot be read
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.spans = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, span):
+        rss = current_rss()
+        with self.lock:
+            span.peak_rss = rss
+            self.spans.add(span)
+            if rss is not None and self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='rss-sampler', daemon=True)
+                self.thread.start()
+
+    def remove(self, span):
+        rss = current_rss()
+        with self.lock:
+            self.spans.discard(span)
+            if rss is not None:
+                span.peak_rss = max(span.peak_rss or 0, rss)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = current_rss()
+            with self.lock:
+                if not self.spans:
+                    self.thread = None
+                    return
+                for span in self.spans:
+                    span.peak_rss = max(span.peak_rss or 0, rss or 0)
+
+
+def emit_span(span):
+    logging.info('Phase {}.{} time: {:.3f} s, {} pages, {} bytes ({})'.format(
+        span.operation, span.phase, span.duration, span.pages, span.bytes_written, span.status))
+    if span_logger.handlers:
+        span_logger.info(json.dumps(span.to_dict()))
+
+
+def new_job_id():
+    return uuid.uuid4().hex[:12]
+
+
+def current_rss():
+    # Read from /proc, None where it does not exist
+    try:
+        with open('/proc/self/statm') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def process_max_rss(children=False):
+    # The high-water mark of the whole process so far, not of the phase: every phase after the largest one
+    # shows the same value. It is kept for the page by page workers, which the sampler does not see;
+    # None without resource (Windows)
+    if resource is None:
+        return None
+    rusage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    return rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+
+
+rss_sampler = RssSampler()
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from cancellation import CANCELLED_MESSAGE
+from instrumentation import new_job_id
+
+INTERACTIVE = 0
+BATCH = 10
+MAX_WORKERS = 2
+# Workers only the interactive jobs may use, so an open does not wait for the batch jobs to finish
+INTERACTIVE_WORKERS = 1
+
+QUEUED = 'Queued'
+RUNNING = 'Running'
+FINISHED = 'Finished'
+FAILED = 'Failed'
+CANCELLED = 'Cancelled'
+
+
+class Job:
+    def __init__(self, task, title, priority, sequence):
+        # The task is one of the worker thread objects, the pool calls its run method
+        # instead of starting a thread per operation
+        self.task = task
+        self.title = title
+        self.priority = priority
+        self.sequence = sequence
+        self.job_id = getattr(task, 'job_id', None) or new_job_id()
+        self.status = QUEUED
+        self.submitted_time = time.monotonic()
+        self.start_time = None
+        self.finish_time = None
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def is_cancellable(self):
+        return self.status in (QUEUED, RUNNING) and hasattr(self.task, 'cancel')
+
+    def is_done(self):
+        return self.status in (FINISHED, FAILED, CANCELLED)
+
+    def describe_progress(self):
+        progress = getattr(self.task, 'progress', None)
+        if self.status != RUNNING or progress is None or not progress.phase:
+            return ''
+        return progress.snapshot().describe()
+
+    def elapsed(self):
+        if self.start_time is None:
+            return None
+        return (self.finish_time or time.monotonic()) - self.start_time
+
+
+class JobScheduler:
+    # One queue for all the tabs: the jobs wait in priority order and at most max_workers batch jobs run at
+    # once; interactive_workers more workers are kept for the interactive jobs
+    def __init__(self, max_workers=MAX_WORKERS, interactive_workers=INTERACTIVE_WORKERS):
+        self.max_workers = max_workers
+        self.interactive_workers = interactive_workers
+        self.running_batch_count = 0
+        self.queue = []
+        self.jobs = []
+        self.workers = []
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.is_stopping = False
+
+    def submit(self, task, title, priority=BATCH):
+        with self.condition:
+            if self.is_stopping:
+                raise RuntimeError('The job queue is stopped')
+            job = Job(task, title, priority, next(self.sequence))
+            heapq.heappush(self.queue, job)
+            self.jobs.append(job)
+            # The workers are started on demand, the command line never starts any
+            if (len(self.workers) < self.max_workers + self.interactive_workers
+                    and len(self.queue) > self.idle_workers()):
+                # The workers do not keep the program running, shutdown waits for the ones writing output
+                worker = threading.Thread(target=self.work, name='JobWorker-{}'.format(len(self.workers) + 1),
+                                          daemon=True)
+                worker.job = None
+                self.workers.append(worker)
+                worker.start()
+            # A waiting worker may not take a batch job, all of them look at the new one
+            self.condition.notify_all()
+        logging.info('Job {} "{}" is queued with priority {}'.format(job.job_id, title, priority))
+        return job
+
+    def idle_workers(self):
+        return sum(1 for worker in self.workers if getattr(worker, 'is_idle', False))
+
+    def work(self):
+        worker = threading.current_thread()
+        while True:
+            with self.condition:
+                worker.is_idle = True
+                while not self.can_start() and not self.is_stopping:
+                    self.condition.wait()
+                worker.is_idle = False
+                if self.is_stopping:
+                    return
+                job = heapq.heappop(self.queue)
+                job.status = RUNNING
+                job.start_time = time.monotonic()
+                worker.job = job
+                if job.priority > INTERACTIVE:
+                    self.running_batch_count += 1
+            logging.info('Job {} "{}" is started'.format(job.job_id, job.title))
+            try:
+                job.task.run()
+            except Exception as ex:
+                logging.error(ex)
+            with self.condition:
+                job.finish_time = time.monotonic()
+                job.status = job_result(job.task)
+                worker.job = None
+                if job.priority > INTERACTIVE:
+                    self.running_batch_count -= 1
+                    self.condition.notify_all()
+            logging.info('Job {} "{}" is {}'.format(job.job_id, job.title, job.status.lower()))
+
+    def can_start(self):
+        # The queue is in priority order, a batch job first in it means no interactive job is waiting
+        return bool(self.queue) and (self.queue[0].priority <= INTERACTIVE
+                                     or self.running_batch_count < self.max_workers)
+
+    def cancel(self, job):
+        if not job.is_cancellable():
+            return
+        with self.condition:
+            is_queued = job.status == QUEUED
+            if is_queued:
+                self.queue.remove(job)
+                heapq.heapify(self.queue)
+                job.status = CANCELLED
+                job.finish_time = time.monotonic()
+        job.task.cancel()
+        if is_queued:
+            # The task never runs, its owner is told about the end through the usual channel
+            job.task.set_message(CANCELLED_MESSAGE)
+            job.task.progress.finish()
+            logging.info('Job {} "{}" is cancelled in the queue'.format(job.job_id, job.title))
+
+    def snapshot(self):
+        with self.condition:
+            return list(self.jobs)
+
+    def clear_finished(self):
+        with self.condition:
+            self.jobs = [job for job in self.jobs if not job.is_done()]
+
+    def shutdown(self):
+        # Cancels everything and waits for the running batch jobs, so no output is left half written; an
+        # interactive job only reads, e.g. an open that cannot be cancelled, and is left to end with the program
+        with self.condition:
+            jobs = [job for job in self.jobs if not job.is_done()]
+        for job in jobs:
+            self.cancel(job)
+        with self.condition:
+            self.is_stopping = True
+            self.condition.notify_all()
+            workers = [worker for worker in self.workers
+                       if worker.job is not None and worker.job.priority > INTERACTIVE]
+        for worker in workers:
+            worker.join()
+
+
+def job_result(task):
+    cancel_token = getattr(task, 'cancel_token', None)
+    if cancel_token is not None and cancel_token.is_cancelled():
+        return CANCELLED
+    return FAILED if task.get_message() else FINISHED
+
+
+scheduler = JobScheduler()
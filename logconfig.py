@@ -0,0 +1,147 @@
+import atexit
+import datetime
+import getpass
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import pathlib
+import queue
+
+from instrumentation import SPANS_LOGGER_NAME, span_logger
+
+LOG_DIR = os.path.join(pathlib.Path.home(), 'magicpdf', 'logs')
+# The daily files keep the names of the earlier versions, <date>.log and <date>.spans.jsonl
+DAILY_LOG_FILE_NAME = '{}.log'
+DAILY_SPANS_FILE_NAME = '{}.spans.jsonl'
+LOG_FILE_NAME = 'magicpdf.log'
+SPANS_FILE_NAME = 'spans.jsonl'
+LOG_LEVEL = 'DEBUG'
+LOG_ROTATION = 'daily'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 10
+LOG_LEVEL_VARIABLE = 'MAGICPDF_LOG_LEVEL'
+LOG_ROTATION_VARIABLE = 'MAGICPDF_LOG_ROTATION'
+LOG_ROTATIONS = ('size', 'daily')
+
+listener = None
+
+
+class SpansFilter(logging.Filter):
+    def __init__(self, is_spans):
+        super().__init__()
+        self.is_spans = is_spans
+
+    def filter(self, record):
+        return (record.name == SPANS_LOGGER_NAME) == self.is_spans
+
+
+class DailyFileHandler(logging.handlers.RotatingFileHandler):
+    # Writes to the file of the current day and goes on with the next file after midnight;
+    # a day over the size limit is rotated as <date>.log.1, <date>.log.2 and so on
+    def __init__(self, log_dir, name_format):
+        self.log_dir = log_dir
+        self.name_format = name_format
+        self.date = datetime.date.today()
+        super().__init__(self.dated_path(), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8',
+                         delay=True)
+
+    def dated_path(self):
+        return os.path.join(self.log_dir, self.name_format.format(self.date.isoformat()))
+
+    def emit(self, record):
+        today = datetime.date.today()
+        if today != self.date:
+            self.date = today
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(self.dated_path())
+        super().emit(record)
+
+
+class ForwardHandler(logging.Handler):
+    # Hands the records of the worker processes to the loggers of this process
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def configure_logging(log_dir=LOG_DIR, level=None, rotation=None):
+    # The threads only put records into a queue, the files are written by the listener thread,
+    # so a slow log volume never holds up a job
+    global listener
+    level = level or os.environ.get(LOG_LEVEL_VARIABLE) or LOG_LEVEL
+    rotation = rotation or os.environ.get(LOG_ROTATION_VARIABLE) or LOG_ROTATION
+    os.makedirs(log_dir, exist_ok=True)
+
+    log_handler = create_file_handler(log_dir, LOG_FILE_NAME, DAILY_LOG_FILE_NAME, rotation)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:{}: %(message)s'.format(getpass.getuser()),
+                                               datefmt='%Y-%m-%d %H:%M:%S'))
+    log_handler.addFilter(SpansFilter(False))
+    spans_handler = create_file_handler(log_dir, SPANS_FILE_NAME, DAILY_SPANS_FILE_NAME, rotation)
+    spans_handler.setFormatter(logging.Formatter('%(message)s'))
+    spans_handler.addFilter(SpansFilter(True))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    set_level(level)
+    span_logger.addHandler(queue_handler)
+    span_logger.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(log_queue, log_handler, spans_handler)
+    listener.start()
+    atexit.register(stop_logging)
+
+
+def create_file_handler(log_dir, file_name, daily_name_format, rotation):
+    if rotation == 'size':
+        return logging.handlers.RotatingFileHandler(os.path.join(log_dir, file_name), maxBytes=LOG_MAX_BYTES,
+                                                    backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    if rotation != 'daily':
+        logging.warning('Unknown log rotation "{}", the daily files are used'.format(rotation))
+    return DailyFileHandler(log_dir, daily_name_format)
+
+
+def set_level(level):
+    try:
+        logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+    except ValueError as ex:
+        logging.getLogger().setLevel(LOG_LEVEL)
+        logging.warning(ex)
+
+
+def start_worker_logging(context=multiprocessing):
+    # The worker processes inherit the queue handler of this process, but nothing reads that copy of the queue;
+    # they put their records into a process-shared queue instead and a listener here passes them on
+    worker_queue = context.Queue()
+    worker_listener = logging.handlers.QueueListener(worker_queue, ForwardHandler())
+    worker_listener.start()
+    return worker_queue, worker_listener
+
+
+def stop_worker_logging(worker_queue, worker_listener):
+    worker_listener.stop()
+    worker_queue.close()
+
+
+def configure_worker_logging(worker_queue, level):
+    # Runs in a worker process
+    queue_handler = logging.handlers.QueueHandler(worker_queue) if worker_queue is not None else logging.NullHandler()
+    for logger in (logging.getLogger(), span_logger):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+    logging.getLogger().setLevel(level)
+    span_logger.setLevel(logging.INFO)
+
+
+def stop_logging():
+    # Flushes the records that are still in the queue
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
@@ -0,0 +1,286 @@
+import collections
+import json
+import logging
+import os
+import threading
+
+from cancellation import CancelToken, TaskCancelled
+from instrumentation import Span, new_job_id
+from outputs import AtomicOutputFile
+from pagerange import PageRange, split_page_range_suffix
+from progress import ProgressChannel
+
+LIST_VERSION = 1
+
+
+class MergeList:
+    # The files of the Merge tab in the merge order. The duplicate index counts the normalized paths,
+    # so the checks do not depend on the length of the list; the page counts are kept with the size and
+    # mtime of the file they were counted for. Every entry can take a part of its file: range_texts holds
+    # the page range of the entry at the same place, or None for all the pages
+    def __init__(self, file_paths=()):
+        self.items = []
+        self.range_texts = []
+        self.item_counts = collections.Counter()
+        self.page_counts = {}
+        self.add(file_paths, skip_duplicates=False)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, file_path):
+        return self.item_counts[path_key(file_path)] > 0
+
+    def add(self, file_paths, skip_duplicates=True):
+        added = skipped = 0
+        for file_path in file_paths:
+            file_path = os.path.normpath(file_path)
+            key = path_key(file_path)
+            if skip_duplicates and self.item_counts[key]:
+                skipped += 1
+                continue
+            self.items.append(file_path)
+            self.range_texts.append(None)
+            self.item_counts[key] += 1
+            added += 1
+        return added, skipped
+
+    def remove(self, indexes):
+        removed = set(indexes)
+        for index in removed:
+            key = path_key(self.items[index])
+            self.item_counts[key] -= 1
+            if not self.item_counts[key]:
+                del self.item_counts[key]
+        self.reorder([index for index in range(len(self.items)) if index not in removed])
+
+    def clear(self):
+        self.items.clear()
+        self.range_texts.clear()
+        self.item_counts.clear()
+
+    def reorder(self, order):
+        # The entries at the given places in the new order; the list objects stay the same, the view holds them
+        self.items[:] = [self.items[index] for index in order]
+        self.range_texts[:] = [self.range_texts[index] for index in order]
+
+    def shift(self, indexes, delta):
+        # Moves the selected files by delta places in one pass, the other files keep their order;
+        # returns the new places of the selected files
+        indexes = sorted(indexes)
+        targets = [index + delta for index in indexes]
+        if not indexes or targets[0] < 0 or targets[-1] >= len(self.items):
+            return indexes
+        selected = set(indexes)
+        others = (index for index in range(len(self.items)) if index not in selected)
+        moved = dict(zip(targets, indexes))
+        self.reorder([moved[index] if index in moved else next(others) for index in range(len(self.items))])
+        return targets
+
+    def range_text(self, index):
+        return self.range_texts[index]
+
+    def set_range_text(self, indexes, range_text):
+        for index in indexes:
+            self.range_texts[index] = range_text or None
+
+    def selected_page_count(self, index):
+        # The pages the entry takes, None while the file is not counted or when its range does not fit it
+        page_count = self.page_count(self.items[index])
+        if page_count is None or self.range_texts[index] is None:
+            return page_count
+        try:
+            return len(PageRange.parse(self.range_texts[index], page_count))
+        except ValueError:
+            return None
+
+    def page_count(self, file_path):
+        known = self.page_counts.get(path_key(file_path))
+        return known[2] if known is not None else None
+
+    def set_page_count(self, file_path, signature, page_count):
+        self.page_counts[path_key(file_path)] = (signature[0], signature[1], page_count)
+
+    def known_signature(self, file_path):
+        known = self.page_counts.get(path_key(file_path))
+        return (known[0], known[1]) if known is not None else None
+
+    def total_pages(self):
+        # The pages of the counted files and the number of the files not counted yet
+        total = uncounted = 0
+        for index in range(len(self.items)):
+            page_count = self.selected_page_count(index)
+            if page_count is None:
+                uncounted += 1
+            else:
+                total += page_count
+        return total, uncounted
+
+    def save(self, file_path):
+        # A .txt list has a path per line, with "@pages" after the path of a part, and can be given to the
+        # command line as @list.txt; the JSON list keeps the page counts as well
+        if file_path.lower().endswith('.txt'):
+            data = ''.join('{}@{}\n'.format(item, range_text) if range_text else item + '\n'
+                           for item, range_text in zip(self.items, self.range_texts))
+        else:
+            files = []
+            for item, range_text in zip(self.items, self.range_texts):
+                known = self.page_counts.get(path_key(item))
+                entry = {'path': item}
+                if range_text:
+                    entry['range'] = range_text
+                if known is not None:
+                    entry.update(size=known[0], mtime_ns=known[1], pages=known[2])
+                files.append(entry)
+            data = json.dumps({'version': LIST_VERSION, 'files': files}, indent=1)
+        with AtomicOutputFile(file_path) as list_file:
+            list_file.write(data.encode('utf-8'))
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, encoding='utf-8') as list_file:
+            data = list_file.read()
+        merge_list = cls()
+        if file_path.lower().endswith('.txt'):
+            for line in data.splitlines():
+                if line.strip():
+                    item, range_text = split_page_range_suffix(line.strip())
+                    merge_list.add([item], skip_duplicates=False)
+                    merge_list.set_range_text([len(merge_list) - 1], range_text)
+            return merge_list
+        content = json.loads(data)
+        if content.get('version') != LIST_VERSION:
+            raise ValueError('Unknown merge list version: {}'.format(content.get('version')))
+        for entry in content['files']:
+            merge_list.add([entry['path']], skip_duplicates=False)
+            merge_list.set_range_text([len(merge_list) - 1], entry.get('range'))
+            if 'pages' in entry:
+                merge_list.set_page_count(entry['path'], (entry['size'], entry['mtime_ns']), entry['pages'])
+        return merge_list
+
+
+class FolderScanThread(threading.Thread):
+    def __init__(self, folder, recursive=True):
+        super().__init__()
+        self.folder = folder
+        self.recursive = recursive
+        self.file_paths = []
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        logging.info('Scanning "{}" for PDF files...'.format(self.folder))
+        self.progress.start_phase('Scanning folder')
+        try:
+            with Span('merge_list', 'scan', self.job_id):
+                self.file_paths = scan_pdf_files(self.folder, self.recursive, self.cancel_token, self.progress)
+            logging.info('{} PDF files found in "{}"'.format(len(self.file_paths), self.folder))
+        except TaskCancelled as ex:
+            logging.info(ex)
+            self.set_message(str(ex))
+        except OSError as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+        finally:
+            self.progress.finish()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+class PageCountThread(threading.Thread):
+    def __init__(self, file_paths, known_signatures=None):
+        super().__init__()
+        # known_signatures maps the paths counted before to their (size, mtime_ns), those are counted
+        # again only when the file has changed
+        self.file_paths = file_paths
+        self.known_signatures = known_signatures or {}
+        # (path, signature, page count) tuples, appended while the thread runs and taken by the tab
+        self.results = collections.deque()
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        from documents import peek_document
+
+        self.progress.start_phase('Counting pages', len(self.file_paths))
+        try:
+            with Span('merge_list', 'count_pages', self.job_id) as span:
+                for i, file_path in enumerate(self.file_paths):
+                    self.cancel_token.check()
+                    try:
+                        stat_result = os.stat(file_path)
+                    except OSError:
+                        continue
+                    signature = (stat_result.st_size, stat_result.st_mtime_ns)
+                    if self.known_signatures.get(file_path) != signature:
+                        document_info = peek_document(file_path)
+                        if document_info is not None:
+                            self.results.append((file_path, signature, document_info.page_count))
+                            span.pages += document_info.page_count
+                    self.progress.update(i + 1)
+        except TaskCancelled as ex:
+            logging.info(ex)
+            self.set_message(str(ex))
+        finally:
+            self.progress.finish()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def scan_pdf_files(folder, recursive=True, cancel_token=None, progress=None):
+    # The files of every folder in the name order, then its subfolders; hidden entries and the links
+    # to folders are skipped, so a link cannot make the scan loop
+    file_paths = []
+    pending = [folder]
+    while pending:
+        if cancel_token:
+            cancel_token.check()
+        current_folder = pending.pop()
+        try:
+            entries = sorted(os.scandir(current_folder), key=lambda entry: entry.name.lower())
+        except OSError as ex:
+            if current_folder == folder:
+                raise
+            logging.warning(ex)
+            continue
+        subfolders = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subfolders.append(entry.path)
+            elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                file_paths.append(os.path.normpath(entry.path))
+        if recursive:
+            pending.extend(reversed(subfolders))
+        if progress:
+            progress.update(len(file_paths))
+    return file_paths
+
+
+def path_key(file_path):
+    return os.path.normcase(os.path.abspath(file_path))
@@ -0,0 +1,257 @@
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+
+from pypdf import PasswordType, PdfReader, PdfWriter
+
+from cancellation import CancelToken, TaskCancelled
+from instrumentation import Span, new_job_id
+from pagerange import PageRange
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE, check_free_space
+from progress import ProgressChannel
+from resultcache import is_cache_enabled, result_cache
+from streaming import StreamingPdfWriter
+
+PREFLIGHT_WORKERS = 8
+PREFLIGHT_MESSAGE_FILES = 10
+
+
+class PdfMergerThread(threading.Thread):
+    def __init__(self, in_file_list, result_file_path, is_outlines, buffer_size=WRITE_BUFFER_SIZE, streaming=False,
+                 deduplicate=False, use_cache=None, page_ranges=None):
+        super().__init__()
+        self.in_files_list = in_file_list
+        # A page range text per file (None for all the pages), the same file can be listed with several ranges
+        self.page_ranges = list(page_ranges) if page_ranges else [None] * len(in_file_list)
+        self.result_file_path = result_file_path
+        self.is_outlines = is_outlines
+        self.buffer_size = buffer_size
+        self.streaming = streaming
+        self.deduplicate = deduplicate
+        self.duplicate_count = 0
+        self.bytes_saved = 0
+        self.preflight_results = []
+        self.use_cache = is_cache_enabled() if use_cache is None else use_cache
+        self.is_cached = False
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        pdf_writer = PdfWriter()
+        try:
+            logging.info('****Beginning merging session...****')
+            cache_key = self.fetch_cached_result() if self.use_cache else None
+            if self.is_cached:
+                return
+            logging.info('Start checking...')
+            with Span('merge', 'check', self.job_id) as span:
+                self.progress.start_phase('Checking files', len(self.in_files_list))
+                self.preflight_results = preflight_files(self.in_files_list, self.page_ranges, progress=self.progress)
+                span.pages = sum(result.selected_page_count for result in self.preflight_results)
+            logging.info('Stop checking')
+            failed_results = [result for result in self.preflight_results if result.error]
+            if failed_results:
+                for result in failed_results:
+                    logging.warning('{}: {}'.format(result.file_path, result.error))
+                self.set_message(preflight_message(failed_results))
+                return
+            check_free_space(self.result_file_path, sum(os.path.getsize(file_path) for file_path in self.in_files_list))
+            if self.streaming:
+                self.merge_streaming()
+                self.store_result(cache_key)
+                return
+
+            logging.info('Start appending...')
+            with Span('merge', 'append', self.job_id) as span, SharedReaders(self.in_files_list) as readers:
+                self.progress.start_phase('Appending files', len(self.in_files_list))
+                for i, result in enumerate(self.preflight_results):
+                    self.cancel_token.check()
+                    pdf_writer.append(readers.acquire(result.file_path), self.outline_item(result),
+                                      pages=result.page_indexes)
+                    readers.release(result.file_path)
+                    self.progress.update(i + 1)
+                span.pages = len(pdf_writer.pages)
+            logging.info('Stop appending')
+
+            if self.deduplicate:
+                logging.info('Start deduplication...')
+                with Span('merge', 'deduplicate', self.job_id):
+                    self.progress.start_phase('Removing duplicate streams')
+                    # pypdf keeps one copy of the identical objects and drops the ones nothing refers to any more;
+                    # it does not tell how many were removed
+                    pdf_writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+                    self.duplicate_count = self.bytes_saved = None
+                logging.info('Stop deduplication')
+
+            logging.info('Start writing...')
+            with Span('merge', 'write', self.job_id, pages=len(pdf_writer.pages)) as span:
+                self.progress.start_phase('Writing result file')
+                self.cancel_token.check()
+                with AtomicOutputFile(self.result_file_path, self.buffer_size, self.cancel_token) as output_file:
+                    pdf_writer.write(output_file)
+                    span.bytes_written = output_file.tell()
+                    self.progress.add_bytes(span.bytes_written)
+            logging.info('Stop writing')
+            self.store_result(cache_key)
+        except TaskCancelled as ex:
+            logging.info(ex)
+            self.set_message(str(ex))
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message('Something went wrong...')
+        finally:
+            pdf_writer.close()
+            self.progress.finish()
+            logging.info('****End merging session****')
+
+    def merge_streaming(self):
+        logging.info('Start streaming merge...')
+        with Span('merge', 'streaming_merge', self.job_id) as span, \
+                AtomicOutputFile(self.result_file_path, self.buffer_size, self.cancel_token) as output_file:
+            pdf_writer = StreamingPdfWriter(output_file, deduplicate=self.deduplicate)
+            self.progress.start_phase('Merging files', len(self.in_files_list))
+            with SharedReaders(self.in_files_list) as readers:
+                for i, result in enumerate(self.preflight_results):
+                    position = pdf_writer.position
+                    pdf_writer.append(readers.acquire(result.file_path), self.outline_item(result),
+                                      pages=result.page_indexes)
+                    readers.release(result.file_path)
+                    self.progress.update(i + 1, pdf_writer.position - position)
+            pdf_writer.finish()
+            span.pages = len(pdf_writer.page_numbers)
+            span.bytes_written = pdf_writer.position
+        logging.info('Stop streaming merge')
+        if self.deduplicate:
+            self.duplicate_count, self.bytes_saved = pdf_writer.duplicate_count, pdf_writer.bytes_saved
+            self.log_deduplication()
+
+    def fetch_cached_result(self):
+        # The bookmarks are named after the files, so the names are a part of the key then
+        with Span('merge', 'cache', self.job_id) as span:
+            self.progress.start_phase('Looking up the result cache')
+            names = [os.path.basename(file_path) for file_path in self.in_files_list] if self.is_outlines else None
+            cache_key = result_cache.make_key('merge', self.in_files_list, is_outlines=self.is_outlines, names=names,
+                                              streaming=self.streaming, deduplicate=self.deduplicate,
+                                              page_ranges=self.page_ranges)
+            self.is_cached = result_cache.fetch(cache_key, self.result_file_path)
+            span.status = 'hit' if self.is_cached else 'miss'
+        return cache_key
+
+    def outline_item(self, result):
+        if not self.is_outlines:
+            return None
+        title = os.path.splitext(os.path.basename(result.file_path))[0]
+        return '{} ({})'.format(title, result.page_range_text) if result.page_range_text else title
+
+    def store_result(self, cache_key):
+        if self.use_cache:
+            result_cache.store(cache_key, self.result_file_path, 'merge')
+
+    def log_deduplication(self):
+        logging.info('Duplicate streams removed: {}, bytes saved: {}'.format(self.duplicate_count, self.bytes_saved))
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+class PreflightResult:
+    def __init__(self, file_path, page_range_text=None):
+        self.file_path = file_path
+        self.page_range_text = page_range_text
+        self.page_count = 0
+        # The zero-based indexes of the selected pages in the selection order, None for all the pages
+        self.page_indexes = None
+        self.is_encrypted = False
+        self.error = ''
+
+    @property
+    def selected_page_count(self):
+        return self.page_count if self.page_indexes is None else len(self.page_indexes)
+
+
+class SharedReaders:
+    # A file listed several times in the plan is parsed once: its reader is kept until the last entry
+    # of the file is appended, the other files are given to the writer by the path as before
+    def __init__(self, file_list):
+        self.uses = collections.Counter(file_list)
+        self.readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for pdf_reader in self.readers.values():
+            pdf_reader.stream.close()
+        self.readers = {}
+
+    def acquire(self, file_path):
+        if file_path in self.readers:
+            return self.readers[file_path]
+        if self.uses[file_path] <= 1:
+            return file_path
+        pdf_reader = PdfReader(file_path)
+        if pdf_reader.is_encrypted:
+            pdf_reader.decrypt('')
+        self.readers[file_path] = pdf_reader
+        return pdf_reader
+
+    def release(self, file_path):
+        self.uses[file_path] -= 1
+        if not self.uses[file_path] and file_path in self.readers:
+            self.readers.pop(file_path).stream.close()
+
+
+def preflight_file(file_path, page_range_text=None):
+    result = PreflightResult(file_path, page_range_text)
+    if not os.path.exists(path=file_path):
+        result.error = 'The file does not exist'
+        return result
+    try:
+        pdf_reader = PdfReader(file_path)
+        try:
+            result.is_encrypted = pdf_reader.is_encrypted
+            if result.is_encrypted and pdf_reader.decrypt('') == PasswordType.NOT_DECRYPTED:
+                result.error = 'The file is protected by a password'
+                return result
+            result.page_count = len(pdf_reader.pages)
+            if not result.page_count:
+                result.error = 'The file has no pages'
+            elif page_range_text:
+                try:
+                    result.page_indexes = [page_number - 1
+                                           for page_number in PageRange.parse(page_range_text, result.page_count)]
+                except ValueError as ex:
+                    result.error = 'Pages "{}": {}'.format(page_range_text, ex)
+        finally:
+            pdf_reader.stream.close()
+    except Exception as ex:
+        result.error = str(ex) or type(ex).__name__
+    return result
+
+
+def preflight_files(file_list, page_ranges=None, workers=PREFLIGHT_WORKERS, progress=None):
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(preflight_file, file_list, page_ranges or [None] * len(file_list)):
+            results.append(result)
+            if progress:
+                progress.update(len(results))
+    return results
+
+
+def preflight_message(failed_results):
+    lines = ['{}: {}'.format(os.path.basename(result.file_path), result.error)
+             for result in failed_results[:PREFLIGHT_MESSAGE_FILES]]
+    if len(failed_results) > PREFLIGHT_MESSAGE_FILES:
+        lines.append('...and {} more (see the log)'.format(len(failed_results) - PREFLIGHT_MESSAGE_FILES))
+    return '{} file(s) cannot be merged:\n{}\nThe merging was not started!'.format(len(failed_results), '\n'.join(lines))
@@ -0,0 +1,69 @@
+import errno
+import logging
+import os
+import shutil
+import tempfile
+
+from cancellation import CancellableWriter
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+FREE_SPACE_RESERVE = 16 * 1024 * 1024
+
+
+class AtomicOutputFile:
+    def __init__(self, output_path, buffer_size=WRITE_BUFFER_SIZE, cancel_token=None):
+        self.output_path = os.path.abspath(output_path)
+        self.buffer_size = buffer_size
+        self.cancel_token = cancel_token
+        self.tmp_file_path = None
+        self.file = None
+
+    def __enter__(self):
+        output_dir, output_name = os.path.split(self.output_path)
+        fd, self.tmp_file_path = tempfile.mkstemp(dir=output_dir, prefix='.{}.'.format(output_name), suffix='.part')
+        self.file = os.fdopen(fd, 'wb', buffering=self.buffer_size)
+        if self.cancel_token is not None:
+            return CancellableWriter(self.file, self.cancel_token)
+        return self.file
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.file.close()
+            if exc_type is None:
+                os.chmod(self.tmp_file_path, 0o666 & ~current_umask())
+                os.replace(self.tmp_file_path, self.output_path)
+        finally:
+            if os.path.exists(self.tmp_file_path):
+                try:
+                    os.remove(self.tmp_file_path)
+                except OSError as ex:
+                    logging.error(ex)
+        return False
+
+
+def check_free_space(output_path, required_bytes):
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    free_bytes = shutil.disk_usage(output_dir).free
+    if free_bytes < required_bytes + FREE_SPACE_RESERVE:
+        raise OSError(errno.ENOSPC, 'Not enough free space in "{}": {:.1f} MB required, {:.1f} MB available'.format(
+            output_dir, (required_bytes + FREE_SPACE_RESERVE) / 2 ** 20, free_bytes / 2 ** 20))
+
+
+def source_size(pdf_reader):
+    try:
+        return os.fstat(pdf_reader.stream.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return len(pdf_reader.stream.getbuffer()) if hasattr(pdf_reader.stream, 'getbuffer') else 0
+
+
+def estimate_output_size(pdf_reader, page_count):
+    total_pages = len(pdf_reader.pages)
+    if not total_pages:
+        return 0
+    return source_size(pdf_reader) * page_count // total_pages
+
+
+def current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
@@ -0,0 +1,317 @@
+import collections
+import json
+import logging
+import os
+import pathlib
+import threading
+
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from cancellation import CancelToken, TaskCancelled
+from documents import registry
+from instrumentation import Span, new_job_id
+from outputs import AtomicOutputFile
+from progress import ProgressChannel, format_size
+from resultcache import result_cache
+
+INDEX_DIR = os.path.join(pathlib.Path.home(), 'magicpdf', 'pageindex')
+# The digest of every indexed file with the size and mtime it had, so an unchanged file is not hashed again
+FILES_NAME = 'files.json'
+INDEX_MAX_FILES = 200
+INDEX_VERSION = 1
+POINTS_PER_MM = 72 / 25.4
+PAPER_SIZE_TOLERANCE_MM = 3
+PAPER_SIZES = (('A3', 297, 420), ('A4', 210, 297), ('A5', 148, 210), ('Letter', 216, 279), ('Legal', 216, 356))
+SUMMARY_MAX_FORMATS = 2
+SUMMARY_MAX_SECTIONS = 3
+SECTION_SEPARATOR = ' / '
+
+
+class PageIndex:
+    # What the tabs know about every page without parsing the document again; sections holds for every
+    # page the index of the outline entry the page belongs to in section_titles, or -1
+    def __init__(self, sizes, rotations, content_lengths, image_counts, sections, section_titles):
+        self.sizes = sizes
+        self.rotations = rotations
+        self.content_lengths = content_lengths
+        self.image_counts = image_counts
+        self.sections = sections
+        self.section_titles = section_titles
+
+    @property
+    def page_count(self):
+        return len(self.sizes)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['sizes'], data['rotations'], data['content_lengths'], data['image_counts'], data['sections'],
+                   data['section_titles'])
+
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'sizes': self.sizes,
+            'rotations': self.rotations,
+            'content_lengths': self.content_lengths,
+            'image_counts': self.image_counts,
+            'sections': self.sections,
+            'section_titles': self.section_titles,
+        }
+
+    def page_format(self, page_index):
+        width, height = self.sizes[page_index]
+        if self.rotations[page_index] in (90, 270):
+            width, height = height, width
+        orientation = 'landscape' if width > height else 'portrait'
+        short_side, long_side = sorted((width / POINTS_PER_MM, height / POINTS_PER_MM))
+        for name, paper_short_side, paper_long_side in PAPER_SIZES:
+            if (abs(short_side - paper_short_side) <= PAPER_SIZE_TOLERANCE_MM
+                    and abs(long_side - paper_long_side) <= PAPER_SIZE_TOLERANCE_MM):
+                return '{} {}'.format(name, orientation)
+        return '{:.0f}x{:.0f} mm'.format(width / POINTS_PER_MM, height / POINTS_PER_MM)
+
+    def describe_pages(self, page_range):
+        page_indexes = [page_number - 1 for page_number in page_range if page_number <= self.page_count]
+        if not page_indexes:
+            return 'No pages'
+        formats = collections.Counter(self.page_format(page_index) for page_index in page_indexes)
+        parts = ['{} page{}'.format(len(page_indexes), '' if len(page_indexes) == 1 else 's')]
+        parts.append(', '.join('{} x{}'.format(page_format, count)
+                               for page_format, count in formats.most_common(SUMMARY_MAX_FORMATS))
+                     + (', ...' if len(formats) > SUMMARY_MAX_FORMATS else ''))
+        image_count = sum(self.image_counts[page_index] for page_index in page_indexes)
+        if image_count:
+            parts.append('{} image{}'.format(image_count, '' if image_count == 1 else 's'))
+        parts.append('{} of content'.format(format_size(sum(self.content_lengths[page_index]
+                                                            for page_index in page_indexes))))
+        sections = list(dict.fromkeys(self.sections[page_index] for page_index in page_indexes
+                                      if self.sections[page_index] >= 0))
+        if sections:
+            titles = ', '.join(self.section_titles[section] for section in sections[:SUMMARY_MAX_SECTIONS])
+            if len(sections) > SUMMARY_MAX_SECTIONS:
+                titles += ' and {} more'.format(len(sections) - SUMMARY_MAX_SECTIONS)
+            parts.append('in ' + titles)
+        return '; '.join(parts)
+
+
+class PageIndexThread(threading.Thread):
+    def __init__(self, source_file_path, pdf_reader, index_dir=INDEX_DIR):
+        super().__init__()
+        self.source_file_path = source_file_path
+        self.pdf_reader = pdf_reader
+        self.index_dir = index_dir
+        self.page_index = None
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        logging.info('**** The page indexing session is started... ****')
+        try:
+            with Span('page_index', 'build', self.job_id) as span:
+                # The file is hashed only when it is new or changed since it was indexed; a copy of an
+                # indexed file is found by its digest then
+                stamp = file_stamp(self.source_file_path)
+                digest = known_digest(stamp, self.index_dir)
+                self.page_index = load_page_index(digest, self.index_dir) if digest is not None else None
+                if self.page_index is None:
+                    self.progress.start_phase('Hashing file')
+                    digest = result_cache.file_digest(self.source_file_path)
+                    self.page_index = load_page_index(digest, self.index_dir)
+                    if self.page_index is None:
+                        self.page_index = build_page_index(self.pdf_reader, self.cancel_token, self.progress)
+                        save_page_index(digest, self.page_index, self.index_dir)
+                        span.status = 'miss'
+                    save_known_digest(stamp, digest, self.index_dir)
+                if span.status is None:
+                    logging.info('The page index of "{}" is loaded'.format(self.source_file_path))
+                    span.status = 'hit'
+                span.pages = self.page_index.page_count
+        except TaskCancelled as ex:
+            logging.info(ex)
+            self.set_message(str(ex))
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+        finally:
+            self.progress.finish()
+            logging.info('**** The page indexing session is finished ****')
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def build_page_index(pdf_reader, cancel_token=None, progress=None):
+    # The reader is locked for one page at a time, a job on the same document waits at most a page for it
+    reader_lock = registry.reader_lock(pdf_reader)
+    with reader_lock:
+        page_count = len(pdf_reader.pages)
+        sections, section_titles = outline_sections(pdf_reader, page_count)
+    sizes, rotations, content_lengths, image_counts = [], [], [], []
+    if progress:
+        progress.start_phase('Indexing pages', page_count)
+    for page_index in range(page_count):
+        if cancel_token:
+            cancel_token.check()
+        with reader_lock:
+            page = pdf_reader.pages[page_index]
+            sizes.append([round(float(page.cropbox.width), 2), round(float(page.cropbox.height), 2)])
+            rotations.append(page.rotation % 360)
+            content_lengths.append(page_content_length(page))
+            image_counts.append(page_image_count(page))
+        if progress:
+            progress.update(page_index + 1)
+    return PageIndex(sizes, rotations, content_lengths, image_counts, sections, section_titles)
+
+
+def outline_sections(pdf_reader, page_count):
+    # A page belongs to the last outline entry, in the outline order, that starts on it or before it;
+    # a nested entry follows its parent, so the innermost one wins
+    entries = []
+
+    def walk(outline_items, parents):
+        title = None
+        for outline_item in outline_items:
+            if isinstance(outline_item, list):
+                walk(outline_item, parents + [title] if title is not None else parents)
+                continue
+            title = str(outline_item.title or '').strip()
+            page_index = pdf_reader.get_destination_page_number(outline_item)
+            if page_index is not None and 0 <= page_index < page_count:
+                entries.append((page_index, SECTION_SEPARATOR.join(parents + [title])))
+
+    try:
+        walk(pdf_reader.outline, [])
+    except Exception as ex:
+        logging.warning('The outline is not indexed: {}'.format(ex))
+        entries = []
+    entries.sort(key=lambda entry: entry[0])
+    sections = [-1] * page_count
+    section_titles = []
+    for entry_number, (page_index, title) in enumerate(entries):
+        stop_index = entries[entry_number + 1][0] if entry_number + 1 < len(entries) else page_count
+        if stop_index > page_index:
+            section_titles.append(title)
+            sections[page_index:stop_index] = [len(section_titles) - 1] * (stop_index - page_index)
+    return sections, section_titles
+
+
+def page_content_length(page):
+    contents = resolve(page.get('/Contents'))
+    if isinstance(contents, StreamObject):
+        return len(contents._data)
+    if isinstance(contents, ArrayObject):
+        return sum(len(stream.get_object()._data) for stream in contents)
+    return 0
+
+
+def page_image_count(page):
+    # The images of the page and of the forms it draws, an image used twice is counted once
+    count = 0
+    seen = set()
+    pending = [page.get('/Resources')]
+    while pending:
+        resources = resolve(pending.pop())
+        if not isinstance(resources, DictionaryObject):
+            continue
+        x_objects = resolve(resources.get('/XObject'))
+        if not isinstance(x_objects, DictionaryObject):
+            continue
+        for reference in x_objects.values():
+            if isinstance(reference, IndirectObject):
+                if reference.idnum in seen:
+                    continue
+                seen.add(reference.idnum)
+            x_object = resolve(reference)
+            if not isinstance(x_object, DictionaryObject):
+                continue
+            if x_object.get('/Subtype') == '/Image':
+                count += 1
+            elif x_object.get('/Subtype') == '/Form':
+                pending.append(x_object.get('/Resources'))
+    return count
+
+
+def resolve(pdf_object):
+    return pdf_object.get_object() if isinstance(pdf_object, IndirectObject) else pdf_object
+
+
+def index_path(digest, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, '{}.json'.format(digest))
+
+
+def load_page_index(digest, index_dir=INDEX_DIR):
+    file_path = index_path(digest, index_dir)
+    try:
+        with open(file_path, encoding='utf-8') as index_file:
+            data = json.load(index_file)
+        if data.get('version') != INDEX_VERSION:
+            return None
+        page_index = PageIndex.from_dict(data)
+        os.utime(file_path)
+        return page_index
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as ex:
+        logging.warning('The page index "{}" is not read: {}'.format(file_path, ex))
+        return None
+
+
+def file_stamp(file_path):
+    file_path = os.path.normpath(os.path.abspath(file_path))
+    stat_result = os.stat(file_path)
+    return file_path, stat_result.st_size, stat_result.st_mtime_ns
+
+
+def load_known_files(index_dir=INDEX_DIR):
+    try:
+        with open(os.path.join(index_dir, FILES_NAME), encoding='utf-8') as files_file:
+            return json.load(files_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as ex:
+        logging.warning('The list of the indexed files is not read: {}'.format(ex))
+        return {}
+
+
+def known_digest(stamp, index_dir=INDEX_DIR):
+    # The digest the file had when it was indexed, None when it was not indexed or was changed since
+    file_path, size, mtime_ns = stamp
+    known = load_known_files(index_dir).get(file_path)
+    if known is not None and known[0] == size and known[1] == mtime_ns:
+        return known[2]
+    return None
+
+
+def save_known_digest(stamp, digest, index_dir=INDEX_DIR):
+    file_path, size, mtime_ns = stamp
+    known_files = load_known_files(index_dir)
+    known_files[file_path] = [size, mtime_ns, digest]
+    # The files whose index was removed are forgotten as well
+    known_files = {path: known for path, known in known_files.items()
+                   if os.path.exists(index_path(known[2], index_dir))}
+    os.makedirs(index_dir, exist_ok=True)
+    with AtomicOutputFile(os.path.join(index_dir, FILES_NAME)) as files_file:
+        files_file.write(json.dumps(known_files).encode('utf-8'))
+
+
+def save_page_index(digest, page_index, index_dir=INDEX_DIR):
+    os.makedirs(index_dir, exist_ok=True)
+    with AtomicOutputFile(index_path(digest, index_dir)) as index_file:
+        index_file.write(json.dumps(page_index.to_dict()).encode('utf-8'))
+    # Only the indexes of the recently opened documents are kept
+    index_files = sorted((entry for entry in os.scandir(index_dir)
+                          if entry.name.endswith('.json') and entry.name != FILES_NAME),
+                         key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in index_files[INDEX_MAX_FILES:]:
+        try:
+            os.remove(entry.path)
+        except OSError as ex:
+            logging.error(ex)
@@ -0,0 +1,149 @@
+import bisect
+import os
+import re
+
+PAGE_RANGE_PART_RE = re.compile(r'^(?P<first>last|-?\d+)(?P<separator>\s*-\s*(?P<last>last|-?\d+)?)?$')
+
+
+class PageRange:
+    def __init__(self, spans=()):
+        # Normalised, sorted and disjoint intervals of the selected pages
+        self.starts = []
+        self.ends = []
+        # The same pages in the selection order, every page only once; first > last is a reverse span
+        self.spans = []
+        self.page_count = 0
+        for first, last in spans:
+            self.add(first, last)
+
+    @classmethod
+    def parse(cls, parse_string, page_count):
+        page_range = cls()
+        for part in parse_string.split(','):
+            part = part.strip().lower()
+            if not part:
+                continue
+            if part in ('odd', 'even'):
+                for page_number in range(1 if part == 'odd' else 2, page_count + 1, 2):
+                    page_range.add(page_number, page_number)
+                continue
+            match = PAGE_RANGE_PART_RE.match(part)
+            if not match:
+                raise ValueError('Unknown page range part "{}"'.format(part))
+            first = resolve_page_number(match.group('first'), page_count)
+            if not match.group('separator'):
+                last = first
+            elif match.group('last') is None:
+                last = page_count
+            else:
+                last = resolve_page_number(match.group('last'), page_count)
+            page_range.add(first, last)
+        if not page_range:
+            raise ValueError('The page range is empty')
+        return page_range
+
+    def add(self, first, last):
+        low, high = min(first, last), max(first, last)
+        pieces = self.uncovered(low, high)
+        if first > last:
+            pieces = [(piece_last, piece_first) for piece_first, piece_last in reversed(pieces)]
+        for piece_first, piece_last in pieces:
+            if self.spans and self.spans[-1][1] + (1 if first <= last else -1) == piece_first \
+                    and (self.spans[-1][0] <= self.spans[-1][1]) == (piece_first <= piece_last):
+                self.spans[-1] = (self.spans[-1][0], piece_last)
+            else:
+                self.spans.append((piece_first, piece_last))
+        self.page_count += sum(abs(piece_last - piece_first) + 1 for piece_first, piece_last in pieces)
+        self.insert_interval(low, high)
+
+    def uncovered(self, low, high):
+        pieces = []
+        cursor = low
+        i = bisect.bisect_left(self.ends, low)
+        while i < len(self.starts) and self.starts[i] <= high:
+            if self.starts[i] > cursor:
+                pieces.append((cursor, self.starts[i] - 1))
+            cursor = max(cursor, self.ends[i] + 1)
+            i += 1
+        if cursor <= high:
+            pieces.append((cursor, high))
+        return pieces
+
+    def insert_interval(self, low, high):
+        i = bisect.bisect_left(self.ends, low - 1)
+        j = bisect.bisect_right(self.starts, high + 1)
+        if i < j:
+            low = min(low, self.starts[i])
+            high = max(high, self.ends[j - 1])
+        self.starts[i:j] = [low]
+        self.ends[i:j] = [high]
+
+    @property
+    def intervals(self):
+        return list(zip(self.starts, self.ends))
+
+    def complement(self, page_count):
+        result = []
+        cursor = 1
+        for first, last in zip(self.starts, self.ends):
+            if first > page_count:
+                break
+            if first > cursor:
+                result.append((cursor, first - 1))
+            cursor = last + 1
+        if cursor <= page_count:
+            result.append((cursor, page_count))
+        return result
+
+    def max(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __contains__(self, page_number):
+        i = bisect.bisect_right(self.starts, page_number) - 1
+        return i >= 0 and self.ends[i] >= page_number
+
+    def __iter__(self):
+        for first, last in self.spans:
+            step = 1 if first <= last else -1
+            yield from range(first, last + step, step)
+
+    def __len__(self):
+        return self.page_count
+
+    def __bool__(self):
+        return self.page_count > 0
+
+    def __str__(self):
+        return ','.join(str(first) if first == last else '{}-{}'.format(first, last) for first, last in self.spans)
+
+    def __repr__(self):
+        return 'PageRange({!r})'.format(str(self))
+
+
+def resolve_page_number(page_string, page_count):
+    if page_string == 'last':
+        page_number = page_count
+    else:
+        page_number = int(page_string)
+        if page_number < 0:
+            page_number += page_count + 1
+        elif page_number == 0:
+            raise ValueError('Pages are numbered from 1')
+    if not 1 <= page_number <= page_count:
+        raise ValueError('The page {} is out of range 1-{}'.format(page_string, page_count))
+    return page_number
+
+
+def is_page_range_text(text):
+    # Checks the syntax only, the page numbers are checked against the document by PageRange.parse
+    parts = [part.strip().lower() for part in text.split(',')]
+    return any(parts) and all(not part or part in ('odd', 'even') or PAGE_RANGE_PART_RE.match(part) for part in parts)
+
+
+def split_page_range_suffix(text):
+    # "a.pdf@1-3,7" is the file a.pdf with the pages 1-3 and 7; an existing file whose name has an "@" is
+    # taken as it is
+    file_path, separator, range_text = text.rpartition('@')
+    if not separator or not file_path or os.path.exists(text) or not is_page_range_text(range_text):
+        return text, None
+    return file_path, range_text.strip()
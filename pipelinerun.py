@@ -0,0 +1,257 @@
+import datetime
+import logging
+import os
+import threading
+
+from cancellation import CancelToken, TaskCancelled
+from instrumentation import Span, new_job_id
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE, check_free_space
+from pagerange import PageRange, is_page_range_text
+from progress import ProgressChannel
+
+PIPELINE_ACTIONS = ('delete', 'extract', 'merge', 'split')
+STEP_SEPARATOR = '|'
+MERGED_DOCUMENT_NAME = 'Merged'
+
+
+class PipelineStep:
+    # delete and extract take a page range, split takes the pages per file, merge takes nothing
+    def __init__(self, action, value=None):
+        self.action = action
+        self.value = value
+
+    def __str__(self):
+        return self.action if self.value is None else '{} {}'.format(self.action, self.value)
+
+
+class PlannedDocument:
+    # A result of the pipeline: its pages are (source index, page index) pairs, the pages themselves are
+    # copied only when the document is written
+    def __init__(self, name, pages):
+        self.name = name
+        self.pages = pages
+
+
+class PipelineThread(threading.Thread):
+    # Runs the steps on the page lists of the inputs and writes only the final documents: every input is
+    # parsed once and there are no intermediate files. An output_path ending with .pdf is the result file of
+    # a pipeline giving one document, any other is the directory of the results
+    def __init__(self, in_file_list, steps, output_path, buffer_size=WRITE_BUFFER_SIZE, page_ranges=None,
+                 use_mmap=None):
+        super().__init__()
+        self.in_files_list = in_file_list
+        self.steps = steps
+        self.output_path = output_path
+        self.buffer_size = buffer_size
+        self.page_ranges = page_ranges
+        self.use_mmap = use_mmap
+        self.output_files = []
+        self.created_dir = None
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.job_id = new_job_id()
+        self.warning_message = ''
+
+    def run(self):
+        logging.info('**** The pipeline session ({}) is started... ****'.format(format_steps(self.steps)))
+        pdf_readers = []
+        try:
+            with Span('pipeline', 'open', self.job_id) as span:
+                self.progress.start_phase('Opening files', len(self.in_files_list))
+                for i, file_path in enumerate(self.in_files_list):
+                    self.cancel_token.check()
+                    pdf_readers.append(open_pipeline_reader(file_path, self.use_mmap))
+                    self.progress.update(i + 1)
+                page_counts = [len(pdf_reader.pages) for pdf_reader in pdf_readers]
+                span.pages = sum(page_counts)
+            names = [os.path.splitext(os.path.basename(file_path))[0] for file_path in self.in_files_list]
+            documents = plan_documents(self.steps, page_counts, names, self.page_ranges)
+            output_paths = result_paths(documents, self.output_path)
+            output_dir = os.path.dirname(os.path.abspath(output_paths[0]))
+            if not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+                self.created_dir = output_dir
+                logging.info('The directory \"{}\" was created'.format(output_dir))
+            check_free_space(output_paths[0], sum(os.path.getsize(file_path) for file_path in self.in_files_list))
+            self.write_documents(documents, output_paths, pdf_readers)
+            logging.info('Files written: {}'.format(len(self.output_files)))
+        except TaskCancelled as ex:
+            logging.info(ex)
+            self.set_message(str(ex))
+            self.remove_output_files()
+        except Exception as ex:
+            logging.error(ex)
+            self.set_message(str(ex))
+            self.remove_output_files()
+        finally:
+            for pdf_reader in pdf_readers:
+                pdf_reader.stream.close()
+            self.progress.finish()
+            logging.info('**** The pipeline session is finished ****')
+
+    def write_documents(self, documents, output_paths, pdf_readers):
+        from pypdf import PdfWriter
+
+        with Span('pipeline', 'write', self.job_id, pages=sum(len(document.pages) for document in documents)) as span:
+            self.progress.start_phase('Writing result files', sum(len(document.pages) for document in documents))
+            done = 0
+            for document, output_path in zip(documents, output_paths):
+                pdf_writer = PdfWriter()
+                try:
+                    for source_index, page_index in document.pages:
+                        self.cancel_token.check()
+                        pdf_writer.add_page(pdf_readers[source_index].pages[page_index])
+                        done += 1
+                        self.progress.update(done)
+                    with AtomicOutputFile(output_path, self.buffer_size, self.cancel_token) as output_file:
+                        pdf_writer.write(output_file)
+                        span.bytes_written += output_file.tell()
+                        self.progress.add_bytes(output_file.tell())
+                finally:
+                    pdf_writer.close()
+                self.output_files.append(output_path)
+
+    def remove_output_files(self):
+        # A failed pipeline leaves nothing behind, like a failed split
+        for output_path in self.output_files:
+            try:
+                os.remove(output_path)
+                logging.info('The file \"{}\" was deleted'.format(output_path))
+            except OSError as ex:
+                logging.error(ex)
+        self.output_files = []
+        if self.created_dir is not None:
+            try:
+                os.rmdir(self.created_dir)
+                logging.info('The directory \"{}\" was deleted'.format(self.created_dir))
+            except OSError as ex:
+                logging.error(ex)
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def parse_steps(text):
+    # "delete 1 | merge | split 10": the steps run from left to right on all the current documents
+    steps = []
+    for part in text.split(STEP_SEPARATOR):
+        part = part.strip()
+        if not part:
+            continue
+        action, _, value = part.partition(' ')
+        action = action.lower()
+        value = value.strip()
+        if action not in PIPELINE_ACTIONS:
+            raise ValueError('Unknown step "{}", the steps are {}'.format(part, ', '.join(PIPELINE_ACTIONS)))
+        if action in ('delete', 'extract'):
+            if not value or not is_page_range_text(value):
+                raise ValueError('The step "{}" needs a page range, e.g. {} 1-3'.format(part, action))
+            steps.append(PipelineStep(action, value))
+        elif action == 'split':
+            if value and (not value.isdigit() or int(value) <= 0):
+                raise ValueError('The pages per file of "{}" must be a positive number'.format(part))
+            steps.append(PipelineStep(action, int(value) if value else 1))
+        else:
+            if value:
+                raise ValueError('The step "{}" takes no value'.format(part))
+            steps.append(PipelineStep(action))
+    if not steps:
+        raise ValueError('The pipeline has no steps')
+    return steps
+
+
+def format_steps(steps):
+    return ' {} '.format(STEP_SEPARATOR).join(str(step) for step in steps)
+
+
+def plan_documents(steps, page_counts, names, page_ranges=None):
+    # Only the page lists are changed here, so a wrong range is reported before anything is written
+    documents = []
+    for source_index, (page_count, name) in enumerate(zip(page_counts, names)):
+        pages = [(source_index, page_index) for page_index in range(page_count)]
+        range_text = page_ranges[source_index] if page_ranges else None
+        if range_text:
+            pages = select_pages(pages, range_text, name)
+        documents.append(PlannedDocument(name, pages))
+    for step in steps:
+        if step.action == 'extract':
+            documents = [PlannedDocument(document.name, select_pages(document.pages, step.value, document.name))
+                         for document in documents]
+        elif step.action == 'delete':
+            for document in documents:
+                page_range = parse_document_range(document, step.value)
+                document.pages = [page for page_number, page in enumerate(document.pages, start=1)
+                                  if page_number not in page_range]
+                if not document.pages:
+                    raise ValueError('{}: no pages are left after "{}"'.format(document.name, step))
+        elif step.action == 'merge':
+            documents = [PlannedDocument(MERGED_DOCUMENT_NAME if len(documents) > 1 else documents[0].name,
+                                         [page for document in documents for page in document.pages])]
+        else:
+            documents = [PlannedDocument(split_document_name(document, first, step.value),
+                                         document.pages[first:first + step.value])
+                         for document in documents
+                         for first in range(0, len(document.pages), step.value)]
+    return documents
+
+
+def select_pages(pages, range_text, name):
+    return [pages[page_number - 1] for page_number in parse_document_range(PlannedDocument(name, pages), range_text)]
+
+
+def parse_document_range(document, range_text):
+    try:
+        return PageRange.parse(range_text, len(document.pages))
+    except ValueError as ex:
+        raise ValueError('{}: pages "{}": {}'.format(document.name, range_text, ex))
+
+
+def split_document_name(document, first, pages_per_file):
+    last = min(first + pages_per_file, len(document.pages))
+    if last - first == 1:
+        return 'Page {} - {}'.format(first + 1, document.name)
+    return 'Pages {}-{} - {}'.format(first + 1, last, document.name)
+
+
+def result_paths(documents, output_path):
+    if output_path.lower().endswith('.pdf'):
+        if len(documents) > 1:
+            raise ValueError('The pipeline gives {} files, the output must be a directory'.format(len(documents)))
+        return [os.path.normpath(output_path)]
+    # The same name can come from one input listed twice, the later files get a number
+    paths = []
+    used = set()
+    for document in documents:
+        file_name = '{}.pdf'.format(document.name)
+        number = 2
+        while file_name.lower() in used:
+            file_name = '{} ({}).pdf'.format(document.name, number)
+            number += 1
+        used.add(file_name.lower())
+        paths.append(os.path.join(output_path, file_name))
+    return paths
+
+
+def open_pipeline_reader(file_path, use_mmap=None):
+    from pypdf import PasswordType
+    from documents import open_reader
+
+    pdf_reader = open_reader(file_path, use_mmap)
+    if pdf_reader.is_encrypted and pdf_reader.decrypt('') == PasswordType.NOT_DECRYPTED:
+        pdf_reader.stream.close()
+        raise ValueError('{}: the file is protected by a password'.format(os.path.basename(file_path)))
+    if not len(pdf_reader.pages):
+        pdf_reader.stream.close()
+        raise ValueError('{}: the file has no pages'.format(os.path.basename(file_path)))
+    return pdf_reader
+
+
+def pipeline_result_dir_name():
+    curr_datetime = datetime.datetime.today().strftime('%Y%m%d%H%M%S')
+    return 'pipeline_result_{}'.format(curr_datetime)
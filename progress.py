@@ -0,0 +1,129 @@
+import queue
+import time
+
+PROGRESS_INTERVAL = 0.1
+MONITOR_INTERVAL_MS = 100
+
+
+class ProgressEvent:
+    def __init__(self, phase, done, total, bytes_written, eta, finished=False):
+        self.phase = phase
+        self.done = done
+        self.total = total
+        self.bytes_written = bytes_written
+        self.eta = eta
+        self.finished = finished
+
+    def describe(self):
+        text = self.phase
+        if self.total:
+            text += ': {} of {}'.format(self.done, self.total)
+        if self.bytes_written:
+            text += ', {}'.format(format_size(self.bytes_written))
+        if self.eta is not None:
+            text += ', about {} left'.format(format_duration(self.eta))
+        return text + '...'
+
+
+class ProgressChannel:
+    # Worker threads push events here instead of touching widgets; the events are throttled
+    # so a job of thousands of pages sends only a few of them per second
+    def __init__(self, interval=PROGRESS_INTERVAL):
+        self.events = queue.Queue()
+        self.interval = interval
+        self.phase = ''
+        self.done = 0
+        self.total = 0
+        self.bytes_written = 0
+        self.phase_start_time = time.monotonic()
+        self.last_event_time = 0.0
+
+    def start_phase(self, phase, total=0):
+        self.phase = phase
+        self.done = 0
+        self.total = total
+        self.phase_start_time = time.monotonic()
+        self.emit()
+
+    def update(self, done, bytes_written=0):
+        self.done = done
+        self.bytes_written += bytes_written
+        # With an unknown total (0) only the time limits the events
+        if 0 < self.total <= self.done or time.monotonic() - self.last_event_time >= self.interval:
+            self.emit()
+
+    def add_bytes(self, bytes_written):
+        self.update(self.done, bytes_written)
+
+    def finish(self):
+        self.events.put(ProgressEvent(self.phase, self.done, self.total, self.bytes_written, None, finished=True))
+
+    def emit(self):
+        self.last_event_time = time.monotonic()
+        self.events.put(ProgressEvent(self.phase, self.done, self.total, self.bytes_written, self.eta()))
+
+    def snapshot(self):
+        # The current state for a second observer (the jobs panel), the events stay for the owner of the job
+        return ProgressEvent(self.phase, self.done, self.total, self.bytes_written, self.eta())
+
+    def eta(self):
+        if not self.total or not self.done or self.done >= self.total:
+            return None
+        elapsed = time.monotonic() - self.phase_start_time
+        return elapsed / self.done * (self.total - self.done)
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class ProgressMonitor:
+    # Drains a channel from the Tk event loop, only the latest event of every interval is shown
+    def __init__(self, widget, channel, on_progress, on_finish, interval_ms=MONITOR_INTERVAL_MS):
+        self.widget = widget
+        self.channel = channel
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self.interval_ms = interval_ms
+
+    def start(self):
+        self.widget.after(self.interval_ms, self.poll)
+
+    def poll(self):
+        events = self.channel.drain()
+        if events and events[-1].finished:
+            self.on_finish()
+            return
+        if events:
+            self.on_progress(events[-1])
+        self.widget.after(self.interval_ms, self.poll)
+
+
+def update_progressbar(progressbar, event):
+    if event.total:
+        if str(progressbar['mode']) != 'determinate':
+            progressbar.stop()
+            progressbar.configure(mode='determinate')
+        progressbar.configure(maximum=event.total, value=event.done)
+    elif str(progressbar['mode']) != 'indeterminate':
+        progressbar.configure(mode='indeterminate', value=0)
+        progressbar.start(10)
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+        size /= 1024
+    return '{:.1f} GB'.format(size)
+
+
+def format_duration(seconds):
+    seconds = int(seconds + 0.5)
+    if seconds < 60:
+        return '{} s'.format(seconds)
+    return '{} min {} s'.format(seconds // 60, seconds % 60)
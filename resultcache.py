@@ -0,0 +1,277 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import time
+import uuid
+
+import pypdf
+
+from outputs import AtomicOutputFile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+CACHE_DIR = os.path.join(pathlib.Path.home(), 'magicpdf', 'cache')
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_VARIABLE = 'MAGICPDF_CACHE'
+INDEX_FILE = 'index.json'
+LOCK_FILE = 'index.lock'
+# A result file without an index entry is removed only when it is older than this, so a store
+# that has not saved the index yet is never taken for the leftover of an interrupted one
+ORPHAN_GRACE_SECONDS = 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+# Part of every key, a change of the output format or of pypdf makes the old results unreachable
+KEY_VERSION = 1
+
+
+class ResultCache:
+    # The results of the merges and range extracts, keyed by the content of the inputs and the parameters.
+    # The entries are hard-linked to the outputs when the file system allows it, so an entry and an output
+    # may be the same file: an entry changed through its output is recognized by its size and mtime and dropped
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.digests = {}
+
+    def make_key(self, operation, file_paths, **parameters):
+        # None when an input cannot be read, the job then runs without the cache and reports the file itself
+        try:
+            digests = [self.file_digest(file_path) for file_path in file_paths]
+        except OSError as ex:
+            logging.error('The inputs are not hashed: {}'.format(ex))
+            return None
+        data = json.dumps([KEY_VERSION, pypdf.__version__, operation, digests, parameters], sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def file_digest(self, file_path):
+        # A file is hashed once per version, the digest is reused while its size and mtime stay the same
+        file_path = os.path.abspath(file_path)
+        stat_result = os.stat(file_path)
+        signature = (stat_result.st_size, stat_result.st_mtime_ns)
+        with self.lock:
+            known = self.digests.get(file_path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as input_file:
+            while True:
+                chunk = input_file.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        with self.lock:
+            self.digests[file_path] = (signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    def fetch(self, key, output_path):
+        # Returns True when the output was made from the cache, a cache that cannot be read is only a miss
+        if key is None:
+            return False
+        with self.lock:
+            try:
+                with IndexLock(self.cache_dir):
+                    is_hit = self.fetch_entry(key, output_path)
+            except (OSError, ValueError) as ex:
+                logging.error('The result cache is not available: {}'.format(ex))
+                return False
+        if is_hit:
+            logging.info('The result {} is taken from the cache'.format(key))
+        return is_hit
+
+    def fetch_entry(self, key, output_path):
+        index = self.load_index()
+        entry = index['entries'].get(key)
+        entry_path = self.entry_path(key)
+        if entry is not None and not is_entry_intact(entry_path, entry):
+            logging.warning('The cached result {} was changed, it is dropped'.format(key))
+            self.remove_entry(index, key)
+            entry = None
+        if entry is None:
+            index['misses'] += 1
+            self.save_index(index)
+            return False
+        link_or_copy(entry_path, output_path)
+        entry['last_used'] = time.time()
+        index['hits'] += 1
+        self.save_index(index)
+        return True
+
+    def store(self, key, result_path, operation=''):
+        if key is None:
+            return
+        with self.lock:
+            try:
+                size = os.path.getsize(result_path)
+                if size > self.max_bytes:
+                    return
+                with IndexLock(self.cache_dir):
+                    self.store_entry(key, result_path, operation)
+            except (OSError, ValueError) as ex:
+                logging.error('The result is not cached: {}'.format(ex))
+                return
+        logging.info('The result {} is cached'.format(key))
+
+    def store_entry(self, key, result_path, operation):
+        index = self.load_index()
+        entry_path = self.entry_path(key)
+        link_or_copy(result_path, entry_path)
+        stat_result = os.stat(entry_path)
+        index['entries'][key] = {
+            'operation': operation,
+            'size': stat_result.st_size,
+            'mtime_ns': stat_result.st_mtime_ns,
+            'last_used': time.time(),
+        }
+        self.evict(index)
+        self.save_index(index)
+
+    def evict(self, index):
+        # The least recently used entries go first; files without an entry were left by an interrupted store
+        total_bytes = sum(entry['size'] for entry in index['entries'].values())
+        for key in sorted(index['entries'], key=lambda entry_key: index['entries'][entry_key]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= index['entries'][key]['size']
+            self.remove_entry(index, key)
+        orphan_time = time.time() - ORPHAN_GRACE_SECONDS
+        for entry in os.scandir(self.cache_dir):
+            if (entry.name.endswith('.pdf') and entry.name[:-4] not in index['entries']
+                    and entry.stat().st_mtime < orphan_time):
+                os.remove(entry.path)
+
+    def stats(self):
+        with self.lock, IndexLock(self.cache_dir):
+            index = self.load_index()
+        lookups = index['hits'] + index['misses']
+        return {
+            'directory': self.cache_dir,
+            'entries': len(index['entries']),
+            'size': sum(entry['size'] for entry in index['entries'].values()),
+            'max_size': self.max_bytes,
+            'hits': index['hits'],
+            'misses': index['misses'],
+            'hit_ratio': index['hits'] / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        # The lock file stays, another process may be waiting on it
+        with self.lock, IndexLock(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name == LOCK_FILE:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, '{}.pdf'.format(key))
+
+    def remove_entry(self, index, key):
+        del index['entries'][key]
+        try:
+            os.remove(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def load_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {'entries': {}, 'hits': 0, 'misses': 0}
+        with open(index_path, encoding='utf-8') as index_file:
+            return json.load(index_file)
+
+    def save_index(self, index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with AtomicOutputFile(os.path.join(self.cache_dir, INDEX_FILE)) as index_file:
+            index_file.write(json.dumps(index).encode('utf-8'))
+
+
+class IndexLock:
+    # The index is read, changed and saved under an exclusive lock on a file next to it, so the processes
+    # sharing the cache directory (the GUI, the command line, the watcher) do not save over each other
+    def __init__(self, cache_dir):
+        self.lock_path = os.path.join(cache_dir, LOCK_FILE)
+        self.lock_file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        self.lock_file = open(self.lock_path, 'a+b')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                self.lock_file.seek(0)
+                while True:
+                    try:
+                        # LK_LOCK itself gives up after ten attempts, a long store is waited for
+                        msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            self.lock_file.close()
+            self.lock_file = None
+            raise
+
+    def release(self):
+        if self.lock_file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+def is_entry_intact(entry_path, entry):
+    try:
+        stat_result = os.stat(entry_path)
+    except FileNotFoundError:
+        return False
+    return stat_result.st_size == entry['size'] and stat_result.st_mtime_ns == entry['mtime_ns']
+
+
+def link_or_copy(source_path, output_path):
+    # The new file replaces the output at once, a reader of the output never sees it half written
+    output_dir, output_name = os.path.split(os.path.abspath(output_path))
+    tmp_file_path = os.path.join(output_dir, '.{}.{}.part'.format(output_name, uuid.uuid4().hex[:8]))
+    try:
+        try:
+            os.link(source_path, tmp_file_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_file_path)
+        os.replace(tmp_file_path, output_path)
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+
+def is_cache_enabled():
+    return os.environ.get(CACHE_VARIABLE, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+result_cache = ResultCache()
@@ -0,0 +1,257 @@
+import array
+import hashlib
+import io
+import logging
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject, TextStringObject
+
+CATALOG_NUMBER = 1
+PAGES_NUMBER = 2
+
+
+class OutlineNode:
+    def __init__(self, title, page_number):
+        self.title = title
+        self.page_number = page_number
+        self.children = []
+
+
+class StreamingPdfWriter:
+    # Writes the merged document while the inputs are read: the objects of every input are
+    # serialised straight to the output stream and only their numbers and offsets are kept.
+    def __init__(self, stream, deduplicate=False):
+        self.stream = stream
+        self.deduplicate = deduplicate
+        self.stream_numbers = {}
+        self.serializing = set()
+        self.duplicate_count = 0
+        self.bytes_saved = 0
+        self.position = 0
+        self.offsets = array.array('q', [0, 0, 0])
+        self.page_numbers = array.array('q')
+        self.outline = []
+        self.object_numbers = {}
+        self.pending = []
+        self.pdf_reader = None
+        self.selected_pages = {}
+        self.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def append(self, fileobj, outline_item=None, pages=None, import_outline=True):
+        pdf_reader = fileobj if isinstance(fileobj, PdfReader) else PdfReader(fileobj)
+        try:
+            page_indexes = range(len(pdf_reader.pages)) if pages is None else pages
+            first_page_number = None
+            page_numbers_by_index = {}
+            self.pdf_reader = pdf_reader
+            self.selected_pages = {pdf_reader.pages[page_index].indirect_reference.idnum: page_index
+                                   for page_index in page_indexes}
+            for page_index in page_indexes:
+                page = pdf_reader.pages[page_index]
+                page_number = self.object_number(page.indirect_reference)
+                self.drain()
+                self.page_numbers.append(page_number)
+                page_numbers_by_index.setdefault(page_index, page_number)
+                if first_page_number is None:
+                    first_page_number = page_number
+            self.drain()
+
+            outline_nodes = self.outline
+            if outline_item is not None and first_page_number is not None:
+                outline_node = OutlineNode(outline_item, first_page_number)
+                self.outline.append(outline_node)
+                outline_nodes = outline_node.children
+            if import_outline:
+                try:
+                    self.import_outline(pdf_reader, pdf_reader.outline, outline_nodes, page_numbers_by_index)
+                except Exception as ex:
+                    logging.warning('The outline of "{}" was not imported: {}'.format(fileobj, ex))
+        finally:
+            self.object_numbers = {}
+            self.pdf_reader = None
+            self.selected_pages = {}
+            if not isinstance(fileobj, PdfReader):
+                pdf_reader.stream.close()
+
+    def import_outline(self, pdf_reader, outline, outline_nodes, page_numbers_by_index):
+        for item in outline:
+            if isinstance(item, list):
+                if outline_nodes:
+                    self.import_outline(pdf_reader, item, outline_nodes[-1].children, page_numbers_by_index)
+                continue
+            page_index = pdf_reader.get_destination_page_number(item)
+            outline_nodes.append(OutlineNode(str(item.title), page_numbers_by_index.get(page_index)))
+
+    def finish(self):
+        outline_root_number = self.write_outline() if self.outline else None
+
+        self.start_object(PAGES_NUMBER)
+        self.write(b'<<\n/Type /Pages\n/Count %d\n/Kids [' % len(self.page_numbers))
+        for i, page_number in enumerate(self.page_numbers):
+            self.write(b'%s%d 0 R' % (b'\n' if i % 10 == 0 else b' ', page_number))
+        self.write(b' ]\n>>')
+        self.end_object()
+
+        self.start_object(CATALOG_NUMBER)
+        self.write(b'<<\n/Type /Catalog\n/Pages %d 0 R\n' % PAGES_NUMBER)
+        if outline_root_number:
+            self.write(b'/Outlines %d 0 R\n/PageMode /UseOutlines\n' % outline_root_number)
+        self.write(b'>>')
+        self.end_object()
+
+        xref_position = self.position
+        self.write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets))
+        for offset in self.offsets[1:]:
+            self.write(b'%010d 00000 n \n' % offset)
+        self.write(b'trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(self.offsets), CATALOG_NUMBER, xref_position))
+
+    def write_outline(self):
+        root_number = self.new_object_number()
+        self.number_outline(self.outline)
+        self.write_outline_nodes(self.outline, root_number)
+        self.start_object(root_number)
+        self.write(b'<<\n/Type /Outlines\n/First %d 0 R\n/Last %d 0 R\n/Count %d\n>>' % (
+            self.outline[0].number, self.outline[-1].number, len(self.outline)))
+        self.end_object()
+        return root_number
+
+    def number_outline(self, outline_nodes):
+        for outline_node in outline_nodes:
+            outline_node.number = self.new_object_number()
+            self.number_outline(outline_node.children)
+
+    def write_outline_nodes(self, outline_nodes, parent_number):
+        for i, outline_node in enumerate(outline_nodes):
+            self.start_object(outline_node.number)
+            title = io.BytesIO()
+            TextStringObject(outline_node.title).write_to_stream(title)
+            self.write(b'<<\n/Title %s\n/Parent %d 0 R\n' % (title.getvalue(), parent_number))
+            if i > 0:
+                self.write(b'/Prev %d 0 R\n' % outline_nodes[i - 1].number)
+            if i < len(outline_nodes) - 1:
+                self.write(b'/Next %d 0 R\n' % outline_nodes[i + 1].number)
+            if outline_node.children:
+                self.write(b'/First %d 0 R\n/Last %d 0 R\n/Count -%d\n' % (
+                    outline_node.children[0].number, outline_node.children[-1].number, len(outline_node.children)))
+            if outline_node.page_number:
+                self.write(b'/Dest [%d 0 R /Fit]\n' % outline_node.page_number)
+            self.write(b'>>')
+            self.end_object()
+            self.write_outline_nodes(outline_node.children, outline_node.number)
+
+    def object_number(self, indirect_object):
+        key = (indirect_object.idnum, indirect_object.generation)
+        object_number = self.object_numbers.get(key)
+        if object_number is None:
+            if self.deduplicate and key not in self.serializing:
+                pdf_object = indirect_object.get_object()
+                if isinstance(pdf_object, StreamObject):
+                    return self.write_shared_stream(key, pdf_object)
+            object_number = self.new_object_number()
+            self.object_numbers[key] = object_number
+            self.pending.append((indirect_object, object_number))
+        return object_number
+
+    def write_shared_stream(self, key, stream_object):
+        # Streams are written before the objects that use them, so an identical stream
+        # of any previous input can be referenced instead of being written again
+        self.serializing.add(key)
+        buffer = io.BytesIO()
+        try:
+            self.serialize(stream_object, buffer)
+        finally:
+            self.serializing.discard(key)
+        data = buffer.getvalue()
+        object_number = self.object_numbers.get(key)
+        if object_number is None:
+            digest = hashlib.sha256(data).digest()
+            object_number = self.stream_numbers.get(digest)
+            if object_number is not None:
+                self.duplicate_count += 1
+                self.bytes_saved += len(data)
+                self.object_numbers[key] = object_number
+                return object_number
+            object_number = self.new_object_number()
+            self.stream_numbers[digest] = object_number
+            self.object_numbers[key] = object_number
+        else:
+            # The stream refers to itself, its number was given out while it was serialised
+            self.pending = [item for item in self.pending if item[1] != object_number]
+        self.start_object(object_number)
+        self.write(data)
+        self.end_object()
+        return object_number
+
+    def new_object_number(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def drain(self):
+        while self.pending:
+            indirect_object, object_number = self.pending.pop()
+            pdf_object = indirect_object.get_object()
+            if is_page(pdf_object):
+                if indirect_object.idnum in self.selected_pages:
+                    # The flattened page carries the attributes inherited from the page tree
+                    pdf_object = self.pdf_reader.pages[self.selected_pages[indirect_object.idnum]]
+                else:
+                    # A link to a page that is not merged
+                    pdf_object = None
+            buffer = io.BytesIO()
+            if pdf_object is None:
+                buffer.write(b'null')
+            else:
+                self.serialize(pdf_object, buffer)
+            self.start_object(object_number)
+            self.write(buffer.getvalue())
+            self.end_object()
+
+    def serialize(self, pdf_object, buffer):
+        if isinstance(pdf_object, IndirectObject):
+            buffer.write(b'%d 0 R' % self.object_number(pdf_object))
+        elif isinstance(pdf_object, DictionaryObject):
+            buffer.write(b'<<\n')
+            page = is_page(pdf_object)
+            for key, value in pdf_object.items():
+                if len(key) > 2 and key[1] == '%' and key[-1] == '%':
+                    continue
+                if isinstance(pdf_object, StreamObject) and key == '/Length':
+                    continue
+                key.write_to_stream(buffer)
+                buffer.write(b' ')
+                if page and key == '/Parent':
+                    buffer.write(b'%d 0 R' % PAGES_NUMBER)
+                else:
+                    self.serialize(value, buffer)
+                buffer.write(b'\n')
+            if isinstance(pdf_object, StreamObject):
+                buffer.write(b'/Length %d\n>>\nstream\n' % len(pdf_object._data))
+                buffer.write(pdf_object._data)
+                buffer.write(b'\nendstream')
+            else:
+                buffer.write(b'>>')
+        elif isinstance(pdf_object, ArrayObject):
+            buffer.write(b'[')
+            for item in pdf_object:
+                buffer.write(b' ')
+                self.serialize(item, buffer)
+            buffer.write(b' ]')
+        else:
+            pdf_object.write_to_stream(buffer)
+
+    def start_object(self, object_number):
+        self.offsets[object_number] = self.position
+        self.write(b'%d 0 obj\n' % object_number)
+
+    def end_object(self):
+        self.write(b'\nendobj\n')
+
+    def write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+
+def is_page(pdf_object):
+    return isinstance(pdf_object, DictionaryObject) and pdf_object.get('/Type') == '/Page'
+
@@ -0,0 +1,44 @@
+import os
+import re
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules of the program are flat files in the root, the corpus generator lives in benchmarks
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+from corpus import write_corpus_pdf  # noqa: E402
+
+PAGE_TEXT_RE = re.compile(rb'\(Page (\d+)\)')
+
+
+@pytest.fixture(autouse=True)
+def no_environment_options(monkeypatch):
+    # The cache and the memory mapping of the user must not change the results
+    monkeypatch.delenv('MAGICPDF_CACHE', raising=False)
+    monkeypatch.delenv('MAGICPDF_MMAP', raising=False)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    def make(name, page_count, **kwargs):
+        file_path = str(tmp_path / name)
+        write_corpus_pdf(file_path, page_count, **kwargs)
+        return file_path
+    return make
+
+
+@pytest.fixture
+def page_labels():
+    # Every corpus page draws "Page N", so the pages of a result can be told apart
+    from pypdf import PdfReader
+
+    def labels(file_path):
+        reader = PdfReader(file_path)
+        try:
+            return [int(PAGE_TEXT_RE.search(page.get_contents().get_data()).group(1)) for page in reader.pages]
+        finally:
+            reader.stream.close()
+    return labels
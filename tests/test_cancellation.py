@@ -0,0 +1,70 @@
+import io
+import os
+
+import pytest
+
+from cancellation import CANCELLED_MESSAGE, CancelToken, CancellableWriter, TaskCancelled
+from documents import open_reader
+from outputs import AtomicOutputFile
+from pagerange import PageRange
+
+
+def test_token():
+    cancel_token = CancelToken()
+    cancel_token.check()
+    assert not cancel_token.is_cancelled()
+    cancel_token.cancel()
+    assert cancel_token.is_cancelled()
+    with pytest.raises(TaskCancelled, match=CANCELLED_MESSAGE):
+        cancel_token.check()
+
+
+def test_writer_stops_at_the_next_write():
+    cancel_token = CancelToken()
+    output = io.BytesIO()
+    writer = CancellableWriter(output, cancel_token)
+    writer.write(b'abc')
+    assert writer.tell() == 3
+    cancel_token.cancel()
+    with pytest.raises(TaskCancelled):
+        writer.write(b'def')
+    assert output.getvalue() == b'abc'
+
+
+def test_cancelled_write_leaves_no_file(tmp_path):
+    cancel_token = CancelToken()
+    output_path = tmp_path / 'result.pdf'
+    with pytest.raises(TaskCancelled):
+        with AtomicOutputFile(str(output_path), cancel_token=cancel_token) as output_file:
+            output_file.write(b'%PDF-')
+            cancel_token.cancel()
+            output_file.write(b'1.7')
+    assert os.listdir(str(tmp_path)) == []
+
+
+def run_cancelled(thread):
+    thread.cancel()
+    thread.start()
+    thread.join()
+    return thread.get_message()
+
+
+def test_cancelled_jobs_write_nothing(make_pdf, tmp_path):
+    from deletion import RangeDeleteThread
+    from extraction import PbPExtractThread, RangeExtractThread
+    from merging import PdfMergerThread
+
+    source_file = make_pdf('source.pdf', 5)
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    pdf_reader = open_reader(source_file)
+    threads = [
+        PdfMergerThread([source_file, source_file], str(output_dir / 'merged.pdf'), True, use_cache=False),
+        RangeExtractThread(pdf_reader, str(output_dir / 'extracted.pdf'), PageRange.parse('1-3', 5), use_cache=False),
+        RangeDeleteThread(pdf_reader, str(output_dir / 'deleted.pdf'), PageRange.parse('1', 5)),
+        PbPExtractThread(source_file, pdf_reader, str(output_dir), 'pages'),
+        PbPExtractThread(source_file, pdf_reader, str(output_dir), 'pages_in_processes', workers=2),
+    ]
+    for thread in threads:
+        assert run_cancelled(thread) == CANCELLED_MESSAGE
+    assert os.listdir(str(output_dir)) == []
@@ -0,0 +1,152 @@
+import glob
+import os
+
+import pytest
+
+import cli
+
+
+def result_files(output_dir):
+    return sorted(glob.glob(os.path.join(str(output_dir), '**', '*.pdf'), recursive=True))
+
+
+def test_merge(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 2)
+    result_file = str(tmp_path / 'result.pdf')
+    assert cli.main(['merge', a_file, b_file, '-o', result_file]) == 0
+    assert page_labels(result_file) == [1, 2, 3, 1, 2]
+
+
+def test_merge_page_ranges(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 5), make_pdf('b.pdf', 4)
+    result_file = str(tmp_path / 'result.pdf')
+    assert cli.main(['merge', a_file + '@4-2', b_file + '@last', a_file + '@1', '-o', result_file]) == 0
+    assert page_labels(result_file) == [4, 3, 2, 4, 1]
+
+
+def test_merge_list_file(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 2)
+    list_file = tmp_path / 'list.txt'
+    list_file.write_text('{}@2-\n{}\n'.format(b_file, a_file))
+    result_file = str(tmp_path / 'result.pdf')
+    assert cli.main(['merge', '@' + str(list_file), '-o', result_file]) == 0
+    assert page_labels(result_file) == [2, 1, 2, 3]
+
+
+def test_merge_into_an_input(make_pdf, capsys):
+    a_file = make_pdf('a.pdf', 3)
+    assert cli.main(['merge', a_file, make_pdf('b.pdf', 2), '-o', a_file]) == 1
+    assert 'cannot be written to itself' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('pages, expected', [
+    ('3-7,9', [3, 4, 5, 6, 7, 9]),
+    ('8-', [8, 9, 10]),
+    ('-1--3', [10, 9, 8]),
+    ('even', [2, 4, 6, 8, 10]),
+])
+def test_extract_pages(make_pdf, page_labels, tmp_path, pages, expected):
+    source_file = make_pdf('source.pdf', 10)
+    result_file = str(tmp_path / 'result.pdf')
+    # A range that starts with "-" must be joined to the option, --pages=-1--3
+    assert cli.main(['extract', '--pages=' + pages, source_file, '-o', result_file]) == 0
+    assert page_labels(result_file) == expected
+
+
+def test_extract_invalid_pages(make_pdf, tmp_path, capsys):
+    source_file = make_pdf('source.pdf', 10)
+    result_file = tmp_path / 'result.pdf'
+    assert cli.main(['extract', '--pages', '5-11', source_file, '-o', str(result_file)]) == 1
+    assert 'Invalid range format' in capsys.readouterr().err
+    assert not result_file.exists()
+
+
+def test_extract_missing_file(tmp_path, capsys):
+    assert cli.main(['extract', '--pages', '1', str(tmp_path / 'missing.pdf'), '-o', str(tmp_path)]) == 1
+    assert 'missing.pdf' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_extract_page_by_page(make_pdf, page_labels, tmp_path, workers):
+    source_file = make_pdf('source.pdf', 7)
+    output_dir = tmp_path / 'pages'
+    output_dir.mkdir()
+    assert cli.main(['extract', '--page-by-page', '--workers', str(workers), source_file, '-o', str(output_dir)]) == 0
+    files = result_files(output_dir)
+    assert len(files) == 7
+    for file_path in files:
+        page_number = int(os.path.basename(file_path).split()[1])
+        assert page_labels(file_path) == [page_number]
+
+
+def test_extract_every(make_pdf, page_labels, tmp_path):
+    source_file = make_pdf('source.pdf', 10)
+    output_dir = tmp_path / 'parts'
+    output_dir.mkdir()
+    assert cli.main(['extract', '--every', '4', source_file, '-o', str(output_dir)]) == 0
+    parts = sorted(page_labels(file_path) for file_path in result_files(output_dir))
+    assert parts == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+
+def test_extract_max_size(make_pdf, page_labels, tmp_path):
+    source_file = make_pdf('source.pdf', 12, image_density=1.0, image_size=64)
+    output_dir = tmp_path / 'parts'
+    output_dir.mkdir()
+    # Every page has an image of 12 KB of its own, so about 2 pages fit into 30 KB
+    assert cli.main(['extract', '--max-size', '0.03', source_file, '-o', str(output_dir)]) == 0
+    parts = sorted(page_labels(file_path) for file_path in result_files(output_dir))
+    assert len(parts) > 1
+    assert [page for part in parts for page in part] == list(range(1, 13))
+    assert all(len(part) <= 3 for part in parts)
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_delete(make_pdf, page_labels, tmp_path, incremental):
+    source_file = make_pdf('source.pdf', 6)
+    result_file = str(tmp_path / 'result.pdf')
+    args = ['delete', '--pages', 'odd', source_file, '-o', result_file] + (['--incremental'] if incremental else [])
+    assert cli.main(args) == 0
+    assert page_labels(result_file) == [2, 4, 6]
+    assert page_labels(source_file) == [1, 2, 3, 4, 5, 6]
+
+
+def test_delete_incremental_in_place(make_pdf, page_labels):
+    source_file = make_pdf('source.pdf', 6)
+    assert cli.main(['delete', '--incremental', '--pages', '1,last', source_file, '-o', source_file]) == 0
+    assert page_labels(source_file) == [2, 3, 4, 5]
+
+
+def test_delete_several_files(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 4)
+    output_dir = tmp_path / 'deleted'
+    assert cli.main(['delete', '--pages', '1', a_file, b_file, '-o', str(output_dir)]) == 0
+    results = {os.path.basename(file_path).split('_')[0]: page_labels(file_path)
+               for file_path in result_files(output_dir)}
+    assert results == {'a': [2, 3], 'b': [2, 3, 4]}
+
+
+def test_pipeline_to_file(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 2)
+    result_file = str(tmp_path / 'result.pdf')
+    assert cli.main(['pipeline', a_file, b_file + '@2-1', '--steps', 'delete 1 | merge', '-o', result_file]) == 0
+    assert page_labels(result_file) == [2, 3, 1]
+
+
+def test_pipeline_to_directory(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 2)
+    output_dir = tmp_path / 'results'
+    assert cli.main(['pipeline', a_file, b_file, '--steps', 'merge | split 2', '-o', str(output_dir)]) == 0
+    parts = sorted(page_labels(file_path) for file_path in result_files(output_dir))
+    assert parts == [[1, 2], [2], [3, 1]]
+
+
+@pytest.mark.parametrize('steps', ['', 'rotate 90', 'delete', 'split 0', 'merge 2'])
+def test_pipeline_invalid_steps(make_pdf, tmp_path, capsys, steps):
+    assert cli.main(['pipeline', make_pdf('a.pdf', 3), '--steps', steps, '-o', str(tmp_path / 'out.pdf')]) == 1
+    assert 'Invalid steps' in capsys.readouterr().err
+
+
+def test_unknown_command():
+    with pytest.raises(SystemExit) as exc_info:
+        cli.main(['rotate', 'a.pdf'])
+    assert exc_info.value.code == 2
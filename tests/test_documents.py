@@ -0,0 +1,99 @@
+import mmap
+import os
+
+import pytest
+
+from documents import DocumentRegistry, open_reader, peek_document
+
+
+def test_acquire_shares_one_reader(make_pdf):
+    registry = DocumentRegistry()
+    file_path = make_pdf('a.pdf', 3)
+    pdf_reader = registry.acquire(file_path)
+    assert registry.acquire(os.path.join(os.path.dirname(file_path), '.', 'a.pdf')) is pdf_reader
+    assert (registry.hits, registry.misses) == (1, 1)
+    assert len(pdf_reader.pages) == 3
+
+
+def test_unused_readers_are_evicted_in_lru_order(make_pdf):
+    registry = DocumentRegistry(max_documents=2)
+    readers = [registry.acquire(make_pdf('{}.pdf'.format(name), 1)) for name in 'abc']
+    # All of them are in use, the limit waits for a release
+    assert len(registry.entries) == 3
+    registry.release(readers[1])
+    assert len(registry.entries) == 2
+    assert readers[1].stream.closed
+    assert not readers[0].stream.closed
+
+
+def test_retain_keeps_a_reader_after_one_release(make_pdf):
+    registry = DocumentRegistry(max_documents=0)
+    pdf_reader = registry.acquire(make_pdf('a.pdf', 1))
+    registry.retain(pdf_reader)
+    registry.release(pdf_reader)
+    assert not pdf_reader.stream.closed
+    registry.release(pdf_reader)
+    assert pdf_reader.stream.closed
+    assert not registry.entries
+
+
+def test_byte_limit(make_pdf):
+    registry = DocumentRegistry(max_bytes=1)
+    pdf_reader = registry.acquire(make_pdf('a.pdf', 1))
+    assert registry.entries
+    registry.release(pdf_reader)
+    assert not registry.entries
+
+
+def test_changed_file_gets_a_new_reader(make_pdf):
+    registry = DocumentRegistry()
+    file_path = make_pdf('a.pdf', 2)
+    old_reader = registry.acquire(file_path)
+    registry.release(old_reader)
+    make_pdf('a.pdf', 5)
+    stat_result = os.stat(file_path)
+    os.utime(file_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+    new_reader = registry.acquire(file_path)
+    assert new_reader is not old_reader
+    assert len(new_reader.pages) == 5
+    assert old_reader.stream.closed
+    assert len(registry.entries) == 1
+
+
+def test_failed_open_is_not_kept(tmp_path):
+    registry = DocumentRegistry()
+    file_path = tmp_path / 'broken.pdf'
+    file_path.write_bytes(b'not a pdf')
+    for _ in range(2):
+        with pytest.raises(Exception):
+            registry.acquire(str(file_path))
+    assert not registry.entries
+    assert registry.misses == 2
+
+
+def test_clear_keeps_readers_in_use(make_pdf):
+    registry = DocumentRegistry()
+    used_reader = registry.acquire(make_pdf('a.pdf', 1))
+    unused_reader = registry.acquire(make_pdf('b.pdf', 1))
+    registry.release(unused_reader)
+    registry.clear()
+    assert unused_reader.stream.closed
+    assert not used_reader.stream.closed
+    assert len(registry.entries) == 1
+
+
+def test_open_reader_mmap(make_pdf):
+    pdf_reader = open_reader(make_pdf('a.pdf', 4), use_mmap=True)
+    assert isinstance(pdf_reader.stream, mmap.mmap)
+    assert len(pdf_reader.pages) == 4
+    pdf_reader.stream.close()
+
+
+def test_peek_document(make_pdf, tmp_path):
+    document_info = peek_document(make_pdf('a.pdf', 120))
+    assert document_info.page_count == 120
+    assert document_info.version == '1.7'
+    assert not document_info.is_encrypted
+    broken_file = tmp_path / 'broken.pdf'
+    broken_file.write_bytes(b'%PDF-1.4\n')
+    assert peek_document(str(broken_file)) is None
@@ -0,0 +1,95 @@
+import os
+import re
+
+import pytest
+from pypdf import PdfReader
+
+from documents import open_reader
+from incremental import IncrementalUpdateError, PageTreeEditor, delete_pages_incrementally
+from pagerange import PageRange
+
+
+def convert_to_xref_stream(file_path):
+    # Replaces the cross-reference table of a corpus file with a cross-reference stream
+    with open(file_path, 'rb') as pdf_file:
+        data = pdf_file.read()
+    xref_position = int(re.search(rb'startxref\s+(\d+)', data).group(1))
+    offsets = [int(offset) for offset in re.findall(rb'(\d{10}) 00000 n', data[xref_position:])]
+    root_number = int(re.search(rb'/Root (\d+) 0 R', data[xref_position:]).group(1))
+    stream_number = len(offsets) + 1
+    entries = b'\x00' + b'\x00' * 4 + b'\xff\xff'
+    for offset in offsets + [xref_position]:
+        entries += b'\x01' + offset.to_bytes(4, 'big') + b'\x00\x00'
+    with open(file_path, 'wb') as pdf_file:
+        pdf_file.write(data[:xref_position])
+        pdf_file.write(b'%d 0 obj\n<< /Type /XRef /Size %d /Root %d 0 R /W [1 4 2] /Length %d >>\nstream\n' % (
+            stream_number, stream_number + 1, root_number, len(entries)))
+        pdf_file.write(entries)
+        pdf_file.write(b'\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % xref_position)
+    return file_path
+
+
+def delete(file_path, pages, output_path):
+    pdf_reader = open_reader(file_path)
+    try:
+        page_range = PageRange.parse(pages, len(pdf_reader.pages))
+        return delete_pages_incrementally(pdf_reader, page_range, file_path, output_path)
+    finally:
+        pdf_reader.stream.close()
+
+
+@pytest.fixture(params=['table', 'stream'])
+def source_file(request, make_pdf):
+    # 250 pages give a page tree of three nodes
+    file_path = make_pdf('source.pdf', 250)
+    return convert_to_xref_stream(file_path) if request.param == 'stream' else file_path
+
+
+def test_update_is_appended(source_file, page_labels, tmp_path):
+    with open(source_file, 'rb') as pdf_file:
+        source_data = pdf_file.read()
+    result_file = str(tmp_path / 'result.pdf')
+    kept_count, result_size = delete(source_file, '1,150-250', result_file)
+    assert kept_count == 148
+    with open(result_file, 'rb') as pdf_file:
+        result_data = pdf_file.read()
+    assert len(result_data) == result_size
+    assert result_data.startswith(source_data)
+    update = result_data[len(source_data):]
+    # The update has the same kind of cross-reference section as the source
+    assert (b'/XRef' in update) == (b'/XRef' in source_data)
+    assert (b'\nxref\n' in update) == (b'/XRef' not in source_data)
+    assert page_labels(result_file) == list(range(2, 150))
+    PdfReader(result_file, strict=True)
+
+
+def test_updates_can_be_chained(source_file, page_labels, tmp_path):
+    first_file, second_file = str(tmp_path / 'first.pdf'), str(tmp_path / 'second.pdf')
+    delete(source_file, '2-249', first_file)
+    delete(first_file, '1', second_file)
+    assert page_labels(second_file) == [250]
+
+
+def test_in_place(source_file, page_labels):
+    delete(source_file, 'even', source_file)
+    assert page_labels(source_file) == list(range(1, 251, 2))
+
+
+def test_only_changed_nodes_are_rewritten(make_pdf):
+    pdf_reader = open_reader(make_pdf('source.pdf', 250))
+    editor = PageTreeEditor(pdf_reader, PageRange.parse('101-200', 250))
+    assert editor.edit() == 150
+    # The emptied node is dropped from the root, the other two nodes are not touched
+    assert len(editor.changed_nodes) == 1
+    _, root_node = next(iter(editor.changed_nodes.values()))
+    assert root_node['/Count'] == 150
+    assert len(root_node['/Kids']) == 2
+
+
+def test_errors(make_pdf, tmp_path):
+    source_file = make_pdf('source.pdf', 3)
+    with pytest.raises(IncrementalUpdateError, match='All pages'):
+        delete(source_file, '1-', str(tmp_path / 'result.pdf'))
+    os.link(source_file, str(tmp_path / 'link.pdf'))
+    with pytest.raises(IncrementalUpdateError, match='hard links'):
+        delete(source_file, '1', source_file)
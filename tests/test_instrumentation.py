@@ -0,0 +1,65 @@
+import json
+import logging
+import time
+
+import pytest
+
+from cancellation import TaskCancelled
+from instrumentation import Span, current_rss, span_logger
+
+ALLOCATION_SIZE = 200 * 1024 * 1024
+
+
+class RecordsHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def spans():
+    handler = RecordsHandler()
+    span_logger.addHandler(handler)
+    span_logger.setLevel(logging.INFO)
+    yield handler.records
+    span_logger.removeHandler(handler)
+
+
+def test_span_record(spans):
+    with Span('merge', 'write', 'job1', pages=3) as span:
+        span.bytes_written = 100
+    record = spans[-1]
+    assert {key: record[key] for key in ('job', 'operation', 'phase', 'status', 'pages', 'bytes')} == {
+        'job': 'job1', 'operation': 'merge', 'phase': 'write', 'status': 'ok', 'pages': 3, 'bytes': 100}
+    assert record['duration'] >= 0
+    assert set(record) >= {'started', 'rss', 'peak_rss', 'children_max_rss'}
+
+
+def test_span_status(spans):
+    with pytest.raises(TaskCancelled):
+        with Span('merge', 'write'):
+            raise TaskCancelled()
+    with pytest.raises(ValueError):
+        with Span('merge', 'write'):
+            raise ValueError()
+    with Span('merge', 'cache') as span:
+        span.status = 'hit'
+    assert [record['status'] for record in spans] == ['cancelled', 'error', 'hit']
+
+
+@pytest.mark.skipif(current_rss() is None, reason='the resident size is read from /proc')
+def test_peak_rss_is_the_peak_of_the_phase(spans):
+    with Span('test', 'allocate') as span:
+        # Written, so the pages are resident; freed before the span ends
+        data = b'x' * ALLOCATION_SIZE
+        time.sleep(0.1)
+        del data
+    assert span.peak_rss - current_rss() > ALLOCATION_SIZE // 2
+    with Span('test', 'idle') as idle_span:
+        time.sleep(0.05)
+    # The next phase does not inherit the peak of the previous one
+    assert idle_span.peak_rss < span.peak_rss - ALLOCATION_SIZE // 2
+    assert spans[-1]['peak_rss'] == idle_span.peak_rss
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from cancellation import CANCELLED_MESSAGE, CancelToken
+from jobqueue import BATCH, CANCELLED, FINISHED, INTERACTIVE, QUEUED, RUNNING, JobScheduler
+from progress import ProgressChannel
+
+WAIT_TIMEOUT = 5
+
+
+class BlockingTask:
+    # Runs until it is released or cancelled, like a worker thread object of the tabs
+    def __init__(self, cancellable=True):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.progress = ProgressChannel()
+        self.cancel_token = CancelToken()
+        self.warning_message = ''
+        if cancellable:
+            self.cancel = self.cancel_token.cancel
+
+    def run(self):
+        self.started.set()
+        while not self.released.is_set() and not self.cancel_token.is_cancelled():
+            time.sleep(0.01)
+        if self.cancel_token.is_cancelled():
+            self.set_message(CANCELLED_MESSAGE)
+
+    def set_message(self, message):
+        self.warning_message = message
+
+    def get_message(self):
+        return self.warning_message
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_jobs_run_in_priority_order(scheduler):
+    scheduler.max_workers = scheduler.interactive_workers = 1
+    first = BlockingTask()
+    scheduler.submit(first, 'first')
+    assert first.started.wait(WAIT_TIMEOUT)
+    tasks = [BlockingTask() for _ in range(3)]
+    jobs = [scheduler.submit(tasks[0], 'batch', BATCH), scheduler.submit(tasks[1], 'interactive', INTERACTIVE),
+            scheduler.submit(tasks[2], 'interactive', INTERACTIVE)]
+    assert tasks[1].started.wait(WAIT_TIMEOUT)
+    assert [job.status for job in jobs] == [QUEUED, RUNNING, QUEUED]
+    tasks[1].released.set()
+    assert tasks[2].started.wait(WAIT_TIMEOUT)
+    first.released.set()
+    assert tasks[0].started.wait(WAIT_TIMEOUT)
+    for task in tasks:
+        task.released.set()
+    wait_for(lambda: all(job.status == FINISHED for job in jobs))
+
+
+def test_interactive_job_does_not_wait_for_batch_jobs(scheduler):
+    batch_tasks = [BlockingTask() for _ in range(3)]
+    batch_jobs = [scheduler.submit(task, 'batch', BATCH) for task in batch_tasks]
+    wait_for(lambda: batch_tasks[0].started.is_set() and batch_tasks[1].started.is_set())
+    # The reserved worker does not take the third batch job
+    time.sleep(0.1)
+    assert batch_jobs[2].status == QUEUED
+    open_task = BlockingTask(cancellable=False)
+    open_job = scheduler.submit(open_task, 'open', INTERACTIVE)
+    assert open_task.started.wait(WAIT_TIMEOUT)
+    open_task.released.set()
+    wait_for(lambda: open_job.status == FINISHED)
+    assert batch_jobs[2].status == QUEUED
+    batch_tasks[0].released.set()
+    assert batch_tasks[2].started.wait(WAIT_TIMEOUT)
+    assert len(scheduler.workers) == 3
+
+
+def test_cancel_queued_job(scheduler):
+    scheduler.max_workers = 1
+    running_task, queued_task = BlockingTask(), BlockingTask()
+    scheduler.submit(running_task, 'running')
+    queued_job = scheduler.submit(queued_task, 'queued')
+    assert running_task.started.wait(WAIT_TIMEOUT)
+    scheduler.cancel(queued_job)
+    assert queued_job.status == CANCELLED
+    assert queued_task.get_message() == CANCELLED_MESSAGE
+    assert not scheduler.queue
+
+
+def test_shutdown_does_not_wait_for_interactive_jobs():
+    scheduler = JobScheduler(max_workers=1)
+    batch_task, open_task = BlockingTask(), BlockingTask(cancellable=False)
+    batch_job = scheduler.submit(batch_task, 'batch', BATCH)
+    scheduler.submit(open_task, 'open', INTERACTIVE)
+    assert batch_task.started.wait(WAIT_TIMEOUT) and open_task.started.wait(WAIT_TIMEOUT)
+    start_time = time.monotonic()
+    scheduler.shutdown()
+    assert time.monotonic() - start_time < WAIT_TIMEOUT
+    # The batch job was cancelled and waited for, the open is still running
+    assert batch_job.status == CANCELLED
+    assert not open_task.released.is_set()
+    open_task.released.set()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(BlockingTask(), 'late')
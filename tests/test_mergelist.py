@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from mergelist import MergeList, PageCountThread, scan_pdf_files
+
+
+def names(merge_list):
+    return [os.path.basename(item) for item in merge_list]
+
+
+@pytest.fixture
+def merge_list():
+    return MergeList(['a.pdf', 'b.pdf', 'c.pdf', 'd.pdf', 'e.pdf'])
+
+
+def test_add_skips_duplicates(merge_list):
+    assert merge_list.add(['./a.pdf', 'f.pdf']) == (1, 1)
+    assert merge_list.add(['a.pdf'], skip_duplicates=False) == (1, 0)
+    assert names(merge_list)[-2:] == ['f.pdf', 'a.pdf']
+    assert 'f.pdf' in merge_list
+
+
+def test_remove_keeps_the_duplicate_index(merge_list):
+    merge_list.add(['a.pdf'], skip_duplicates=False)
+    merge_list.remove([0, 2])
+    assert names(merge_list) == ['b.pdf', 'd.pdf', 'e.pdf', 'a.pdf']
+    assert 'a.pdf' in merge_list
+    assert 'c.pdf' not in merge_list
+    merge_list.remove([3])
+    assert 'a.pdf' not in merge_list
+
+
+@pytest.mark.parametrize('indexes, delta, order, places', [
+    ([1, 3], -1, ['b', 'a', 'd', 'c', 'e'], [0, 2]),
+    ([1, 2], 2, ['a', 'd', 'e', 'b', 'c'], [3, 4]),
+    ([0, 4], 1, ['a', 'b', 'c', 'd', 'e'], [0, 4]),
+    ([2], -2, ['c', 'a', 'b', 'd', 'e'], [0]),
+    ([], 1, ['a', 'b', 'c', 'd', 'e'], []),
+])
+def test_shift(merge_list, indexes, delta, order, places):
+    merge_list.set_range_text([1], '2-3')
+    assert merge_list.shift(indexes, delta) == places
+    assert names(merge_list) == [name + '.pdf' for name in order]
+    # The page range moves with its file
+    assert merge_list.range_text(order.index('b')) == '2-3'
+
+
+@pytest.mark.parametrize('list_name', ['list.txt', 'list.json'])
+def test_save_and_load(merge_list, tmp_path, list_name):
+    merge_list.set_range_text([1, 3], '1-2,last')
+    merge_list.set_page_count('a.pdf', (100, 200), 7)
+    list_path = str(tmp_path / list_name)
+    merge_list.save(list_path)
+    loaded = MergeList.load(list_path)
+    assert list(loaded) == list(merge_list)
+    assert loaded.range_texts == merge_list.range_texts
+    # Only the JSON list keeps the page counts
+    if list_name.endswith('.json'):
+        assert loaded.page_count('a.pdf') == 7
+        assert loaded.known_signature('a.pdf') == (100, 200)
+    else:
+        assert loaded.page_count('a.pdf') is None
+
+
+def test_load_rejects_an_unknown_version(tmp_path):
+    list_path = tmp_path / 'list.json'
+    list_path.write_text(json.dumps({'version': 99, 'files': []}))
+    with pytest.raises(ValueError, match='Unknown merge list version'):
+        MergeList.load(str(list_path))
+
+
+def test_total_pages(make_pdf):
+    merge_list = MergeList([make_pdf('a.pdf', 3), make_pdf('b.pdf', 5), 'missing.pdf'])
+    merge_list.set_range_text([1], '2-4')
+    count_thread = PageCountThread(list(merge_list))
+    count_thread.run()
+    for file_path, signature, page_count in count_thread.results:
+        merge_list.set_page_count(file_path, signature, page_count)
+    assert merge_list.total_pages() == (6, 1)
+    # A range that does not fit the file leaves it uncounted
+    merge_list.set_range_text([0], '4-')
+    assert merge_list.total_pages() == (3, 2)
+
+
+def test_scan_pdf_files(make_pdf, tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / '.hidden').mkdir()
+    for name in ('b.pdf', 'A.pdf', 'sub/c.pdf', '.hidden/d.pdf'):
+        make_pdf(name, 1)
+    (tmp_path / 'notes.txt').write_text('')
+    assert [os.path.relpath(file_path, str(tmp_path)) for file_path in scan_pdf_files(str(tmp_path))] == [
+        'A.pdf', 'b.pdf', os.path.join('sub', 'c.pdf')]
+    assert len(scan_pdf_files(str(tmp_path), recursive=False)) == 2
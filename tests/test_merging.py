@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_deduplicate_shares_identical_images(make_pdf, page_labels, tmp_path, streaming):
+    # The same seed gives the same images, so the second input adds no new streams
+    a_file = make_pdf('a.pdf', 8, image_density=1.0, image_size=64)
+    b_file = make_pdf('b.pdf', 8, image_density=1.0, image_size=64)
+    options = ['--streaming'] if streaming else []
+    plain_file, shared_file = str(tmp_path / 'plain.pdf'), str(tmp_path / 'shared.pdf')
+    assert cli.main(['merge', a_file, b_file, '-o', plain_file] + options) == 0
+    assert cli.main(['merge', a_file, b_file, '-o', shared_file, '--deduplicate'] + options) == 0
+    assert page_labels(shared_file) == list(range(1, 9)) * 2
+    assert os.path.getsize(shared_file) < os.path.getsize(plain_file) * 0.6
+
+
+def test_streaming_deduplicate_counts(make_pdf, tmp_path, capsys):
+    a_file = make_pdf('a.pdf', 4, image_density=1.0, image_size=32)
+    b_file = make_pdf('b.pdf', 4, image_density=1.0, image_size=32)
+    result_file = str(tmp_path / 'result.pdf')
+    assert cli.main(['merge', a_file, b_file, '-o', result_file, '--streaming', '--deduplicate']) == 0
+    # The images and the page contents of the second input
+    assert 'Duplicate streams removed: 8,' in capsys.readouterr().out
+
+
+def test_different_images_are_kept(make_pdf, tmp_path):
+    a_file = make_pdf('a.pdf', 4, image_density=1.0, image_size=64, seed=1)
+    b_file = make_pdf('b.pdf', 4, image_density=1.0, image_size=64, seed=2)
+    plain_file, shared_file = str(tmp_path / 'plain.pdf'), str(tmp_path / 'shared.pdf')
+    assert cli.main(['merge', a_file, b_file, '-o', plain_file]) == 0
+    assert cli.main(['merge', a_file, b_file, '-o', shared_file, '--deduplicate']) == 0
+    assert os.path.getsize(shared_file) > os.path.getsize(plain_file) * 0.9
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+
+import pytest
+from pypdf import PdfWriter
+
+from documents import open_reader
+from pageindex import FILES_NAME, PageIndexThread, build_page_index, index_path
+from resultcache import result_cache
+
+
+def add_outline(file_path):
+    pdf_writer = PdfWriter(clone_from=file_path)
+    chapter = pdf_writer.add_outline_item('Chapter', 0)
+    pdf_writer.add_outline_item('Section', 2, parent=chapter)
+    pdf_writer.add_outline_item('End', 4)
+    pdf_writer.write(file_path)
+    return file_path
+
+
+def run_index(file_path, index_dir):
+    pdf_reader = open_reader(file_path)
+    try:
+        index_thread = PageIndexThread(file_path, pdf_reader, str(index_dir))
+        index_thread.run()
+    finally:
+        pdf_reader.stream.close()
+    assert index_thread.get_message() == ''
+    return index_thread.page_index
+
+
+def test_build_page_index(make_pdf):
+    pdf_reader = open_reader(add_outline(make_pdf('a.pdf', 5, image_density=1.0)))
+    try:
+        page_index = build_page_index(pdf_reader)
+    finally:
+        pdf_reader.stream.close()
+    assert page_index.page_count == 5
+    assert page_index.sizes[0] == [612, 792]
+    assert page_index.page_format(0) == 'Letter portrait'
+    assert all(count >= 1 for count in page_index.image_counts)
+    assert page_index.section_titles == ['Chapter', 'Chapter / Section', 'End']
+    assert page_index.sections == [0, 0, 1, 1, 2]
+    description = page_index.describe_pages([2, 3, 4])
+    assert description.startswith('3 pages; Letter portrait x3; ')
+    assert description.endswith('in Chapter, Chapter / Section')
+    assert page_index.describe_pages([6]) == 'No pages'
+
+
+def test_index_is_found_by_path_without_hashing(make_pdf, tmp_path, monkeypatch):
+    index_dir = tmp_path / 'index'
+    file_path = make_pdf('a.pdf', 3)
+    page_index = run_index(file_path, index_dir)
+    digest = result_cache.file_digest(file_path)
+    assert os.path.exists(index_path(digest, str(index_dir)))
+    with open(str(index_dir / FILES_NAME), encoding='utf-8') as files_file:
+        assert json.load(files_file)[os.path.abspath(file_path)][2] == digest
+
+    def no_hashing(file_path):
+        raise AssertionError('The file is hashed')
+    monkeypatch.setattr(result_cache, 'file_digest', no_hashing)
+    assert run_index(file_path, index_dir).to_dict() == page_index.to_dict()
+
+
+def test_changed_file_is_indexed_again(make_pdf, tmp_path):
+    index_dir = tmp_path / 'index'
+    file_path = make_pdf('a.pdf', 3)
+    run_index(file_path, index_dir)
+    make_pdf('a.pdf', 5)
+    assert run_index(file_path, index_dir).page_count == 5
+
+
+def test_copy_is_found_by_digest(make_pdf, tmp_path, monkeypatch):
+    index_dir = tmp_path / 'index'
+    file_path = make_pdf('a.pdf', 3)
+    run_index(file_path, index_dir)
+    copy_path = str(tmp_path / 'copy.pdf')
+    shutil.copyfile(file_path, copy_path)
+
+    def no_building(*args, **kwargs):
+        raise AssertionError('The index is built')
+    monkeypatch.setattr('pageindex.build_page_index', no_building)
+    assert run_index(copy_path, index_dir).page_count == 3
+    with open(str(index_dir / FILES_NAME), encoding='utf-8') as files_file:
+        assert set(json.load(files_file)) == {os.path.abspath(file_path), os.path.abspath(copy_path)}
+
+
+def test_unreadable_list_of_files_is_ignored(make_pdf, tmp_path):
+    index_dir = tmp_path / 'index'
+    index_dir.mkdir()
+    (index_dir / FILES_NAME).write_text('{')
+    assert run_index(make_pdf('a.pdf', 2), index_dir).page_count == 2
+
+
+@pytest.mark.parametrize('pages', [1, 2])
+def test_single_section_free_document(make_pdf, pages):
+    pdf_reader = open_reader(make_pdf('a.pdf', pages))
+    try:
+        page_index = build_page_index(pdf_reader)
+    finally:
+        pdf_reader.stream.close()
+    assert page_index.sections == [-1] * pages
+    assert page_index.image_counts == [0] * pages
@@ -0,0 +1,94 @@
+import pytest
+
+from pagerange import PageRange, is_page_range_text, resolve_page_number, split_page_range_suffix
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('3', [3]),
+    ('3-7,9', [3, 4, 5, 6, 7, 9]),
+    (' 1 - 2 , 5 ', [1, 2, 5]),
+    ('14-', [14, 15, 16, 17, 18, 19, 20]),
+    ('10-7', [10, 9, 8, 7]),
+    ('last', [20]),
+    ('LAST', [20]),
+    ('18-last', [18, 19, 20]),
+    ('-3--1', [18, 19, 20]),
+    ('-1', [20]),
+    ('-1--3', [20, 19, 18]),
+    ('odd', [1, 3, 5, 7, 9, 11, 13, 15, 17, 19]),
+    ('even', [2, 4, 6, 8, 10, 12, 14, 16, 18, 20]),
+    ('1,,2,', [1, 2]),
+])
+def test_parse(text, expected):
+    page_range = PageRange.parse(text, 20)
+    assert list(page_range) == expected
+    assert len(page_range) == len(expected)
+
+
+def test_parse_keeps_the_selection_order_and_skips_repeated_pages():
+    page_range = PageRange.parse('5-8,1-6,7', 10)
+    assert list(page_range) == [5, 6, 7, 8, 1, 2, 3, 4]
+    assert page_range.intervals == [(1, 8)]
+    assert str(page_range) == '5-8,1-4'
+
+
+def test_parse_reverse_range_over_selected_pages():
+    page_range = PageRange.parse('3-4,6-1', 6)
+    assert list(page_range) == [3, 4, 6, 5, 2, 1]
+    assert str(page_range) == '3-4,6-5,2-1'
+
+
+def test_parse_odd_with_ranges():
+    page_range = PageRange.parse('odd,2', 5)
+    assert list(page_range) == [1, 3, 5, 2]
+    assert page_range.complement(5) == [(4, 4)]
+
+
+@pytest.mark.parametrize('text', ['0', '21', '5-21', '-21', 'first', '1-2-3', 'odd-even', '3x', '', ' , '])
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        PageRange.parse(text, 20)
+
+
+def test_contains_and_complement():
+    page_range = PageRange.parse('2-4,8,10-', 12)
+    assert [page_number for page_number in range(1, 13) if page_number in page_range] == [2, 3, 4, 8, 10, 11, 12]
+    assert page_range.complement(12) == [(1, 1), (5, 7), (9, 9)]
+    assert page_range.max() == 12
+
+
+def test_resolve_page_number():
+    assert resolve_page_number('last', 7) == 7
+    assert resolve_page_number('-2', 7) == 6
+    assert resolve_page_number('3', 7) == 3
+    with pytest.raises(ValueError):
+        resolve_page_number('0', 7)
+    with pytest.raises(ValueError):
+        resolve_page_number('-8', 7)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1-3,7', True),
+    ('odd', True),
+    ('14-', True),
+    ('-3--1', True),
+    ('last', True),
+    ('', False),
+    ('a.pdf', False),
+    ('1-3,x', False),
+])
+def test_is_page_range_text(text, expected):
+    assert is_page_range_text(text) == expected
+
+
+def test_split_page_range_suffix(tmp_path):
+    assert split_page_range_suffix('a.pdf@1-3,7') == ('a.pdf', '1-3,7')
+    assert split_page_range_suffix('dir@x/a.pdf@last') == ('dir@x/a.pdf', 'last')
+    assert split_page_range_suffix('a.pdf') == ('a.pdf', None)
+    assert split_page_range_suffix('a.pdf@') == ('a.pdf@', None)
+    assert split_page_range_suffix('@1-3') == ('@1-3', None)
+    assert split_page_range_suffix('a.pdf@copy') == ('a.pdf@copy', None)
+    # An existing file is taken as it is even when its name looks like a range
+    existing_file = tmp_path / 'scan.pdf@2'
+    existing_file.write_bytes(b'')
+    assert split_page_range_suffix(str(existing_file)) == (str(existing_file), None)
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from pipelinerun import format_steps, parse_steps, plan_documents, result_paths
+
+
+def plan(steps_text, page_counts, page_ranges=None):
+    documents = plan_documents(parse_steps(steps_text), page_counts, ['a', 'b'][:len(page_counts)], page_ranges)
+    return [(document.name, document.pages) for document in documents]
+
+
+def test_parse_steps():
+    steps = parse_steps(' delete 1-2,last |MERGE| split ')
+    assert [(step.action, step.value) for step in steps] == [('delete', '1-2,last'), ('merge', None), ('split', 1)]
+    assert format_steps(steps) == 'delete 1-2,last | merge | split 1'
+
+
+def test_plan_delete_merge_split():
+    assert plan('delete 1 | merge | split 2', [3, 2]) == [
+        ('Pages 1-2 - Merged', [(0, 1), (0, 2)]),
+        ('Page 3 - Merged', [(1, 1)]),
+    ]
+
+
+def test_plan_input_ranges_and_extract():
+    assert plan('extract 2-1', [4, 3], ['3-', None]) == [('a', [(0, 3), (0, 2)]), ('b', [(1, 1), (1, 0)])]
+
+
+def test_plan_reports_a_wrong_range_before_writing():
+    with pytest.raises(ValueError, match='b: pages "3"'):
+        plan('extract 3', [4, 2])
+    with pytest.raises(ValueError, match='no pages are left'):
+        plan('delete odd,even', [4])
+
+
+def test_result_paths(tmp_path):
+    documents = plan_documents(parse_steps('split 2'), [2, 2], ['a', 'a'])
+    assert result_paths(documents, str(tmp_path)) == [os.path.join(str(tmp_path), 'Pages 1-2 - a.pdf'),
+                                                       os.path.join(str(tmp_path), 'Pages 1-2 - a (2).pdf')]
+    with pytest.raises(ValueError):
+        result_paths(documents, str(tmp_path / 'out.pdf'))
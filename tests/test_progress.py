@@ -0,0 +1,90 @@
+import time
+
+from progress import ProgressChannel, ProgressEvent, ProgressMonitor, format_duration, format_size
+
+
+class FakeWidget:
+    # Runs the scheduled callbacks by hand instead of the Tk event loop
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, interval_ms, callback):
+        self.callbacks.append(callback)
+
+    def run_next(self):
+        self.callbacks.pop(0)()
+
+
+def test_updates_are_throttled():
+    channel = ProgressChannel(interval=60)
+    channel.start_phase('Copying pages', 1000)
+    for done in range(1, 1000):
+        channel.update(done)
+    # The start of the phase and nothing else until the interval is over
+    assert [(event.phase, event.done) for event in channel.drain()] == [('Copying pages', 0)]
+    channel.update(1000)
+    assert [event.done for event in channel.drain()] == [1000]
+
+
+def test_unknown_total_is_throttled_too():
+    channel = ProgressChannel(interval=60)
+    channel.start_phase('Copying source file')
+    for _ in range(1000):
+        channel.add_bytes(64 * 1024)
+    events = channel.drain()
+    assert len(events) == 1
+    assert channel.snapshot().bytes_written == 1000 * 64 * 1024
+
+
+def test_interval_passed():
+    channel = ProgressChannel(interval=0.01)
+    channel.start_phase('Writing', 10)
+    time.sleep(0.02)
+    channel.update(1, 100)
+    events = channel.drain()
+    assert [(event.done, event.bytes_written) for event in events] == [(0, 0), (1, 100)]
+    assert events[-1].eta is not None
+
+
+def test_finish():
+    channel = ProgressChannel()
+    channel.start_phase('Writing', 2)
+    channel.update(2)
+    channel.finish()
+    events = channel.drain()
+    assert events[-1].finished
+    assert events[-2].eta is None
+    assert channel.drain() == []
+
+
+def test_monitor_shows_the_latest_event_and_stops_on_finish():
+    channel = ProgressChannel(interval=0)
+    widget = FakeWidget()
+    shown = []
+    finished = []
+    ProgressMonitor(widget, channel, shown.append, lambda: finished.append(True)).start()
+    channel.start_phase('Writing', 3)
+    channel.update(1)
+    channel.update(2)
+    widget.run_next()
+    assert [event.done for event in shown] == [2]
+    widget.run_next()
+    assert len(shown) == 1
+    channel.finish()
+    widget.run_next()
+    assert finished == [True]
+    assert not widget.callbacks
+
+
+def test_describe():
+    assert ProgressEvent('Writing', 0, 0, 0, None).describe() == 'Writing...'
+    assert ProgressEvent('Copying pages', 5, 10, 2048, 75).describe() == \
+        'Copying pages: 5 of 10, 2.0 KB, about 1 min 15 s left...'
+
+
+def test_format_size_and_duration():
+    assert format_size(512) == '512 B'
+    assert format_size(1536) == '1.5 KB'
+    assert format_size(5 * 1024 ** 3) == '5.0 GB'
+    assert format_duration(0.4) == '0 s'
+    assert format_duration(59.6) == '1 min 0 s'
@@ -0,0 +1,131 @@
+import concurrent.futures
+import os
+import shutil
+import time
+
+import pytest
+
+import cli
+from resultcache import LOCK_FILE, ORPHAN_GRACE_SECONDS, ResultCache, result_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache'))
+
+
+def make_result(tmp_path, name, size):
+    result_path = tmp_path / name
+    result_path.write_bytes(os.urandom(size))
+    return str(result_path)
+
+
+def test_key_follows_the_content_and_the_parameters(make_pdf, cache, tmp_path):
+    a_file = make_pdf('a.pdf', 2)
+    copy_file = str(tmp_path / 'copy.pdf')
+    shutil.copyfile(a_file, copy_file)
+    key = cache.make_key('merge', [a_file], pages='1')
+    assert cache.make_key('merge', [copy_file], pages='1') == key
+    assert cache.make_key('merge', [a_file], pages='2') != key
+    assert cache.make_key('extract', [a_file], pages='1') != key
+    make_pdf('a.pdf', 3)
+    assert cache.make_key('merge', [a_file], pages='1') != key
+    assert cache.make_key('merge', [str(tmp_path / 'missing.pdf')]) is None
+
+
+def test_store_and_fetch(cache, tmp_path):
+    result_path = make_result(tmp_path, 'result.pdf', 1000)
+    output_path = str(tmp_path / 'output.pdf')
+    assert not cache.fetch('k1', output_path)
+    cache.store('k1', result_path, 'merge')
+    assert cache.fetch('k1', output_path)
+    with open(result_path, 'rb') as result_file, open(output_path, 'rb') as output_file:
+        assert result_file.read() == output_file.read()
+    stats = cache.stats()
+    assert (stats['entries'], stats['size'], stats['hits'], stats['misses']) == (1, 1000, 1, 1)
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_entry_changed_through_its_output_is_dropped(cache, tmp_path):
+    result_path = make_result(tmp_path, 'result.pdf', 1000)
+    cache.store('k1', result_path, 'merge')
+    # The entry may be a hard link of the result, an append to the result changes it too
+    with open(result_path, 'ab') as result_file:
+        result_file.write(b'changed')
+    if os.stat(result_path).st_nlink > 1:
+        assert not cache.fetch('k1', str(tmp_path / 'output.pdf'))
+        assert cache.stats()['entries'] == 0
+    else:
+        assert cache.fetch('k1', str(tmp_path / 'output.pdf'))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=2500)
+    for key in ('k1', 'k2'):
+        cache.store(key, make_result(tmp_path, key + '.pdf', 1000))
+        time.sleep(0.01)
+    assert cache.fetch('k1', str(tmp_path / 'output.pdf'))
+    cache.store('k3', make_result(tmp_path, 'k3.pdf', 1000))
+    assert not cache.fetch('k2', str(tmp_path / 'output.pdf'))
+    assert cache.stats()['entries'] == 2
+    assert not os.path.exists(cache.entry_path('k2'))
+    # A result larger than the whole cache is not stored
+    cache.store('k4', make_result(tmp_path, 'k4.pdf', 3000))
+    assert not cache.fetch('k4', str(tmp_path / 'output.pdf'))
+
+
+def test_only_old_orphans_are_removed(cache, tmp_path):
+    cache.store('k1', make_result(tmp_path, 'k1.pdf', 10))
+    old_orphan, fresh_orphan = cache.entry_path('old'), cache.entry_path('fresh')
+    for orphan_path in (old_orphan, fresh_orphan):
+        with open(orphan_path, 'wb') as orphan_file:
+            orphan_file.write(b'x')
+    old_time = time.time() - ORPHAN_GRACE_SECONDS - 60
+    os.utime(old_orphan, (old_time, old_time))
+    cache.store('k2', make_result(tmp_path, 'k2.pdf', 10))
+    assert not os.path.exists(old_orphan)
+    assert os.path.exists(fresh_orphan)
+
+
+def test_clear_keeps_the_lock_file(cache, tmp_path):
+    cache.store('k1', make_result(tmp_path, 'k1.pdf', 10))
+    cache.clear()
+    assert os.listdir(cache.cache_dir) == [LOCK_FILE]
+    assert cache.stats()['entries'] == 0
+
+
+def use_cache(cache_dir, worker_number, tmp_dir):
+    cache = ResultCache(cache_dir)
+    for i in range(10):
+        key = 'k{}'.format(i)
+        output_path = os.path.join(tmp_dir, 'out{}_{}.pdf'.format(worker_number, i))
+        if not cache.fetch(key, output_path):
+            result_path = os.path.join(tmp_dir, 'result{}_{}.pdf'.format(worker_number, i))
+            with open(result_path, 'wb') as result_file:
+                result_file.write(key.encode())
+            cache.store(key, result_path)
+
+
+def test_processes_share_the_index(cache, tmp_path):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(use_cache, cache.cache_dir, worker_number, str(tmp_path))
+                   for worker_number in range(4)]
+        for future in futures:
+            future.result()
+    stats = cache.stats()
+    # No lookup or entry is lost to a concurrent save of the index
+    assert stats['hits'] + stats['misses'] == 40
+    assert stats['entries'] == 10
+
+
+def test_cli_cache(make_pdf, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(result_cache, 'cache_dir', str(tmp_path / 'cache'))
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 2)
+    for output_name in ('first.pdf', 'second.pdf'):
+        assert cli.main(['merge', a_file, b_file, '-o', str(tmp_path / output_name), '--cache']) == 0
+    assert 'taken from the cache' in capsys.readouterr().out
+    assert cli.main(['cache', 'stats']) == 0
+    assert 'Hits: 1, misses: 1' in capsys.readouterr().out
+    assert cli.main(['cache', 'clear']) == 0
+    assert cli.main(['cache', 'stats']) == 0
+    assert 'Entries: 0' in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+from streaming import StreamingPdfWriter
+
+
+def add_outline(file_path):
+    pdf_writer = PdfWriter(clone_from=file_path)
+    chapter = pdf_writer.add_outline_item('Chapter', 0)
+    pdf_writer.add_outline_item('Section', 2, parent=chapter)
+    pdf_writer.add_outline_item('End', 5)
+    pdf_writer.write(file_path)
+    return file_path
+
+
+def outline_titles(outline, pdf_reader):
+    titles = []
+    for item in outline:
+        if isinstance(item, list):
+            titles.append(outline_titles(item, pdf_reader))
+        else:
+            page_index = pdf_reader.get_destination_page_number(item)
+            titles.append((item.title, None if page_index is None else page_index + 1))
+    return titles
+
+
+def merge_streaming(inputs, **kwargs):
+    output = io.BytesIO()
+    pdf_writer = StreamingPdfWriter(output, **kwargs)
+    for file_path, outline_item, pages in inputs:
+        pdf_writer.append(PdfReader(file_path), outline_item, pages=pages)
+    pdf_writer.finish()
+    return pdf_writer, PdfReader(io.BytesIO(output.getvalue()))
+
+
+def test_merge_pages_in_order(make_pdf, page_labels, tmp_path):
+    a_file, b_file = make_pdf('a.pdf', 3), make_pdf('b.pdf', 250)
+    pdf_writer, pdf_reader = merge_streaming([(a_file, None, None), (b_file, None, [249, 0, 1])])
+    assert len(pdf_reader.pages) == 6
+    assert pdf_writer.position == len(pdf_reader.stream.getvalue())
+    result_file = tmp_path / 'result.pdf'
+    result_file.write_bytes(pdf_reader.stream.getvalue())
+    assert page_labels(str(result_file)) == [1, 2, 3, 250, 1, 2]
+    # The pages get the new page tree as their parent
+    assert all(page['/Parent'] == pdf_reader.trailer['/Root']['/Pages'] for page in pdf_reader.pages)
+
+
+def test_outlines(make_pdf):
+    a_file = add_outline(make_pdf('a.pdf', 6))
+    b_file = make_pdf('b.pdf', 2)
+    _, pdf_reader = merge_streaming([(a_file, 'a', [0, 1, 2, 3]), (b_file, 'b', None)])
+    # The bookmarks of an input go under its own one, "End" points to a page that is not merged
+    assert outline_titles(pdf_reader.outline, pdf_reader) == [
+        ('a', 1), [('Chapter', 1), [('Section', 3)], ('End', None)], ('b', 5)]
+
+
+def test_same_input_twice(make_pdf, page_labels, tmp_path):
+    a_file = make_pdf('a.pdf', 4, image_density=1.0, image_size=16)
+    pdf_writer, pdf_reader = merge_streaming([(a_file, None, [0, 1]), (a_file, None, [1, 3])], deduplicate=True)
+    result_file = tmp_path / 'result.pdf'
+    result_file.write_bytes(pdf_reader.stream.getvalue())
+    assert page_labels(str(result_file)) == [1, 2, 2, 4]
+    # The second copy of page 2 shares its content and image with the first one
+    assert pdf_writer.duplicate_count == 2
+    assert pdf_reader.pages[1].raw_get('/Contents') == pdf_reader.pages[2].raw_get('/Contents')
@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+import pytest
+
+from cli import run_thread
+from watcher import DONE, FAILED, FolderWatcher, WatchRule, WatchState, load_config
+
+
+def settle(file_path, age=60):
+    # Makes the file look as if it was written age seconds ago
+    mtime = time.time() - age
+    os.utime(file_path, (mtime, mtime))
+
+
+def make_watcher(tmp_path, rule_data):
+    rule = WatchRule.from_dict(rule_data, str(tmp_path))
+    state = WatchState(str(tmp_path / 'state.json'))
+    return FolderWatcher([rule], state, run_thread, settle_time=10), rule
+
+
+def test_settled_files_are_processed_once(make_pdf, page_labels, tmp_path):
+    (tmp_path / 'in').mkdir()
+    watcher, _ = make_watcher(tmp_path, {'folder': 'in', 'action': 'delete', 'pages': '1', 'output': 'out'})
+    settled_file = make_pdf('in/a.pdf', 3)
+    settle(settled_file)
+    make_pdf('in/b.pdf', 3)
+    assert watcher.poll() == 1
+    assert page_labels(str(tmp_path / 'out' / 'a.pdf')) == [2, 3]
+    # b.pdf is still being written
+    assert not (tmp_path / 'out' / 'b.pdf').exists()
+    assert watcher.poll() == 0
+    settle(str(tmp_path / 'in' / 'b.pdf'))
+    assert watcher.poll() == 1
+    assert page_labels(str(tmp_path / 'out' / 'b.pdf')) == [2, 3]
+
+
+def test_changed_file_is_processed_again(make_pdf, page_labels, tmp_path):
+    (tmp_path / 'in').mkdir()
+    watcher, _ = make_watcher(tmp_path, {'folder': 'in', 'action': 'extract', 'pages': 'last', 'output': 'out'})
+    settle(make_pdf('in/a.pdf', 3))
+    assert watcher.poll() == 1
+    settle(make_pdf('in/a.pdf', 5), age=30)
+    assert watcher.poll() == 1
+    assert page_labels(str(tmp_path / 'out' / 'a.pdf')) == [5]
+
+
+def test_state_survives_a_restart(make_pdf, tmp_path):
+    (tmp_path / 'in').mkdir()
+    rule_data = {'folder': 'in', 'action': 'delete', 'pages': '1', 'output': 'out'}
+    watcher, rule = make_watcher(tmp_path, rule_data)
+    settle(make_pdf('in/a.pdf', 3))
+    assert watcher.poll() == 1
+    with open(str(tmp_path / 'state.json'), encoding='utf-8') as state_file:
+        assert json.load(state_file)[rule.key]['a.pdf']['status'] == DONE
+    restarted_watcher, _ = make_watcher(tmp_path, rule_data)
+    assert restarted_watcher.poll() == 0
+
+
+def test_failed_file_is_tried_again_when_it_changes(make_pdf, tmp_path, capsys):
+    (tmp_path / 'in').mkdir()
+    watcher, rule = make_watcher(tmp_path, {'folder': 'in', 'action': 'delete', 'pages': '5', 'output': 'out'})
+    settle(make_pdf('in/a.pdf', 3))
+    assert watcher.poll() == 1
+    assert watcher.state.items[rule.key]['a.pdf']['status'] == FAILED
+    assert watcher.poll() == 0
+    settle(make_pdf('in/a.pdf', 6), age=30)
+    assert watcher.poll() == 1
+    assert watcher.state.items[rule.key]['a.pdf']['status'] == DONE
+
+
+def test_merge_rule_takes_subfolders(make_pdf, page_labels, tmp_path):
+    (tmp_path / 'in' / 'batch').mkdir(parents=True)
+    (tmp_path / 'in' / 'empty').mkdir()
+    watcher, _ = make_watcher(tmp_path, {'folder': 'in', 'action': 'merge', 'output': 'out'})
+    settle(make_pdf('in/batch/2.pdf', 1))
+    settle(make_pdf('in/batch/1.pdf', 2))
+    settle(make_pdf('in/loose.pdf', 1))
+    assert watcher.poll() == 1
+    assert page_labels(str(tmp_path / 'out' / 'batch.pdf')) == [1, 2, 1]
+
+
+def test_hidden_and_partial_files_are_skipped(make_pdf, tmp_path):
+    (tmp_path / 'in').mkdir()
+    watcher, rule = make_watcher(tmp_path, {'folder': 'in', 'action': 'delete', 'pages': '1', 'output': 'out'})
+    settle(make_pdf('in/.hidden.pdf', 2))
+    settle(make_pdf('in/.a.pdf.1234.part', 2))
+    assert watcher.scan(rule) == []
+
+
+def test_load_config(tmp_path):
+    config_file = tmp_path / 'rules.json'
+    config_file.write_text(json.dumps({'state': 'state.json', 'rules': [
+        {'folder': 'in', 'action': 'split', 'output': 'out', 'workers': 2}]}))
+    config, rules = load_config(str(config_file))
+    assert config['state'] == str(tmp_path / 'state.json')
+    assert rules[0].folder == str(tmp_path / 'in')
+    assert rules[0].workers == 2
+
+
+@pytest.mark.parametrize('rule_data, message', [
+    ({'folder': 'in', 'action': 'rotate', 'output': 'out'}, 'Unknown action'),
+    ({'folder': 'in', 'action': 'merge'}, 'needs a folder and an output'),
+    ({'folder': 'in', 'action': 'extract', 'output': 'out'}, 'needs pages'),
+    ({'folder': 'in', 'action': 'merge', 'output': 'in/done'}, 'inside the watched folder'),
+])
+def test_invalid_rules(tmp_path, rule_data, message):
+    with pytest.raises(ValueError, match=message):
+        WatchRule.from_dict(rule_data, str(tmp_path))
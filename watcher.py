@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+
+from cancellation import TaskCancelled
+from outputs import AtomicOutputFile, WRITE_BUFFER_SIZE
+from pagerange import PageRange
+
+ACTIONS = ('merge', 'split', 'extract', 'delete')
+WATCH_INTERVAL = 5
+SETTLE_TIME = 10
+STATE_FILE = os.path.join(pathlib.Path.home(), 'magicpdf', 'watch_state.json')
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+class WatchRule:
+    def __init__(self, folder, action, output, pages=None, workers=1, is_outlines=True, streaming=False,
+                 deduplicate=False, use_cache=None):
+        self.folder = os.path.normpath(os.path.abspath(folder))
+        self.action = action
+        self.output = os.path.normpath(os.path.abspath(output))
+        self.pages = pages
+        self.workers = workers
+        self.is_outlines = is_outlines
+        self.streaming = streaming
+        self.deduplicate = deduplicate
+        self.use_cache = use_cache
+
+    @classmethod
+    def from_dict(cls, data, base_dir='.'):
+        action = data.get('action')
+        if action not in ACTIONS:
+            raise ValueError('Unknown action "{}", expected one of {}'.format(action, ', '.join(ACTIONS)))
+        if not data.get('folder') or not data.get('output'):
+            raise ValueError('The "{}" rule needs a folder and an output'.format(action))
+        if action in ('extract', 'delete') and not data.get('pages'):
+            raise ValueError('The "{}" rule needs pages'.format(action))
+        rule = cls(os.path.join(base_dir, os.path.expanduser(data['folder'])), action,
+                   os.path.join(base_dir, os.path.expanduser(data['output'])), pages=data.get('pages'),
+                   workers=int(data.get('workers', 1)), is_outlines=bool(data.get('bookmarks', True)),
+                   streaming=bool(data.get('streaming', False)), deduplicate=bool(data.get('deduplicate', False)),
+                   use_cache=data.get('cache'))
+        # The results would be picked up again as new inputs
+        if rule.output == rule.folder or rule.output.startswith(rule.folder + os.sep):
+            raise ValueError('The output of the "{}" rule cannot be inside the watched folder'.format(action))
+        return rule
+
+    @property
+    def key(self):
+        return '{}:{}'.format(self.action, self.folder)
+
+    def describe(self):
+        description = '{} {} -> {}'.format(self.action, self.folder, self.output)
+        return description + (' (pages {})'.format(self.pages) if self.pages else '')
+
+
+class WatchItem:
+    # A file, or for the merge rules a subfolder, together with the sizes and times it was seen with
+    def __init__(self, rule, name, file_paths, signature):
+        self.rule = rule
+        self.name = name
+        self.file_paths = file_paths
+        self.signature = signature
+
+
+class WatchState:
+    # Remembers the signature of every handled item, so a restart only picks up new or changed files
+    def __init__(self, file_path=STATE_FILE):
+        self.file_path = file_path
+        self.items = {}
+        if os.path.exists(file_path):
+            with open(file_path, encoding='utf-8') as state_file:
+                self.items = json.load(state_file)
+
+    def is_handled(self, item):
+        entry = self.items.get(item.rule.key, {}).get(item.name)
+        return entry is not None and entry['signature'] == item.signature
+
+    def mark(self, item, status):
+        self.items.setdefault(item.rule.key, {})[item.name] = {
+            'signature': item.signature,
+            'status': status,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        with AtomicOutputFile(self.file_path) as state_file:
+            state_file.write(json.dumps(self.items).encode('utf-8'))
+
+
+class FolderWatcher:
+    def __init__(self, rules, state, run_task, settle_time=SETTLE_TIME, buffer_size=WRITE_BUFFER_SIZE):
+        # run_task runs a worker thread to the end and returns a non-zero code on a failure
+        self.rules = rules
+        self.state = state
+        self.run_task = run_task
+        self.settle_time = settle_time
+        self.buffer_size = buffer_size
+
+    def run(self, interval=WATCH_INTERVAL, once=False):
+        for rule in self.rules:
+            logging.info('Watching: {}'.format(rule.describe()))
+        while True:
+            self.poll()
+            if once:
+                return
+            time.sleep(interval)
+
+    def poll(self):
+        count = 0
+        for rule in self.rules:
+            for item in self.scan(rule):
+                if self.state.is_handled(item):
+                    continue
+                status = self.process(item)
+                self.state.mark(item, status)
+                self.state.save()
+                count += 1
+        return count
+
+    def scan(self, rule):
+        if not os.path.isdir(rule.folder):
+            return []
+        if rule.action != 'merge':
+            items = [self.file_item(rule, entry.name, [entry.path]) for entry in pdf_entries(rule.folder)]
+        else:
+            items = []
+            for entry in sorted(os.scandir(rule.folder), key=lambda dir_entry: dir_entry.name):
+                if entry.is_dir() and not entry.name.startswith('.'):
+                    file_paths = [file_entry.path for file_entry in pdf_entries(entry.path)]
+                    if file_paths:
+                        items.append(self.file_item(rule, entry.name, file_paths))
+        return [item for item in items if item is not None]
+
+    def file_item(self, rule, name, file_paths):
+        # A file is settled when it has not been written to for settle_time seconds;
+        # a file that is still being copied changes its signature and is taken again later
+        signature = []
+        now = time.time()
+        for file_path in file_paths:
+            try:
+                stat_result = os.stat(file_path)
+            except OSError:
+                return None
+            if now - stat_result.st_mtime < self.settle_time:
+                return None
+            signature.append([os.path.basename(file_path), stat_result.st_size, stat_result.st_mtime_ns])
+        return WatchItem(rule, name, file_paths, signature)
+
+    def process(self, item):
+        rule = item.rule
+        logging.info('Watch rule "{}" takes "{}"'.format(rule.action, item.name))
+        os.makedirs(rule.output, exist_ok=True)
+        try:
+            if rule.action == 'merge':
+                exit_code, output_path = self.merge(item)
+            else:
+                exit_code, output_path = self.process_file(item)
+        except TaskCancelled:
+            raise
+        except Exception as ex:
+            logging.error(ex)
+            print('{}: {}'.format(item.name, ex), file=sys.stderr)
+            return FAILED
+        if exit_code:
+            return FAILED
+        print('{} {} -> {}'.format(rule.action, item.name, output_path))
+        return DONE
+
+    def merge(self, item):
+        from merging import PdfMergerThread
+
+        rule = item.rule
+        output_path = os.path.join(rule.output, '{}.pdf'.format(item.name))
+        thread = PdfMergerThread(in_file_list=item.file_paths, result_file_path=output_path,
+                                 is_outlines=rule.is_outlines, buffer_size=self.buffer_size,
+                                 streaming=rule.streaming, deduplicate=rule.deduplicate, use_cache=rule.use_cache)
+        return self.run_worker(thread), output_path
+
+    def process_file(self, item):
+        from documents import open_reader
+        from deletion import RangeDeleteThread
+        from extraction import PbPExtractThread, RangeExtractThread, extract_result_dir_name
+
+        rule = item.rule
+        source_file_path = item.file_paths[0]
+        pdf_reader = open_reader(source_file_path)
+        try:
+            if rule.action == 'split':
+                output_dir_name = extract_result_dir_name(source_file_path)
+                thread = PbPExtractThread(source_file_path, pdf_reader, rule.output, output_dir_name,
+                                          workers=rule.workers, buffer_size=self.buffer_size)
+                return self.run_worker(thread), os.path.join(rule.output, output_dir_name)
+            pages_range = PageRange.parse(rule.pages, len(pdf_reader.pages))
+            output_path = os.path.join(rule.output, item.name)
+            if rule.action == 'extract':
+                thread = RangeExtractThread(pdf_reader, output_path, pages_range, buffer_size=self.buffer_size,
+                                            source_file_path=source_file_path, use_cache=rule.use_cache)
+            else:
+                thread = RangeDeleteThread(pdf_reader, output_path, pages_range, buffer_size=self.buffer_size)
+            return self.run_worker(thread), output_path
+        finally:
+            pdf_reader.stream.close()
+
+    def run_worker(self, thread):
+        exit_code = self.run_task(thread)
+        # An interrupted job is not recorded, it is done again on the next start
+        if thread.cancel_token.is_cancelled():
+            raise TaskCancelled()
+        return exit_code
+
+
+def load_config(config_path):
+    with open(config_path, encoding='utf-8') as config_file:
+        config = json.load(config_file)
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    if config.get('state'):
+        config['state'] = os.path.join(base_dir, os.path.expanduser(config['state']))
+    rules = [WatchRule.from_dict(rule_data, base_dir) for rule_data in config.get('rules', [])]
+    if not rules:
+        raise ValueError('No rules in "{}"'.format(config_path))
+    return config, rules
+
+
+def pdf_entries(folder):
+    # The partial outputs (.part) and hidden files are skipped
+    return sorted((entry for entry in os.scandir(folder)
+                   if entry.is_file() and entry.name.lower().endswith('.pdf') and not entry.name.startswith('.')),
+                  key=lambda entry: entry.name)